@@ -1,27 +1,68 @@
 import requests
 import logging
+import threading
 import time
 import uuid
 import hmac
 import hashlib
 import base64
 import json
-from config import HIKCENTRAL_BASE_URL, HIKCENTRAL_APP_KEY, HIKCENTRAL_APP_SECRET, HIKCENTRAL_PRIVILEGE_GROUP_ID, DRY_RUN, HIKCENTRAL_SIGNATURE_MODE, HIKCENTRAL_ORG_INDEX_CODE
+from requests.adapters import HTTPAdapter
+from config import DEFAULT_SITE, SITES, DRY_RUN, SITE_MAX_CONNECTIONS, SITE_MAX_REQUESTS_PER_SECOND
 from database import add_request_log, create_log_entry
+from models import Worker
+from utils.metrics import INTEGRATION_REQUEST_SECONDS, INTEGRATION_REQUESTS
+from utils.tracing import span
 
 logger = logging.getLogger('HydeParkSync.HikCentralClient')
 
+class _RateLimiter:
+    """Token bucket shared by the threads calling one HikCentral server."""
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        # At least one token fits, or rates below 1/s could never pay for a call
+        self.capacity = max(self.rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
 class HikCentralClient:
-    """Client for interacting with the HikCentral API using Artemis v2 Signature."""
+    """
+    Client for interacting with the HikCentral API using Artemis v2 Signature.
+    One client per site (see api/sites.py), each with its own connection pool and rate limit.
+    """
 
-    def __init__(self):
-        self.base_url = HIKCENTRAL_BASE_URL
-        self.app_key = HIKCENTRAL_APP_KEY
-        self.app_secret = HIKCENTRAL_APP_SECRET
-        self.privilege_group_id = HIKCENTRAL_PRIVILEGE_GROUP_ID
+    def __init__(self, site=DEFAULT_SITE, settings=None):
+        settings = dict(SITES[DEFAULT_SITE], **(settings or {}))
+        self.site = site
+        self.base_url = settings["base_url"]
+        self.app_key = settings["app_key"]
+        self.app_secret = settings["app_secret"]
+        self.privilege_group_id = settings["privilege_group_id"]
+        self.org_index_code = settings["org_index_code"]
+        self.signature_mode = settings["signature_mode"]
+        max_connections = settings.get("max_connections") or SITE_MAX_CONNECTIONS
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max_connections))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=max_connections))
+        rate = settings.get("max_requests_per_second", SITE_MAX_REQUESTS_PER_SECOND)
+        self.rate_limiter = _RateLimiter(rate) if rate else None
 
     def _generate_signature_headers(self, path, body_json=""):
-        if HIKCENTRAL_SIGNATURE_MODE == "canonical":
+        if self.signature_mode == "canonical":
             string_to_sign = "POST\n" + "application/json\n" + "\n\n\n" + f"x-ca-key:{self.app_key}\n" + f"/artemis{path}"
             signature = hmac.new(self.app_secret.encode('utf-8'), string_to_sign.encode('utf-8'), hashlib.sha256).digest()
             signature_base64 = base64.b64encode(signature).decode('utf-8')
@@ -61,10 +102,14 @@ class HikCentralClient:
             "response_data": None
         }
 
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        started = time.perf_counter()
         try:
             # Note: HikCentral often uses self-signed certificates, so verify=False might be needed in a real-world scenario
             # For this project, we'll assume a secure connection or that the environment handles the certificate.
-            response = requests.request(method, url, headers=headers, data=body_json, timeout=30, verify=False)
+            with span("hikcentral.request", path=path, site=self.site):
+                response = self.session.request(method, url, headers=headers, data=body_json, timeout=30, verify=False)
             response.raise_for_status()
             
             response_json = response.json()
@@ -94,6 +139,10 @@ class HikCentralClient:
             logger.error(f"An unexpected error occurred with HikCentral on {path}: {e}")
             log_data["message"] = f"Unexpected Error: {e}"
         finally:
+            INTEGRATION_REQUEST_SECONDS.labels("HikCentral", path).observe(time.perf_counter() - started)
+            response_data = log_data["response_data"]
+            code = response_data.get('code', '') if isinstance(response_data, dict) else ''
+            INTEGRATION_REQUESTS.labels("HikCentral", path, log_data["status_code"] or "error", code).inc()
             add_request_log(create_log_entry(**log_data))
         
         return None
@@ -101,20 +150,21 @@ class HikCentralClient:
     # --- Worker Management Functions ---
 
     def add_worker(self, worker_data):
-        """Adds a worker to HikCentral (Person and Face)."""
+        """Adds a worker (a models.Worker or a worker dict) to HikCentral (Person and Face)."""
+        worker_data = Worker.coerce(worker_data)
         # 1. Add Person
         person_path = "/api/resource/v2/person/single/add"
         person_payload = {
-            "personCode": str(worker_data.get('national_id') or worker_data.get('id')),
-            "personName": worker_data.get('name'),
+            "personCode": str(worker_data.national_id or worker_data.id),
+            "personName": worker_data.name,
             "gender": str(worker_data.get('gender', '1')),
             "phoneNo": worker_data.get('phone', ''),
             "email": worker_data.get('email', ''),
-            "beginTime": worker_data.get('valid_from', ''),
-            "endTime": worker_data.get('valid_to', ''),
-            "orgIndexCode": HIKCENTRAL_ORG_INDEX_CODE,
+            "beginTime": worker_data.valid_from or '',
+            "endTime": worker_data.valid_to or '',
+            "orgIndexCode": self.org_index_code,
             "certificateType": "1",
-            "certificateNo": str(worker_data.get('national_id') or ''),
+            "certificateNo": str(worker_data.national_id or ''),
         }
         if DRY_RUN:
             add_request_log(create_log_entry(
@@ -123,19 +173,19 @@ class HikCentralClient:
                 success=True,
                 status_code=200,
                 request_data=person_payload,
-                response_data={"code": "0", "data": {"personId": str(worker_data.get('id'))}}
+                response_data={"code": "0", "data": {"personId": str(worker_data.id)}}
             ))
-            logger.info(f"Successfully added person {worker_data.get('id')} with PersonID: {str(worker_data.get('id'))}")
-            return str(worker_data.get('id'))
+            logger.info(f"Successfully added person {worker_data.id} with PersonID: {str(worker_data.id)}")
+            return str(worker_data.id)
         person_response = self._request("POST", person_path, person_payload)
         
         if not person_response or person_response.get('code') != '0':
-            logger.error(f"Failed to add person {worker_data.get('id')}: {person_response}")
+            logger.error(f"Failed to add person {worker_data.id}: {person_response}")
             return None
 
         person_id = person_response.get('data', {}).get('personId') or person_payload.get('personCode')
         if not person_id:
-            logger.error(f"Person ID not returned for worker {worker_data.get('id')}")
+            logger.error(f"Person ID not returned for worker {worker_data.id}")
             return None
 
         # 2. Add Face (Requires face image data, which is not in the current worker_data)
@@ -145,12 +195,16 @@ class HikCentralClient:
         # For now, we will simulate the success of the person add and return the person ID.
         
         # SIMULATION: Assume face is added successfully or handled elsewhere
-        logger.info(f"Successfully added person {worker_data.get('id')} with PersonID: {person_id}")
+        logger.info(f"Successfully added person {worker_data.id} with PersonID: {person_id}")
         return person_id
 
     def delete_worker(self, person_id):
+        return self.delete_workers([person_id])
+
+    def delete_workers(self, person_ids):
+        """Deletes several persons in one batch call."""
         path = "/api/resource/v2/person/batch"
-        payload = {"personIds": [person_id]}
+        payload = {"personIds": list(person_ids)}
         if DRY_RUN:
             add_request_log(create_log_entry(
                 api_type="HikCentral",
@@ -160,29 +214,62 @@ class HikCentralClient:
                 request_data=payload,
                 response_data={"code": "0"}
             ))
-            logger.info(f"Successfully deleted person with PersonID: {person_id}")
+            logger.info(f"Successfully deleted persons with PersonIDs: {payload['personIds']}")
             return True
         response = self._request("POST", path, payload)
         
         if response and response.get('code') == '0':
-            logger.info(f"Successfully deleted person with PersonID: {person_id}")
+            logger.info(f"Successfully deleted persons with PersonIDs: {payload['personIds']}")
             return True
         
-        logger.error(f"Failed to delete person {person_id}: {response}")
+        logger.error(f"Failed to delete persons {payload['personIds']}: {response}")
         return False
 
+    def list_persons(self, page_no, page_size):
+        """Returns one page of the HikCentral person list as {"total": int, "list": [...]}, or None on failure."""
+        path = "/api/resource/v2/person/personList"
+        payload = {"pageNo": page_no, "pageSize": page_size}
+        if DRY_RUN:
+            add_request_log(create_log_entry(
+                api_type="HikCentral",
+                endpoint=f"{self.base_url}{path}",
+                success=True,
+                status_code=200,
+                request_data=payload,
+                response_data={"code": "0", "data": {"total": 0, "list": []}}
+            ))
+            return {"total": 0, "list": []}
+        response = self._request("POST", path, payload)
+        if response and response.get('code') == '0':
+            data = response.get('data') or {}
+            return {"total": int(data.get('total') or 0), "list": data.get('list') or []}
+        logger.error(f"Failed to list persons (page {page_no}): {response}")
+        return None
+
+    def person_exists(self, person_id):
+        """Returns True/False if HikCentral confirms whether the person exists, or None if the call failed."""
+        path = "/api/resource/v1/person/personId/personInfo"
+        payload = {"personId": person_id}
+        if DRY_RUN:
+            return None
+        response = self._request("POST", path, payload)
+        if response and response.get('code') == '0':
+            return bool(response.get('data'))
+        return None
+
     def update_worker(self, person_id, worker_data):
-        """Updates a worker's information in HikCentral."""
+        """Updates a worker's information (a models.Worker or a worker dict) in HikCentral."""
+        worker_data = Worker.coerce(worker_data)
         # This is a simplified update. Real update would involve person update and face update/delete/add.
         path = "/api/resource/v2/person/single/update"
         payload = {
             "personId": person_id,
-            "personCode": str(worker_data.get('national_id') or worker_data.get('id')),
-            "personName": worker_data.get('name'),
+            "personCode": str(worker_data.national_id or worker_data.id),
+            "personName": worker_data.name,
             "gender": str(worker_data.get('gender', '1')),
             "phoneNo": worker_data.get('phone', ''),
             "email": worker_data.get('email', ''),
-            "certificateNo": str(worker_data.get('national_id') or ''),
+            "certificateNo": str(worker_data.national_id or ''),
         }
         if DRY_RUN:
             add_request_log(create_log_entry(
@@ -258,6 +345,33 @@ class HikCentralClient:
         logger.error(f"Failed to grant privilege for person {person_id}: {response}")
         return False
 
+    def remove_from_privilege_group(self, person_ids, group_id=None):
+        """Revokes the access privilege of several persons in one batch call."""
+        gid = group_id or self.privilege_group_id
+        path = "/api/acs/v1/privilege/group/single/deletePersons"
+        payload = {
+            "privilegeGroupId": gid,
+            "type": 1,
+            "list": [{"id": person_id} for person_id in person_ids],
+        }
+        if DRY_RUN:
+            add_request_log(create_log_entry(
+                api_type="HikCentral",
+                endpoint=f"{self.base_url}{path}",
+                success=True,
+                status_code=200,
+                request_data=payload,
+                response_data={"code": "0"}
+            ))
+            logger.info(f"Privilege revoked for PersonIDs: {list(person_ids)}")
+            return True
+        response = self._request("POST", path, payload)
+        if response and response.get('code') == '0':
+            logger.info(f"Privilege revoked for PersonIDs: {list(person_ids)}")
+            return True
+        logger.error(f"Failed to revoke privilege for persons {list(person_ids)}: {response}")
+        return False
+
 # Suppress InsecureRequestWarning for verify=False
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
@@ -0,0 +1,53 @@
+import logging
+import threading
+from config import DEFAULT_SITE, SITES
+from api.hikcentral_client import HikCentralClient
+
+logger = logging.getLogger('HydeParkSync.Sites')
+
+# Registry of the sites configured in config.SITES and their HikCentral clients.
+#
+# resolve_site() picks the site of a new worker from its event; stored workers carry
+# the site they were enrolled on (Worker.site), and records written before sites
+# existed belong to DEFAULT_SITE. Clients are created on first use, one per site, and
+# shared by every thread talking to that site, so its connection pool and rate limit
+# cover all of them.
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def site_names():
+    return list(SITES)
+
+def resolve_site(site=None, unit_number=None):
+    """Returns the site of a new worker: site if configured, else the first site whose unit prefix matches, else DEFAULT_SITE."""
+    if site:
+        if site in SITES:
+            return site
+        logger.warning(f"Unknown site {site!r}; routing by unit number instead.")
+    if unit_number:
+        unit = str(unit_number)
+        for name, settings in SITES.items():
+            if any(unit.startswith(prefix) for prefix in settings.get("unit_prefixes") or ()):
+                return name
+    return DEFAULT_SITE
+
+def site_of(worker):
+    """Returns the site a stored worker was enrolled on."""
+    return worker.site or DEFAULT_SITE
+
+def get_client(site=DEFAULT_SITE):
+    """Returns the HikCentral client of a site. Raises KeyError for a site that is not configured."""
+    client = _clients.get(site)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(site)
+            if client is None:
+                if site not in SITES:
+                    raise KeyError(f"Unknown site: {site}")
+                client = _clients[site] = HikCentralClient(site, SITES[site])
+    return client
+
+def client_for(worker):
+    """Returns the HikCentral client of the site a stored worker was enrolled on."""
+    return get_client(site_of(worker))
@@ -1,7 +1,10 @@
 import requests
 import logging
+import time
 from config import SUPABASE_BASE_URL, SUPABASE_API_KEY, SUPABASE_EVENTS_ENDPOINT, SUPABASE_COMPLETE_ENDPOINT, SUPABASE_FAIL_ENDPOINT, DRY_RUN, SUPABASE_UPDATE_STATUS_ENDPOINT, SUPABASE_ADMIN_BEARER
 from database import add_request_log, create_log_entry
+from utils.metrics import INTEGRATION_REQUEST_SECONDS, INTEGRATION_REQUESTS
+from utils.tracing import span
 
 logger = logging.getLogger('HydeParkSync.SupabaseClient')
 
@@ -16,8 +19,11 @@ class SupabaseClient:
             "Content-Type": "application/json"
         }
 
-    def _request(self, method, endpoint, data=None):
-        """Generic request handler with logging."""
+    def _request(self, method, endpoint, data=None, route=None):
+        """
+        Generic request handler with logging.
+        route is the endpoint template used as the metrics label, so event IDs don't create new series.
+        """
         url = f"{self.base_url}{endpoint}"
         log_data = {
             "api_type": "Supabase",
@@ -28,8 +34,10 @@ class SupabaseClient:
             "response_data": None
         }
 
+        started = time.perf_counter()
         try:
-            response = requests.request(method, url, headers=self.headers, json=data, timeout=10)
+            with span("supabase.request", endpoint=route or endpoint):
+                response = requests.request(method, url, headers=self.headers, json=data, timeout=10)
             response.raise_for_status()
             
             log_data["success"] = True
@@ -53,6 +61,8 @@ class SupabaseClient:
             logger.error(f"An unexpected error occurred with Supabase on {endpoint}: {e}")
             log_data["message"] = f"Unexpected Error: {e}"
         finally:
+            INTEGRATION_REQUEST_SECONDS.labels("Supabase", route or endpoint).observe(time.perf_counter() - started)
+            INTEGRATION_REQUESTS.labels("Supabase", route or endpoint, log_data["status_code"] or "error", "").inc()
             add_request_log(create_log_entry(**log_data))
         
         return None
@@ -90,7 +100,7 @@ class SupabaseClient:
                 response_data={"status": "ok"}
             ))
             return {"status": "ok"}
-        return self._request("POST", endpoint)
+        return self._request("POST", endpoint, route=SUPABASE_COMPLETE_ENDPOINT)
 
     def fail_event(self, event_id, reason="Processing failed"):
         """Marks an event as failed in Supabase."""
@@ -106,7 +116,7 @@ class SupabaseClient:
                 response_data={"status": "ok"}
             ))
             return {"status": "ok"}
-        return self._request("POST", endpoint, data={"reason": reason})
+        return self._request("POST", endpoint, data={"reason": reason}, route=SUPABASE_FAIL_ENDPOINT)
 
     def update_worker_status(self, national_id_number, status, external_id=None, reason=""):
         """Updates worker status back on Supabase external system API."""
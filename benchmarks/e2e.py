@@ -0,0 +1,198 @@
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.results import PROJECT_ROOT, run_metadata, default_output, write_results
+
+# End-to-end throughput benchmark: runs poll_and_process_events against a local fake
+# Artemis gateway and a fake Supabase edge function serving N synthetic workers.
+#
+#   python -m benchmarks.e2e --workers 1000 10000 100000
+#   python -m benchmarks.results OLD.json NEW.json     # compare two runs
+#
+# Every size runs in its own process with its own scratch data directory
+# (HYDEPARK_DATA_DIR), so peak RSS and bytes written are per size.
+# Stage and API latency percentiles are estimated from the metrics histograms
+# (same interpolation as Prometheus' histogram_quantile).
+
+logger = logging.getLogger('HydeParkSync.Benchmark')
+
+def histogram_quantile(q, snapshot):
+    """Estimates the q-quantile of a histogram snapshot by interpolating inside its bucket."""
+    total = snapshot["count"]
+    if not total:
+        return 0.0
+    rank = q * total
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(snapshot["buckets"], snapshot["counts"]):
+        if cumulative + count >= rank and count:
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = bound
+    return snapshot["buckets"][-1]  # In the +Inf bucket: report the largest finite bound
+
+def _proc_io():
+    """Returns this process's I/O counters (Linux), or {}."""
+    try:
+        with open("/proc/self/io", 'r') as f:
+            return {k: int(v) for k, v in (line.split(":") for line in f)}
+    except (OSError, ValueError):
+        return {}
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def run_single(workers, options):
+    """Runs one size in this process. HYDEPARK_DATA_DIR must already point at a scratch directory."""
+    import config
+    from benchmarks.fake_artemis import FakeArtemisServer
+    from benchmarks.fake_supabase import FakeSupabaseServer
+
+    artemis = FakeArtemisServer(config.HIKCENTRAL_APP_KEY, config.HIKCENTRAL_APP_SECRET, config.HIKCENTRAL_SIGNATURE_MODE,
+                                latency=options["latency_ms"] / 1000.0, jitter=options["jitter_ms"] / 1000.0,
+                                error_rate=options["error_rate"], seed=options["seed"]).start()
+    supabase = FakeSupabaseServer(config.SUPABASE_EVENTS_ENDPOINT, config.SUPABASE_COMPLETE_ENDPOINT, config.SUPABASE_FAIL_ENDPOINT,
+                                  workers=workers, workers_per_event=options["workers_per_event"],
+                                  batch_size=options["events_per_poll"]).start()
+    total_events = supabase.remaining()
+
+    import processors.event_processor as event_processor
+    from api.sites import get_client
+    from database import load_pipeline_stats
+    from utils.metrics import STAGE_SECONDS, INTEGRATION_REQUEST_SECONDS
+    get_client().base_url = artemis.base_url
+    event_processor.supabase_client.base_url = supabase.base_url
+
+    io_before = _proc_io()
+    started = time.perf_counter()
+    cycles = 0
+    while supabase.remaining() and time.perf_counter() - started < options["max_seconds"]:
+        remaining = supabase.remaining()
+        event_processor.poll_and_process_events()
+        event_processor.drain_poll_pipelines()  # The poll lanes keep working after the cycle returns
+        cycles += 1
+        if supabase.remaining() == remaining:
+            logger.error("No progress in the last cycle; stopping.")
+            break
+    wall = time.perf_counter() - started
+    stages = load_pipeline_stats().get("stages") or {}
+    workers_done = sum(stage.get("processed", 0) for name, stage in stages.items() if name.split(":")[-1] == "ack")
+    io_after = _proc_io()
+    artemis.stop()
+    supabase.stop()
+
+    events_done = len(supabase.completed) + len(supabase.failed)
+    metrics = {
+        "wall_seconds": round(wall, 3),
+        "events_per_second": round(events_done / wall, 3) if wall else 0.0,
+        "workers_per_second": round(workers_done / wall, 3) if wall else 0.0,
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "disk_write_bytes": io_after.get("write_bytes", 0) - io_before.get("write_bytes", 0),
+        "disk_wchar_bytes": io_after.get("wchar", 0) - io_before.get("wchar", 0),
+        "data_dir_bytes": _dir_size(config.DATA_DIR),
+    }
+    for (pipeline, stage), snapshot in STAGE_SECONDS.snapshot().items():
+        metrics[f"stage.{stage}.p50_seconds"] = round(histogram_quantile(0.50, snapshot), 6)
+        metrics[f"stage.{stage}.p99_seconds"] = round(histogram_quantile(0.99, snapshot), 6)
+    for (api, endpoint), snapshot in INTEGRATION_REQUEST_SECONDS.snapshot().items():
+        metrics[f"api.{api}:{endpoint}.p50_seconds"] = round(histogram_quantile(0.50, snapshot), 6)
+        metrics[f"api.{api}:{endpoint}.p99_seconds"] = round(histogram_quantile(0.99, snapshot), 6)
+
+    return {
+        "name": "poll_and_process_events",
+        "size": workers,
+        "completed": events_done >= total_events,
+        "events": total_events,
+        "events_done": events_done,
+        "events_failed": len(supabase.failed),
+        "workers_done": workers_done,
+        "cycles": cycles,
+        "artemis": artemis.counts,
+        "supabase": supabase.counts,
+        "metrics": metrics,
+    }
+
+def _run_in_subprocess(workers, options):
+    data_dir = tempfile.mkdtemp(prefix="hydepark-bench-")
+    result_path = os.path.join(data_dir, "result.json")
+    env = dict(os.environ, HYDEPARK_DATA_DIR=data_dir)
+    cmd = [sys.executable, "-m", "benchmarks.e2e", "--single", str(workers), "--result-file", result_path,
+           "--options", json.dumps(options)]
+    try:
+        subprocess.run(cmd, cwd=PROJECT_ROOT, env=env, check=True)
+        with open(result_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        if options["keep_data"]:
+            print(f"Data of the {workers}-worker run kept in {data_dir}")
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end poll cycle benchmark against local HikCentral/Supabase fakes.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1000, 10000, 100000], help="Worker counts to run")
+    parser.add_argument("--workers-per-event", type=int, default=10)
+    parser.add_argument("--events-per-poll", type=int, default=100, help="Pending events returned per poll (0 = all)")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Fake Artemis latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="Extra uniform random latency per call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of Artemis calls answered with HTTP 500")
+    parser.add_argument("--max-seconds", type=float, default=1800, help="Time budget per size; the run stops after the cycle that exceeds it")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="ERROR")
+    parser.add_argument("--keep-data", action="store_true", help="Keep the scratch data directories")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/e2e-<timestamp>.json)")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    parser.add_argument("--options", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.ERROR),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.single is not None:
+        result = run_single(args.single, json.loads(args.options))
+        with open(args.result_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    options = {
+        "workers_per_event": args.workers_per_event,
+        "events_per_poll": args.events_per_poll or None,
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "max_seconds": args.max_seconds,
+        "seed": args.seed,
+        "keep_data": args.keep_data,
+    }
+    meta = run_metadata(options)
+    results = []
+    output = args.output or default_output("e2e")
+    for workers in args.workers:
+        print(f"Running {workers} workers...")
+        result = _run_in_subprocess(workers, options)
+        m = result["metrics"]
+        print(f"  {result['events_done']}/{result['events']} events in {m['wall_seconds']}s "
+              f"({m['events_per_second']} events/s, {m['workers_per_second']} workers/s), "
+              f"peak RSS {m['peak_rss_bytes'] / 1e6:.1f} MB, {m['disk_wchar_bytes'] / 1e6:.1f} MB written"
+              + ("" if result["completed"] else " [time budget exceeded]"))
+        results.append(result)
+        write_results(output, "e2e", meta, results)
+    print(f"Results written to {output}")
+
+if __name__ == '__main__':
+    main()
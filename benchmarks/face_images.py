@@ -0,0 +1,44 @@
+import io
+import random
+from PIL import Image, ImageDraw
+
+# Synthetic "faces" for the benchmarks: a skin-toned oval with eyes and a mouth on a
+# plain background, varied per seed so every worker gets a different image (and hash).
+
+def generate_face_image(seed, size=320, quality=85):
+    """Returns the JPEG bytes of a deterministic synthetic face for seed."""
+    rng = random.Random(seed)
+    background = tuple(rng.randint(150, 255) for _ in range(3))
+    skin = (rng.randint(170, 240), rng.randint(120, 190), rng.randint(90, 150))
+    image = Image.new("RGB", (size, size), background)
+    draw = ImageDraw.Draw(image)
+
+    margin = size * rng.uniform(0.18, 0.26)
+    draw.ellipse([margin, margin * 0.8, size - margin, size - margin * 0.6], fill=skin)
+
+    eye_y = size * rng.uniform(0.38, 0.45)
+    eye_r = size * rng.uniform(0.03, 0.05)
+    for eye_x in (size * 0.38, size * 0.62):
+        draw.ellipse([eye_x - eye_r, eye_y - eye_r, eye_x + eye_r, eye_y + eye_r], fill=(40, 30, 20))
+
+    mouth_y = size * rng.uniform(0.64, 0.72)
+    draw.arc([size * 0.38, mouth_y - size * 0.05, size * 0.62, mouth_y + size * 0.05], 20, 160, fill=(120, 40, 40), width=max(2, size // 80))
+
+    # Noise, so JPEG sizes resemble photos rather than flat drawings
+    for _ in range(size * 4):
+        x, y = rng.randrange(size), rng.randrange(size)
+        shade = rng.randint(-25, 25)
+        r, g, b = image.getpixel((x, y))
+        image.putpixel((x, y), (max(0, min(255, r + shade)), max(0, min(255, g + shade)), max(0, min(255, b + shade))))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+if __name__ == '__main__':
+    import sys
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for n in range(count):
+        with open(f"face_{n}.jpg", "wb") as f:
+            f.write(generate_face_image(n))
+    print(f"Wrote {count} synthetic faces.")
@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local stand-in for the HikCentral Artemis gateway. It checks the X-Ca-Signature
+# headers the way HikCentralClient signs them, keeps an in-memory person list, and can
+# add latency and random failures to every call.
+
+class FakeArtemisServer:
+    def __init__(self, app_key, app_secret, signature_mode="canonical", latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.app_key = app_key
+        self.app_secret = app_secret
+        self.signature_mode = signature_mode
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.persons = {}
+        self.counts = {"requests": 0, "errors_injected": 0, "bad_signatures": 0}
+        self._ids = itertools.count(1)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/artemis"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-artemis", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _signature_ok(self, headers, path, body):
+        if headers.get("X-Ca-Key") != self.app_key:
+            return False
+        if self.signature_mode == "canonical":
+            string_to_sign = "POST\n" + "application/json\n" + "\n\n\n" + f"x-ca-key:{self.app_key}\n" + path
+        else:
+            string_to_sign = f"{self.app_key}{headers.get('X-Ca-Nonce', '')}{headers.get('X-Ca-Timestamp', '')}{body}"
+        expected = base64.b64encode(hmac.new(self.app_secret.encode('utf-8'), string_to_sign.encode('utf-8'), hashlib.sha256).digest()).decode('utf-8')
+        return hmac.compare_digest(expected, headers.get("X-Ca-Signature", ""))
+
+    def _delay(self):
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self._rng.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        return fail
+
+    def handle(self, path, payload):
+        """Returns the Artemis response for an API path (without the /artemis prefix)."""
+        with self._lock:
+            if path == "/api/resource/v2/person/single/add":
+                person_id = str(next(self._ids))
+                self.persons[person_id] = dict(payload, personId=person_id)
+                return {"code": "0", "msg": "Success", "data": {"personId": person_id}}
+            if path == "/api/resource/v2/person/batch":
+                for person_id in payload.get("personIds") or []:
+                    self.persons.pop(str(person_id), None)
+                return {"code": "0", "msg": "Success", "data": {}}
+            if path == "/api/resource/v2/person/personList":
+                page_no = int(payload.get("pageNo") or 1)
+                page_size = int(payload.get("pageSize") or 500)
+                persons = list(self.persons.values())
+                page = persons[(page_no - 1) * page_size:page_no * page_size]
+                return {"code": "0", "msg": "Success", "data": {"total": len(persons), "pageNo": page_no, "pageSize": page_size, "list": page}}
+            if path == "/api/resource/v1/person/personId/personInfo":
+                return {"code": "0", "msg": "Success", "data": self.persons.get(str(payload.get("personId")))}
+            if path == "/api/resource/v2/person/single/update":
+                person_id = str(payload.get("personId"))
+                if person_id in self.persons:
+                    self.persons[person_id].update(payload)
+                return {"code": "0", "msg": "Success", "data": {}}
+        # Face upload, privilege group changes, ...: accepted without state
+        return {"code": "0", "msg": "Success", "data": {}}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode('utf-8') if length else ""
+                with server._lock:
+                    server.counts["requests"] += 1
+                if not server._signature_ok(self.headers, self.path, body):
+                    with server._lock:
+                        server.counts["bad_signatures"] += 1
+                    return self._reply(401, {"code": "401", "msg": "Signature verification failed"})
+                if server._delay():
+                    with server._lock:
+                        server.counts["errors_injected"] += 1
+                    return self._reply(500, {"code": "500", "msg": "Injected failure"})
+                path = self.path[len("/artemis"):] if self.path.startswith("/artemis") else self.path
+                try:
+                    payload = json.loads(body) if body else {}
+                except ValueError:
+                    return self._reply(400, {"code": "400", "msg": "Invalid JSON"})
+                self._reply(200, server.handle(path, payload))
+
+        return Handler
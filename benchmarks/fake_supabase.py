@@ -0,0 +1,126 @@
+import json
+import re
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.face_images import generate_face_image
+
+# A local stand-in for the Supabase edge function. It serves synthetic worker.created
+# events from its pending list, drops an event once it is completed or failed, and
+# serves the synthetic face photo referenced by each worker.
+
+def _route_pattern(template):
+    """Turns an endpoint template like /admin/events/{eventId}/complete into a regex."""
+    return re.compile("^" + re.escape(template).replace(re.escape("{eventId}"), "(?P<event_id>[^/]+)") + "$")
+
+class FakeSupabaseServer:
+    def __init__(self, events_endpoint, complete_endpoint, fail_endpoint, workers=1000, workers_per_event=10, batch_size=None, face_size=320):
+        self.events_endpoint = events_endpoint
+        self.complete_pattern = _route_pattern(complete_endpoint)
+        self.fail_pattern = _route_pattern(fail_endpoint)
+        self.batch_size = batch_size
+        self.face_size = face_size
+        self.pending = {}
+        self.completed = set()
+        self.failed = set()
+        self.counts = {"polls": 0, "faces_served": 0, "face_bytes_served": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._build_events(workers, workers_per_event)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _build_events(self, workers, workers_per_event):
+        valid_to = (datetime.now() + timedelta(days=365)).strftime("%Y-%m-%dT%H:%M:%S+02:00")
+        for start in range(0, workers, workers_per_event):
+            event_id = f"bench-{start // workers_per_event:07d}"
+            self.pending[event_id] = {
+                "id": event_id,
+                "type": "worker.created",
+                "workers": [{
+                    "id": f"w{n:07d}",
+                    "fullName": f"Bench Worker {n}",
+                    "nationalIdNumber": f"{29000000000000 + n}",
+                    "facePhoto": f"/faces/{n}.jpg",  # Made absolute in start(), once the port is known
+                    "validFrom": datetime.now().strftime("%Y-%m-%dT%H:%M:%S+02:00"),
+                    "validTo": valid_to,
+                    "unitNumber": f"U{n % 500}",
+                } for n in range(start, min(start + workers_per_event, workers))],
+            }
+
+    def start(self):
+        for event in self.pending.values():
+            for worker in event["workers"]:
+                worker["facePhoto"] = self.base_url + worker["facePhoto"]
+        threading.Thread(target=self._server.serve_forever, name="fake-supabase", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def remaining(self):
+        with self._lock:
+            return len(self.pending)
+
+    def _pending_events(self):
+        with self._lock:
+            self.counts["polls"] += 1
+            events = list(self.pending.values())
+        return events[:self.batch_size] if self.batch_size else events
+
+    def _ack(self, event_id, failed):
+        with self._lock:
+            if self.pending.pop(event_id, None) is None and event_id not in self.completed | self.failed:
+                return False
+            (self.failed if failed else self.completed).add(event_id)
+            return True
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, body, content_type="application/json"):
+                data = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == server.events_endpoint:
+                    return self._reply(200, {"success": True, "events": server._pending_events()})
+                match = re.match(r"^/faces/(\d+)\.jpg$", path)
+                if match:
+                    image = generate_face_image(int(match.group(1)), size=server.face_size)
+                    with server._lock:
+                        server.counts["faces_served"] += 1
+                        server.counts["face_bytes_served"] += len(image)
+                    return self._reply(200, image, "image/jpeg")
+                self._reply(404, {"error": "Not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                path = self.path.split("?", 1)[0]
+                for pattern, failed in ((server.complete_pattern, False), (server.fail_pattern, True)):
+                    match = pattern.match(path)
+                    if match:
+                        if server._ack(match.group("event_id"), failed):
+                            return self._reply(200, {"success": True})
+                        return self._reply(404, {"error": "Unknown event"})
+                self._reply(404, {"error": "Not found"})
+
+        return Handler
@@ -0,0 +1,111 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.results import PROJECT_ROOT, run_metadata, default_output, write_results
+
+# Cold-start benchmark of the entry points: imports each one in a fresh interpreter
+# and reports the import time, the interpreter's wall time and its peak RSS.
+#
+#   python -m benchmarks.imports
+#   python -m benchmarks.results OLD.json NEW.json     # compare two runs
+#
+# It also guards the split between the dashboard and the processing stack: an entry
+# point that imports one of its FORBIDDEN modules fails the run (exit code 1), e.g.
+# when a new top-level import in dashboard/app.py pulls numpy into every gunicorn worker.
+
+logger = logging.getLogger('HydeParkSync.Benchmark')
+
+# Entry point name -> module imported when it starts
+ENTRY_POINTS = {
+    "dashboard": "main",  # gunicorn main:app
+    "poller": "poller",
+    "bulk_import": "processors.bulk_import",
+    "export": "utils.export",
+}
+
+_PROCESSING_STACK = ("numpy", "cv2", "PIL", "requests", "dateutil", "apscheduler",
+                     "processors.event_processor", "utils.face_processor", "api.hikcentral_client", "api.supabase_client")
+FORBIDDEN = {
+    "dashboard": _PROCESSING_STACK,
+    "export": _PROCESSING_STACK,
+}
+
+# Runs in the child: imports the entry point and reports what it loaded
+_CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+import_seconds = time.perf_counter() - started
+print(json.dumps({{"import_seconds": import_seconds, "modules": sorted(sys.modules),
+                  "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}}))
+"""
+
+def _import_once(module, data_dir):
+    env = dict(os.environ, HYDEPARK_DATA_DIR=data_dir)
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", _CHILD.format(module=module)], cwd=PROJECT_ROOT, env=env,
+                          capture_output=True, text=True, timeout=120)
+    process_seconds = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr}")
+    report = json.loads(proc.stdout.strip().splitlines()[-1])
+    report["process_seconds"] = process_seconds
+    return report
+
+def run_entry_point(name, runs, data_dir):
+    module = ENTRY_POINTS[name]
+    _import_once(module, data_dir)  # Warm-up: writes the bytecode caches, so every measured run is alike
+    reports = [_import_once(module, data_dir) for _ in range(runs)]
+    modules = set(reports[-1]["modules"])
+    forbidden = sorted(m for m in FORBIDDEN.get(name, ()) if m in modules)
+    return {
+        "name": name,
+        "size": runs,
+        "module": module,
+        "forbidden_imported": forbidden,
+        "metrics": {
+            "import_seconds": round(statistics.median(r["import_seconds"] for r in reports), 6),
+            "import_max_seconds": round(max(r["import_seconds"] for r in reports), 6),
+            "process_seconds": round(statistics.median(r["process_seconds"] for r in reports), 6),
+            "peak_rss_bytes": max(r["peak_rss_bytes"] for r in reports),
+            "modules_loaded": len(modules),
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import time of the entry points, with a guard against heavy imports.")
+    parser.add_argument("--only", nargs="+", choices=sorted(ENTRY_POINTS), help="Run only these entry points")
+    parser.add_argument("--runs", type=int, default=7, help="Fresh interpreters per entry point")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/imports-<timestamp>.json)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    data_dir = tempfile.mkdtemp(prefix="hydepark-imports-")
+    meta = run_metadata({"runs": args.runs})
+    output = args.output or default_output("imports")
+    results = []
+    try:
+        for name in args.only or list(ENTRY_POINTS):
+            result = run_entry_point(name, args.runs, data_dir)
+            metrics = result["metrics"]
+            print(f"{name:12} {result['module']:24} import {metrics['import_seconds'] * 1000:>8.1f} ms  "
+                  f"process {metrics['process_seconds'] * 1000:>8.1f} ms  peak RSS {metrics['peak_rss_bytes'] / 1e6:>7.1f} MB  "
+                  f"{metrics['modules_loaded']:>5} modules")
+            if result["forbidden_imported"]:
+                logger.error(f"{name} imports {', '.join(result['forbidden_imported'])} at startup.")
+            results.append(result)
+            write_results(output, "imports", meta, results)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    print(f"Results written to {output}")
+    sys.exit(1 if any(r["forbidden_imported"] for r in results) else 0)
+
+if __name__ == '__main__':
+    main()
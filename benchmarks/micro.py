@@ -0,0 +1,177 @@
+import argparse
+import itertools
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from benchmarks.results import run_metadata, default_output, write_results
+
+# Micro-benchmarks of the storage and face hot paths that grow with the number of workers:
+#
+#   python -m benchmarks.micro --sizes 1000 10000 100000
+#   python -m benchmarks.micro --only load_workers find_duplicate_encoding
+#
+# Each benchmark reports ops/s and, from one extra run under tracemalloc, the peak and
+# retained Python allocations per operation. The store benchmarks run against a scratch
+# data directory (HYDEPARK_DATA_DIR) and go through the real code paths, stats included.
+
+logger = logging.getLogger('HydeParkSync.Benchmark')
+
+# Request logs are capped at this many entries, so add_request_log is measured at the cap only
+REQUEST_LOG_CAP = 1000
+
+def make_worker(n, rng, with_encoding=True):
+    worker = {
+        "id": f"w{n:07d}",
+        "name": f"Bench Worker {n}",
+        "national_id": f"{29000000000000 + n}",
+        "face_image_url": f"https://example.invalid/faces/{n}.jpg",
+        "valid_from": "2026-01-01T00:00:00+02:00",
+        "valid_to": "2027-01-01T00:00:00+02:00",
+        "status": rng.choice(["active", "active", "active", "blocked", "expired"]),
+        "unit_number": f"U{n % 500}",
+        "hikcentral_person_id": str(100000 + n),
+    }
+    if with_encoding:
+        worker["face_encoding"] = [rng.random() for _ in range(128)]
+    return worker
+
+def make_workers(size, with_encoding=True, seed=1):
+    rng = random.Random(seed)
+    return {f"w{n:07d}": make_worker(n, rng, with_encoding) for n in range(size)}
+
+def measure(op, min_time=1.0, min_runs=3):
+    """Returns ops/s over at least min_time and min_runs calls, plus the allocations of one call."""
+    op()  # Warm-up (caches, lazily created files)
+    runs = 0
+    started = time.perf_counter()
+    while True:
+        op()
+        runs += 1
+        elapsed = time.perf_counter() - started
+        if runs >= min_runs and elapsed >= min_time:
+            break
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        op()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ops_per_second": round(runs / elapsed, 3),
+        "seconds_per_op": round(elapsed / runs, 6),
+        "alloc_peak_bytes_per_op": peak - before,
+        "alloc_retained_bytes_per_op": max(0, after - before),
+    }
+
+# --- Benchmarks: each takes (size, options) and returns an op to measure ---
+
+def bench_load_workers(size, options):
+    from database import load_workers, save_workers
+    save_workers(make_workers(size, options["encodings"]))
+    return load_workers
+
+def bench_add_or_update_worker(size, options):
+    from database import add_or_update_worker, save_workers
+    workers = make_workers(size, options["encodings"])
+    save_workers(workers)
+    rng = random.Random(2)
+    ids = list(workers)
+
+    def op():
+        worker = dict(workers[rng.choice(ids)])
+        worker["unit_number"] = f"U{rng.randrange(500)}"
+        add_or_update_worker(worker)
+    return op
+
+def bench_add_request_log(size, options):
+    from database import add_request_log, create_log_entry, rebuild_stats, _append_request_log_lines
+    # Typical HikCentral face upload entry: the base64 image makes up most of it
+    payload = {"personId": "100001", "faceData": "A" * options["log_payload_bytes"]}
+    # Written directly: filling the log through add_request_log would also index every entry
+    _append_request_log_lines([create_log_entry("HikCentral", "/api/resource/v1/encodeDevice/personFace", True, 200, payload, {"code": "0"})
+                               for _ in range(REQUEST_LOG_CAP)])
+    rebuild_stats()
+
+    def op():
+        add_request_log(create_log_entry("HikCentral", "/api/resource/v1/encodeDevice/personFace", True, 200, payload, {"code": "0"}))
+    return op
+
+def bench_find_local_by_national_id(size, options):
+    from models import Worker
+    from processors.event_processor import _find_local_by_national_id
+    workers = {k: Worker.from_dict(w) for k, w in make_workers(size, with_encoding=False).items()}
+    rng = random.Random(3)
+    # Half hits at random positions, half misses (full scan)
+    national_ids = [f"{29000000000000 + rng.randrange(size * 2)}" for _ in range(1000)]
+    cursor = itertools.cycle(national_ids)
+
+    def op():
+        _find_local_by_national_id(workers, next(cursor))
+    return op
+
+def bench_find_duplicate_encoding(size, options):
+    import numpy as np
+    from models import Worker
+    from utils.face_processor import find_duplicate_encoding
+    workers = {k: Worker.from_dict(w) for k, w in make_workers(size, with_encoding=True).items()}
+    # Random unit-cube vectors are ~4.6 apart, far beyond the threshold: every call scans all workers,
+    # which is the common case (a new, unique face)
+    encoding = np.random.default_rng(4).random(128)
+
+    def op():
+        find_duplicate_encoding(encoding, workers)
+    return op
+
+BENCHMARKS = {
+    "load_workers": bench_load_workers,
+    "add_or_update_worker": bench_add_or_update_worker,
+    "add_request_log": bench_add_request_log,
+    "find_local_by_national_id": bench_find_local_by_national_id,
+    "find_duplicate_encoding": bench_find_duplicate_encoding,
+}
+SIZE_INDEPENDENT = {"add_request_log"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the storage and face matching hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Numbers of workers")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Minimum measured seconds per benchmark and size")
+    parser.add_argument("--min-runs", type=int, default=3)
+    parser.add_argument("--no-encodings", dest="encodings", action="store_false", help="Store workers without face encodings")
+    parser.add_argument("--log-payload-bytes", type=int, default=40000, help="request_data size of the benchmark log entries")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/micro-<timestamp>.json)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    data_dir = tempfile.mkdtemp(prefix="hydepark-micro-")
+    os.environ["HYDEPARK_DATA_DIR"] = data_dir  # Before anything imports config
+
+    options = {"encodings": args.encodings, "log_payload_bytes": args.log_payload_bytes,
+               "min_time": args.min_time, "min_runs": args.min_runs}
+    meta = run_metadata(dict(options, sizes=args.sizes))
+    output = args.output or default_output("micro")
+    results = []
+    try:
+        for name in args.only or list(BENCHMARKS):
+            sizes = [REQUEST_LOG_CAP] if name in SIZE_INDEPENDENT else args.sizes
+            for size in sizes:
+                op = BENCHMARKS[name](size, options)
+                metrics = measure(op, args.min_time, args.min_runs)
+                print(f"{name:28} {size:>8}  {metrics['ops_per_second']:>12.1f} ops/s  "
+                      f"{metrics['seconds_per_op'] * 1000:>10.3f} ms/op  peak alloc {metrics['alloc_peak_bytes_per_op'] / 1e6:>9.2f} MB/op")
+                results.append({"name": name, "size": size, "metrics": metrics})
+                write_results(output, "micro", meta, results)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    print(f"Results written to {output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+# Shared result file format of the benchmarks, so runs of different versions can be compared:
+#
+#   {"benchmark": "e2e", "meta": {...}, "results": [{"name": ..., "size": ..., "metrics": {...}}]}
+#
+# metrics is a flat dict of numbers. Keys ending in "_per_second" are better when higher,
+# every other metric (latencies, bytes, allocations) is better when lower.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+
+def _git_version():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+        return f"{commit}-dirty" if commit and dirty else commit or None
+    except Exception:
+        return None
+
+def run_metadata(options=None):
+    return {
+        "version": _git_version(),
+        "started_at": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "options": options or {},
+    }
+
+def default_output(benchmark):
+    return os.path.join(RESULTS_DIR, f"{benchmark}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+
+def write_results(path, benchmark, meta, results):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"benchmark": benchmark, "meta": meta, "results": results}, f, indent=2)
+    return path
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def compare(baseline, candidate, threshold=0.10):
+    """Prints metric changes between two result files and returns the regressions beyond threshold."""
+    base = {(r["name"], r["size"]): r["metrics"] for r in baseline["results"]}
+    regressions = []
+    print(f"baseline: {baseline['meta'].get('version')}  candidate: {candidate['meta'].get('version')}")
+    for result in candidate["results"]:
+        old_metrics = base.get((result["name"], result["size"]))
+        if old_metrics is None:
+            continue
+        print(f"\n{result['name']} @ {result['size']}")
+        for key, new in sorted(result["metrics"].items()):
+            old = old_metrics.get(key)
+            if not isinstance(new, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (new - old) / old
+            worse = -change if key.endswith("_per_second") else change
+            flag = "  REGRESSION" if worse > threshold else ""
+            print(f"  {key:72} {old:>14.6g} -> {new:>14.6g}  {change:+.1%}{flag}")
+            if flag:
+                regressions.append((result["name"], result["size"], key, old, new))
+    return regressions
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("usage: python -m benchmarks.results BASELINE.json CANDIDATE.json")
+        sys.exit(2)
+    found = compare(load_results(sys.argv[1]), load_results(sys.argv[2]))
+    sys.exit(1 if found else 0)
@@ -2,13 +2,36 @@ import os
 
 # --- Project Configuration ---
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(PROJECT_ROOT, "data")
+# HYDEPARK_DATA_DIR relocates all local state (used by the benchmarks to run against a scratch directory)
+DATA_DIR = os.environ.get("HYDEPARK_DATA_DIR") or os.path.join(PROJECT_ROOT, "data")
 LOG_FILE = os.path.join(PROJECT_ROOT, "hydepark_sync.log")
 DRY_RUN = False
 
 # --- Local Database Files ---
 WORKERS_DB = os.path.join(DATA_DIR, "workers.json")
-REQUEST_LOGS_DB = os.path.join(DATA_DIR, "request_logs.json")
+REQUEST_LOGS_DB = os.path.join(DATA_DIR, "request_logs.ndjson")
+PROCESSED_EVENTS_DB = os.path.join(DATA_DIR, "processed_events.ndjson")
+STATS_FILE = os.path.join(DATA_DIR, "stats.json")
+LOG_INDEX_FILE = os.path.join(DATA_DIR, "log_index.ndjson")
+STREAM_JOURNAL_FILE = os.path.join(DATA_DIR, "live_events.ndjson")
+METRICS_SNAPSHOT_FILE = os.path.join(DATA_DIR, "metrics.prom")
+TRACE_FILE = os.path.join(DATA_DIR, "traces.jsonl")
+PROFILE_REQUEST_FILE = os.path.join(DATA_DIR, "profile_request.json")
+PROFILES_DIR = os.path.join(DATA_DIR, "profiles")
+RECONCILE_CHECKPOINT_FILE = os.path.join(DATA_DIR, "reconcile_checkpoint.json")
+BULK_IMPORT_DIR = os.path.join(DATA_DIR, "imports")
+LEADER_LEASE_FILE = os.path.join(DATA_DIR, "leader_lease.json")
+
+# --- Worker Store Group Commit Configuration ---
+# Inside a unit of work (a poll cycle, sweep, reconcile or import batch) worker writes are
+# collected and committed to workers.json together, with one fsync'd write, once this many
+# are pending or the oldest has waited this long
+WORKER_COMMIT_MAX_PENDING = 50
+WORKER_COMMIT_MAX_SECONDS = 2.0
+
+# --- Processed Events Ledger Configuration ---
+# How long a processed event is remembered so a re-delivered event is only re-acknowledged
+EVENT_LEDGER_TTL_SECONDS = 7 * 24 * 3600
 
 # --- Supabase API Configuration ---
 SUPABASE_BASE_URL = "https://xrkxxqhoglrimiljfnml.supabase.co/functions/v1"
@@ -27,9 +50,105 @@ HIKCENTRAL_PRIVILEGE_GROUP_ID = "1"
 HIKCENTRAL_SIGNATURE_MODE = "canonical"
 HIKCENTRAL_ORG_INDEX_CODE = "1"
 
+# --- Multi-Site Configuration ---
+# Each site (a compound or group of gates) has its own HikCentral server, credentials,
+# privilege group and organization. A new worker goes to the site named in its event
+# ("site"), else to the first site with a unit prefix matching its unitNumber, else to
+# DEFAULT_SITE; it then stays on that site for updates, expiry and reconciliation.
+# Every site gets its own client (connection pool, rate limit) and onboarding queue,
+# so a slow or unreachable site only delays its own workers.
+# The HikCentral settings above are the default site. More sites are added as e.g.:
+#
+#   "north-gate": {"base_url": "https://10.127.1.2/artemis", "app_key": "...", "app_secret": "...",
+#                  "privilege_group_id": "3", "org_index_code": "2", "unit_prefixes": ["N-"]},
+#
+# Settings a site leaves out fall back to the default site's.
+DEFAULT_SITE = "default"
+SITES = {
+    DEFAULT_SITE: {
+        "base_url": HIKCENTRAL_BASE_URL,
+        "app_key": HIKCENTRAL_APP_KEY,
+        "app_secret": HIKCENTRAL_APP_SECRET,
+        "privilege_group_id": HIKCENTRAL_PRIVILEGE_GROUP_ID,
+        "org_index_code": HIKCENTRAL_ORG_INDEX_CODE,
+        "signature_mode": HIKCENTRAL_SIGNATURE_MODE,
+        "unit_prefixes": [],
+    },
+}
+# Per-site defaults: pooled HTTP connections and API calls per second (0 = unlimited)
+SITE_MAX_CONNECTIONS = 10
+SITE_MAX_REQUESTS_PER_SECOND = 0
+
 # --- Polling Service Configuration ---
 POLLING_INTERVAL_SECONDS = 60
 
+# --- Leader Lease Configuration ---
+# Only the process holding the lease runs the poll, reconcile, expiry and metrics jobs,
+# so main.py and poller.py (or two copies of either) never poll at the same time.
+# A lease not renewed within the TTL (crashed or hung holder) is taken over.
+LEADER_LEASE_TTL_SECONDS = 30
+LEADER_LEASE_RENEW_SECONDS = 10
+
+# --- Onboarding Pipeline Configuration ---
+# Capacity of the bounded queue in front of each stage
+PIPELINE_QUEUE_SIZE = 16
+# Worker threads per stage, in the pipeline of each site. "dedupe" and "save" always
+# run with a single worker so duplicate detection and workers.json writes stay serialized
+# within a site; across sites, jobs of the same worker or face wait for each other.
+PIPELINE_STAGE_WORKERS = {
+    "fetch": 4,
+    "encode": 2,
+    "dedupe": 1,
+    "hikcentral": 2,
+    "face": 2,
+    "privilege": 2,
+    "save": 1,
+    "ack": 2,
+}
+
+# --- Reconciliation Configuration ---
+# How often the local store is compared against the HikCentral person list
+RECONCILE_INTERVAL_SECONDS = 6 * 3600
+RECONCILE_PAGE_SIZE = 500
+# Number of repairs sent per batch; progress is checkpointed after every page and batch
+RECONCILE_REPAIR_BATCH_SIZE = 50
+# Delete HikCentral persons of our organization that have no local worker.
+# Off by default: the person list also contains persons not managed by this service.
+RECONCILE_DELETE_ORPHANS = False
+
+# --- Bulk Import Configuration ---
+# Rows submitted to the onboarding pipeline between two checkpoints
+BULK_IMPORT_BATCH_SIZE = 200
+
+# --- Expiry Sweeper Configuration ---
+# How often workers whose valid_to has passed are processed
+EXPIRY_SWEEP_INTERVAL_SECONDS = 60
+# "revoke" removes the worker from the privilege group, "delete" deletes the HikCentral person
+EXPIRY_ACTION = "revoke"
+EXPIRY_BATCH_SIZE = 100
+
+# --- Live Stream Configuration ---
+# The live events journal is rotated once it grows past this size
+STREAM_JOURNAL_MAX_BYTES = 5 * 1024 * 1024
+# Seconds between keep-alive comments on idle /stream/logs connections
+STREAM_KEEPALIVE_SECONDS = 15
+
+# --- Metrics Configuration ---
+# How often the poller writes its metrics snapshot for /metrics (also written after every poll cycle)
+METRICS_SNAPSHOT_INTERVAL_SECONDS = 15
+
+# --- Tracing & Profiling Configuration ---
+# Record a span trace of every poll cycle to TRACE_FILE
+TRACING_ENABLED = True
+# The trace file is rotated once it grows past this size
+TRACE_MAX_BYTES = 20 * 1024 * 1024
+# Spans kept per trace; further spans of a very large cycle are counted but not written
+TRACE_MAX_SPANS = 20000
+# Stack sampling interval of the sampling profiler
+PROFILE_SAMPLE_INTERVAL_SECONDS = 0.005
+# Number of profile files kept in PROFILES_DIR
+PROFILE_KEEP_FILES = 20
+
 # --- Web Dashboard Configuration ---
 DASHBOARD_HOST = "0.0.0.0"
 DASHBOARD_PORT = 8090
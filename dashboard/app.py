@@ -1,10 +1,18 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify, stream_with_context, send_from_directory, abort
+from datetime import datetime
 from functools import wraps
 import logging
-from config import DASHBOARD_SECRET_KEY, DASHBOARD_USERNAME, DASHBOARD_PASSWORD, POLLING_INTERVAL_SECONDS
-from database import load_workers, load_request_logs
+from config import DASHBOARD_SECRET_KEY, DASHBOARD_USERNAME, DASHBOARD_PASSWORD, POLLING_INTERVAL_SECONDS, STREAM_KEEPALIVE_SECONDS, METRICS_SNAPSHOT_FILE, PROFILES_DIR
+from database import load_stats, stats_etag, query_workers, query_request_logs, get_request_log
+from utils.export import FORMATS as EXPORT_FORMATS, export_stream, export_filename
+from utils.leader_lease import get_lease_status
+from utils.live_stream import ensure_tailer
+from utils.metrics import REGISTRY
+from utils.profiler import MODES as PROFILE_MODES, request_profile, cancel_profile, get_profile_request, list_profiles
+from utils.tracing import iter_spans, recent_traces, chrome_trace
 import json
 import os
+import queue
 
 logger = logging.getLogger('HydeParkSync.Dashboard')
 
@@ -47,43 +55,77 @@ def logout():
 @app.route('/')
 @login_required
 def dashboard():
-    workers = load_workers()
-    logs = load_request_logs()
-    
-    # Calculate basic stats
-    total_workers = len(workers)
-    total_logs = len(logs)
-    
-    # Get last 5 logs
-    latest_logs = logs[:5]
-    
-    stats = {
-        "total_workers": total_workers,
-        "total_logs": total_logs,
-        "polling_interval": POLLING_INTERVAL_SECONDS
-    }
-    
-    return render_template('dashboard.html', stats=stats, latest_logs=latest_logs)
+    stats = load_stats()
+    stats["polling_interval"] = POLLING_INTERVAL_SECONDS
+    return render_template('dashboard.html', stats=stats, latest_logs=stats["recent_logs"], pipeline=stats["pipeline"],
+                           lease=get_lease_status())
 
 @app.route('/workers')
 @login_required
 def workers_view():
-    workers = load_workers()
-    # Convert dict of workers to a list for easier template iteration
-    workers_list = list(workers.values())
-    return render_template('workers.html', workers=workers_list)
+    # The table is filled page by page from /api/workers
+    return render_template('workers.html')
 
 @app.route('/api-logs')
 @login_required
 def api_logs():
-    logs = load_request_logs()
-    return render_template('api_logs.html', logs=logs)
+    # The table is filled page by page from /api/logs; payloads load when an entry is expanded
+    return render_template('api_logs.html')
+
+MAX_PAGE_SIZE = 500
+
+def _page_args():
+    """Reads limit/offset from the query string."""
+    limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_PAGE_SIZE)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    return limit, offset
+
+@app.route('/api/workers')
+@login_required
+def api_workers():
+    limit, offset = _page_args()
+    items, total = query_workers(
+        status=request.args.get('status') or None,
+        unit_number=request.args.get('unit_number') or None,
+        search=request.args.get('q') or None,
+        sort=request.args.get('sort', 'id'),
+        descending=request.args.get('order') == 'desc',
+        offset=offset,
+        limit=limit,
+    )
+    return jsonify({"items": items, "total": total, "offset": offset, "limit": limit})
+
+@app.route('/api/logs')
+@login_required
+def api_logs_list():
+    """Lists request logs; q searches the log index (national/person IDs, endpoint, status, message words)."""
+    limit, offset = _page_args()
+    success = request.args.get('success')
+    items, total = query_request_logs(
+        api_type=request.args.get('api_type') or None,
+        success={'true': True, 'false': False}.get(success),
+        status_code=request.args.get('status_code') or None,
+        since=request.args.get('since') or None,
+        until=request.args.get('until') or None,
+        search=request.args.get('q') or None,
+        offset=offset,
+        limit=limit,
+    )
+    return jsonify({"items": items, "total": total, "offset": offset, "limit": limit})
+
+@app.route('/api/logs/<log_id>')
+@login_required
+def api_log_detail(log_id):
+    entry = get_request_log(log_id)
+    if entry is None:
+        return jsonify({"error": "Log entry not found"}), 404
+    return jsonify(entry)
 
 @app.route('/settings')
 @login_required
 def settings_view():
     # Load config data to display (excluding secrets)
-    from config import HIKCENTRAL_BASE_URL, SUPABASE_BASE_URL, POLLING_INTERVAL_SECONDS, WORKERS_DB, REQUEST_LOGS_DB
+    from config import HIKCENTRAL_BASE_URL, SUPABASE_BASE_URL, POLLING_INTERVAL_SECONDS, WORKERS_DB, REQUEST_LOGS_DB, SITES
     
     settings = {
         "HIKCENTRAL_BASE_URL": HIKCENTRAL_BASE_URL,
@@ -93,21 +135,153 @@ def settings_view():
         "REQUEST_LOGS_DB_PATH": REQUEST_LOGS_DB,
         "DASHBOARD_PORT": app.config.get('SERVER_NAME', '').split(':')[-1] if app.config.get('SERVER_NAME') else 8080
     }
+    sites = [{"name": name, "base_url": site.get("base_url", HIKCENTRAL_BASE_URL), "privilege_group_id": site.get("privilege_group_id"),
+              "unit_prefixes": site.get("unit_prefixes") or []} for name, site in SITES.items()]
     
-    return render_template('settings.html', settings=settings)
+    return render_template('settings.html', settings=settings, sites=sites)
 
 @app.route('/api/stats')
 @login_required
 def api_stats():
-    workers = load_workers()
-    logs = load_request_logs()
-    
-    stats = {
-        "total_workers": len(workers),
-        "total_logs": len(logs),
-        "last_log_timestamp": logs[0]['timestamp'] if logs else "N/A"
-    }
-    return jsonify(stats)
+    # The stats file is kept up to date by the writers; an unchanged file is answered with 304 without reading it
+    etag = stats_etag()
+    if etag and etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        stats = load_stats()
+        response = jsonify({
+            "total_workers": stats["total_workers"],
+            "workers_by_status": stats["workers_by_status"],
+            "total_logs": stats["total_logs"],
+            "logs_by_api": stats["logs_by_api"],
+            "last_log_timestamp": stats["last_log_timestamp"] or "N/A",
+            "last_event_time": stats["last_event_time"],
+            "event_ledger": stats["event_ledger"],
+            "pipeline": stats["pipeline"],
+            "updated_at": stats["updated_at"],
+        })
+    if etag:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/stream/logs')
+@login_required
+def stream_logs():
+    """Server-Sent Events stream of new request logs ("log") and processing progress ("progress")."""
+    broadcaster = ensure_tailer()
+    subscriber = broadcaster.subscribe()
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = subscriber.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                payload = json.dumps(event.get("data"), ensure_ascii=False)
+                yield f"id: {event.get('id')}\nevent: {event.get('kind')}\ndata: {payload}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# --- Exports (streamed, so large stores don't block a worker or load into memory) ---
+
+@app.route('/export/<dataset>')
+@login_required
+def export(dataset):
+    """Downloads the workers or the request logs as NDJSON or CSV (?format=), gzipped with ?gzip=1."""
+    fmt = request.args.get('format', 'ndjson')
+    gzip = request.args.get('gzip') in ('1', 'true')
+    if dataset == 'workers':
+        filters = {"status": request.args.get('status'), "unit_number": request.args.get('unit_number')}
+    elif dataset == 'logs':
+        filters = {"api_type": request.args.get('api_type'), "since": request.args.get('since'), "until": request.args.get('until')}
+    else:
+        abort(404)
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    mimetype = 'application/gzip' if gzip else {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}[fmt]
+    response = Response(stream_with_context(export_stream(dataset, fmt, gzip, **filters)), mimetype=mimetype)
+    filename = export_filename(dataset, fmt, gzip, stamp=datetime.now().strftime('%Y%m%d-%H%M%S'))
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# --- Diagnostics (tracing and profiling) ---
+
+MAX_PROFILE_CYCLES = 20
+
+@app.route('/diagnostics')
+@login_required
+def diagnostics():
+    traces = recent_traces()
+    for trace in traces:
+        trace["started_at"] = datetime.fromtimestamp(trace["start"]).isoformat(timespec='seconds')
+    return render_template('diagnostics.html', traces=traces, profiles=list_profiles(),
+                           profile_request=get_profile_request(), max_cycles=MAX_PROFILE_CYCLES)
+
+@app.route('/diagnostics/profile', methods=['POST'])
+@login_required
+def diagnostics_profile():
+    mode = request.form.get('mode', 'sampling')
+    cycles = request.form.get('cycles', 1, type=int) or 1
+    if mode not in PROFILE_MODES:
+        abort(400)
+    request_profile(mode, min(cycles, MAX_PROFILE_CYCLES))
+    return redirect(url_for('diagnostics'))
+
+@app.route('/diagnostics/profile/cancel', methods=['POST'])
+@login_required
+def diagnostics_profile_cancel():
+    cancel_profile()
+    return redirect(url_for('diagnostics'))
+
+@app.route('/diagnostics/profiles/<name>')
+@login_required
+def diagnostics_profile_download(name):
+    if name not in {p["name"] for p in list_profiles()}:
+        abort(404)
+    return send_from_directory(PROFILES_DIR, name, as_attachment=True)
+
+@app.route('/diagnostics/traces')
+@login_required
+def diagnostics_traces():
+    """Downloads the stored traces (optionally one trace_id) as JSONL or in the Chrome trace format."""
+    trace_id = request.args.get('trace_id')
+    spans = (s for s in iter_spans() if not trace_id or s.get("trace_id") == trace_id)
+    suffix = trace_id[:8] if trace_id else "all"
+    if request.args.get('format') == 'chrome':
+        response = Response(json.dumps(chrome_trace(spans)), mimetype='application/json')
+        filename = f"trace-{suffix}.json"
+    else:
+        lines = (json.dumps(s, ensure_ascii=False) + "\n" for s in spans)
+        response = Response(stream_with_context(lines), mimetype='application/x-ndjson')
+        filename = f"trace-{suffix}.jsonl"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """
+    Prometheus scrape endpoint (no login, scrapers don't hold a session).
+    Serves the snapshot written by the poller; falls back to this process's own registry.
+    """
+    try:
+        with open(METRICS_SNAPSHOT_FILE, 'r', encoding='utf-8') as f:
+            body = f.read()
+    except FileNotFoundError:
+        body = REGISTRY.render()
+    response = Response(body, mimetype='text/plain')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 # Create static directory for CSS/JS
 os.makedirs(os.path.join(app.root_path, 'static'), exist_ok=True)
@@ -0,0 +1,69 @@
+// Server-side paged tables: the filter form is sent as query parameters to a JSON
+// endpoint returning {items, total, offset, limit}, and only the current page is rendered.
+function escapeHtml(value) {
+    if (value === null || value === undefined) {
+        return '';
+    }
+    return String(value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;');
+}
+
+function pagedTable(options) {
+    var form = document.getElementById(options.form);
+    var tbody = document.getElementById(options.tbody);
+    var pager = document.getElementById(options.pager);
+    var limit = options.limit || 50;
+    var offset = 0;
+
+    function query() {
+        var params = new URLSearchParams(new FormData(form));
+        Array.from(params.keys()).forEach(function (key) {
+            if (!params.get(key)) {
+                params.delete(key);
+            }
+        });
+        params.set('limit', limit);
+        params.set('offset', offset);
+        return params;
+    }
+
+    function renderPager(data) {
+        var last = Math.min(data.offset + data.items.length, data.total);
+        pager.innerHTML =
+            '<button type="button" data-move="-1"' + (data.offset > 0 ? '' : ' disabled') + '>السابق</button>' +
+            '<span>' + (data.total ? data.offset + 1 : 0) + ' - ' + last + ' من ' + data.total + '</span>' +
+            '<button type="button" data-move="1"' + (last < data.total ? '' : ' disabled') + '>التالي</button>';
+    }
+
+    function load() {
+        return fetch(options.url + '?' + query().toString(), {credentials: 'same-origin'})
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                tbody.innerHTML = data.items.length
+                    ? data.items.map(options.renderRow).join('')
+                    : '<tr><td colspan="' + options.columns + '">' + options.emptyText + '</td></tr>';
+                renderPager(data);
+                if (options.onLoad) {
+                    options.onLoad(data);
+                }
+            });
+    }
+
+    form.addEventListener('submit', function (event) {
+        event.preventDefault();
+        offset = 0;
+        load();
+    });
+    pager.addEventListener('click', function (event) {
+        var move = event.target.getAttribute('data-move');
+        if (move) {
+            offset = Math.max(offset + parseInt(move, 10) * limit, 0);
+            load();
+        }
+    });
+    load();
+    return {reload: load, isFirstPage: function () { return offset === 0; }};
+}
@@ -1,10 +1,25 @@
+import collections
+import copy
 import json
 import os
+import re
+import time
 import logging
-from config import WORKERS_DB, REQUEST_LOGS_DB
+import threading
+import uuid
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from config import DEFAULT_SITE, WORKERS_DB, REQUEST_LOGS_DB, PROCESSED_EVENTS_DB, EVENT_LEDGER_TTL_SECONDS, STATS_FILE, LOG_INDEX_FILE, RECONCILE_CHECKPOINT_FILE, BULK_IMPORT_DIR, WORKER_COMMIT_MAX_PENDING, WORKER_COMMIT_MAX_SECONDS
+from models import Worker
+from utils.live_stream import publish_stream_event
+from utils.metrics import STORE_WRITE_SECONDS, EVENT_LEDGER_LOOKUPS
+from utils.tracing import span
 
 logger = logging.getLogger('HydeParkSync.DB')
 
+# Serializes load-modify-save sequences when several threads write the JSON files (e.g. the onboarding pipeline)
+_db_lock = threading.RLock()
+
 def _load_data(file_path, default_data):
     """Loads data from a JSON file, or returns default data if the file is not found."""
     if not os.path.exists(file_path):
@@ -13,7 +28,7 @@ def _load_data(file_path, default_data):
         return default_data
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with span("store.read", store=os.path.basename(file_path)), open(file_path, 'r', encoding='utf-8') as f:
             return json.load(f)
     except json.JSONDecodeError:
         logger.error(f"Error decoding JSON from {file_path}. Returning default data.")
@@ -22,26 +37,198 @@ def _load_data(file_path, default_data):
         logger.error(f"An unexpected error occurred while loading {file_path}: {e}")
         return default_data
 
-def _save_data(file_path, data):
-    """Saves data to a JSON file."""
+def _save_data(file_path, data, fsync=False):
+    """
+    Saves data to a JSON file. Writes to a temporary file first so readers never see a partial file.
+    With fsync, the file and the rename are flushed to disk before returning.
+    """
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        store = os.path.basename(file_path)
+        with STORE_WRITE_SECONDS.labels(store).time(), span("store.write", store=store):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4, ensure_ascii=False, default=_to_json)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+            if fsync:
+                _fsync_dir(os.path.dirname(file_path))
         return True
     except Exception as e:
         logger.error(f"Error saving data to {file_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return False
 
+def _to_json(value):
+    # Records stored as objects (models.Worker) are written in their store form
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on this platform
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+_READ_CHUNK_SIZE = 64 * 1024
+_decoder = json.JSONDecoder()
+
+def _iter_data(file_path):
+    """
+    Streams the top-level items of a JSON file without loading all of it: the elements
+    of a list, or (key, value) pairs of an object. Memory stays at about one item.
+    The open handle keeps reading the file it opened, even if _save_data replaces it meanwhile.
+    """
+    if not os.path.exists(file_path):
+        return
+    # No trace span here: a span would stay open across the yields into the consumer's code
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def fill():
+            # Drops the consumed part of the buffer and appends the next chunk; False at end of file
+            nonlocal buffer, pos, eof
+            chunk = f.read(_READ_CHUNK_SIZE)
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            eof = not chunk
+            return bool(chunk)
+
+        def next_char():
+            # Skips whitespace and returns the next significant character ("" at end of file)
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buffer) or not fill():
+                    return buffer[pos:pos + 1]
+
+        def decode():
+            # Decodes the next value, reading more of the file until it is complete
+            nonlocal pos
+            next_char()
+            while True:
+                try:
+                    value, end = _decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof or not fill():
+                        raise
+                    continue
+                # A number at the end of the buffer may continue in the next chunk
+                if end == len(buffer) and not eof and fill():
+                    continue
+                pos = end
+                return value
+
+        opening = next_char()
+        if opening not in ("[", "{"):
+            raise json.JSONDecodeError("Expected a JSON list or object", buffer, pos)
+        closing = "]" if opening == "[" else "}"
+        pos += 1
+        while True:
+            char = next_char()
+            if char == closing:
+                return
+            if char == ",":
+                pos += 1
+                continue
+            if not char:
+                raise json.JSONDecodeError("Unexpected end of file", buffer, pos)
+            if opening == "[":
+                yield decode()
+            else:
+                key = decode()
+                if next_char() != ":":
+                    raise json.JSONDecodeError("Expected ':'", buffer, pos)
+                pos += 1
+                yield key, decode()
+
 # --- Workers Database Functions ---
 
+_workers_written_mtime = None  # st_mtime_ns of workers.json right after this process last wrote it
+
+def _save_workers_file(workers, fsync=False):
+    global _workers_written_mtime
+    saved = _save_data(WORKERS_DB, workers, fsync=fsync)
+    if saved:
+        _workers_written_mtime = os.stat(WORKERS_DB).st_mtime_ns
+    return saved
+
+def workers_file_state():
+    """Returns the mtime (ns) of workers.json, or None if missing, and whether this process wrote that version."""
+    with _db_lock:
+        try:
+            mtime = os.stat(WORKERS_DB).st_mtime_ns
+        except FileNotFoundError:
+            return None, False
+        return mtime, mtime == _workers_written_mtime
+
 def load_workers():
-    """Loads the workers database."""
+    """
+    Loads the workers database as Worker records by ID, including the uncommitted
+    changes of the active unit of work.
+    """
     # The workers database is a dictionary where the key is the worker ID
-    return _load_data(WORKERS_DB, {})
+    workers = {worker_id: Worker.from_dict(data) for worker_id, data in _load_data(WORKERS_DB, {}).items()}
+    unit = _active_unit
+    if unit is not None:
+        unit.overlay(workers)
+    return workers
+
+# Fields left out of worker listings; they are large and only used by the processor
+_WORKER_INTERNAL_FIELDS = ("face_encoding", "sync_fingerprint")
+_WORKER_SORT_FIELDS = ("id", "name", "national_id", "status", "unit_number", "valid_from", "valid_to")
+
+def query_workers(status=None, unit_number=None, search=None, sort="id", descending=False, offset=0, limit=50):
+    """
+    Returns one page of workers matching the filters as (items, total).
+    Items are summaries without the face encoding and sync fingerprint.
+    """
+    workers = load_workers()
+    search = (search or "").strip().lower()
+    matched = []
+    for w in workers.values():
+        if status and str(w.get('status')) != status:
+            continue
+        if unit_number and str(w.get('unit_number')) != unit_number:
+            continue
+        if search and search not in f"{w.get('id')} {w.get('name')} {w.get('national_id')}".lower():
+            continue
+        matched.append(w)
+    if sort not in _WORKER_SORT_FIELDS:
+        sort = "id"
+    matched.sort(key=lambda w: str(w.get(sort) or ""), reverse=descending)
+    page = matched[offset:offset + limit]
+    items = [{k: v for k, v in w.to_dict().items() if k not in _WORKER_INTERNAL_FIELDS} for w in page]
+    return items, len(matched)
+
+def iter_workers(include_internal=False):
+    """Streams the workers one at a time, by default without the face encoding and sync fingerprint."""
+    for _, worker in _iter_data(WORKERS_DB):
+        if not include_internal:
+            worker = {k: v for k, v in worker.items() if k not in _WORKER_INTERNAL_FIELDS}
+        yield worker
 
 def save_workers(workers_data):
     """Saves the workers database."""
-    return _save_data(WORKERS_DB, workers_data)
+    with _db_lock:
+        if _active_unit is not None:
+            _active_unit.commit()  # Pending changes would otherwise be applied on top of workers_data
+        saved = _save_workers_file(workers_data)
+        if saved:
+            _update_stats(lambda stats: _recount_workers(stats, workers_data))
+        return saved
 
 def get_worker(worker_id):
     """Retrieves a single worker by ID."""
@@ -49,44 +236,947 @@ def get_worker(worker_id):
     return workers.get(str(worker_id))
 
 def add_or_update_worker(worker_data):
-    """Adds a new worker or updates an existing one."""
-    workers = load_workers()
-    worker_id = str(worker_data.get('id'))
-    if not worker_id:
-        logger.error("Attempted to add/update worker without an ID.")
-        return False
-    
-    workers[worker_id] = worker_data
-    return save_workers(workers)
+    """Adds a new worker or updates an existing one. Inside a unit of work the write is deferred to its commit."""
+    with _db_lock:
+        worker_id = str(worker_data.get('id'))
+        if not worker_id:
+            logger.error("Attempted to add/update worker without an ID.")
+            return False
+        worker_data = Worker.coerce(worker_data)
+        if _active_unit is not None:
+            _active_unit.put(worker_id, worker_data)
+            return True
+        _ensure_stats()
+        workers = _load_data(WORKERS_DB, {})  # Store form: only the new record needs converting
+
+        previous = workers.get(worker_id)
+        workers[worker_id] = worker_data
+        saved = _save_workers_file(workers)
+        if saved:
+            def count(stats):
+                if previous is not None:
+                    _count_worker(stats, previous, -1)
+                _count_worker(stats, worker_data, 1)
+            _update_stats(count)
+        return saved
 
 def delete_worker(worker_id):
-    """Deletes a worker by ID."""
-    workers = load_workers()
-    worker_id = str(worker_id)
-    if worker_id in workers:
-        del workers[worker_id]
-        return save_workers(workers)
-    return False
+    """Deletes a worker by ID. Inside a unit of work the write is deferred to its commit."""
+    with _db_lock:
+        _ensure_stats()
+        workers = load_workers() if _active_unit is not None else _load_data(WORKERS_DB, {})
+        worker_id = str(worker_id)
+        if worker_id in workers and _active_unit is not None:
+            _active_unit.put(worker_id, None)
+            return True
+        if worker_id in workers:
+            previous = workers.pop(worker_id)
+            saved = _save_workers_file(workers)
+            if saved:
+                _update_stats(lambda stats: _count_worker(stats, previous, -1))
+            return saved
+        return False
+
+# --- Worker Unit of Work (group commit) ---
+# Every add_or_update_worker/delete_worker used to rewrite all of workers.json. Inside
+# worker_unit_of_work() they are collected instead and committed together: one load,
+# one fsync'd write and one stats update per commit. A commit happens once
+# WORKER_COMMIT_MAX_PENDING changes are pending, WORKER_COMMIT_MAX_SECONDS after the
+# oldest one, and when a unit-of-work block is left. load_workers() applies the pending
+# changes on top of the file, so readers in this process see their own writes.
+# Side effects that must not happen before the write is durable (acknowledging an event)
+# are queued with after_worker_commit(). Processed-event ledger lines recorded meanwhile
+# are appended to the ledger journal by the same commit, before workers.json is written.
+# Work that outlives a block (the poll lanes, see processors.event_processor) holds the
+# unit with enter_worker_unit_of_work()/leave_worker_unit_of_work() instead.
+
+_active_unit = None
+_active_unit_users = 0  # Blocks and holders currently inside _active_unit
+
+class WorkerUnitOfWork:
+    def __init__(self, max_pending=WORKER_COMMIT_MAX_PENDING, max_delay=WORKER_COMMIT_MAX_SECONDS):
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self.commits = 0
+        self._pending = {}  # Worker ID -> worker, or None for a deletion
+        self._ledger_lines = []
+        self._callbacks = []
+        self._timer = None
+
+    def put(self, worker_id, worker):
+        with _db_lock:
+            self._pending[worker_id] = worker
+            full = len(self._pending) >= self.max_pending
+            if not full and self._timer is None:
+                self._start_timer()
+        if full:
+            self.commit()
+
+    def put_ledger_line(self, line):
+        with _db_lock:
+            self._ledger_lines.append(line)
+            if self._timer is None:
+                self._start_timer()
+
+    def _start_timer(self):
+        self._timer = threading.Timer(self.max_delay, self.commit)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def overlay(self, workers):
+        with _db_lock:
+            for worker_id, worker in self._pending.items():
+                if worker is None:
+                    workers.pop(worker_id, None)
+                else:
+                    workers[worker_id] = worker
+
+    def after_commit(self, callback):
+        """Runs callback once the changes pending now are committed (right away if there are none)."""
+        with _db_lock:
+            if self._pending:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def commit(self):
+        """Writes the pending ledger lines and worker changes. Returns False if a write failed; they stay pending."""
+        with _db_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            callbacks, self._callbacks = self._callbacks, []
+            if self._ledger_lines:
+                if not _write_ledger_lines(self._ledger_lines):
+                    logger.error(f"Appending {len(self._ledger_lines)} ledger lines failed; retrying later.")
+                    self._callbacks = callbacks + self._callbacks
+                    self._start_timer()
+                    return False
+                self._ledger_lines = []
+            if self._pending:
+                _ensure_stats()
+                workers = _load_data(WORKERS_DB, {})
+                changes = []
+                for worker_id, worker in self._pending.items():
+                    previous = workers.pop(worker_id, None)
+                    if worker is not None:
+                        workers[worker_id] = worker
+                    changes.append((previous, worker))
+                if not _save_workers_file(workers, fsync=True):
+                    logger.error(f"Group commit of {len(self._pending)} worker changes failed; retrying later.")
+                    self._callbacks = callbacks + self._callbacks
+                    self._start_timer()
+                    return False
+
+                def count(stats):
+                    for previous, worker in changes:
+                        if previous is not None:
+                            _count_worker(stats, previous, -1)
+                        if worker is not None:
+                            _count_worker(stats, worker, 1)
+                _update_stats(count)
+                self._pending = {}
+                self.commits += 1
+        # Outside the lock: callbacks make network calls
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"After-commit callback failed: {e}")
+        return True
+
+    def close(self):
+        with _db_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._pending or self._ledger_lines:
+                logger.error(f"{len(self._pending)} worker changes and {len(self._ledger_lines)} ledger lines were not committed.")
+
+def enter_worker_unit_of_work(max_pending=WORKER_COMMIT_MAX_PENDING, max_delay=WORKER_COMMIT_MAX_SECONDS):
+    """
+    Starts grouping the worker writes of this process (all threads), or joins the active
+    unit of work. Returns the unit; pass it to leave_worker_unit_of_work().
+    """
+    global _active_unit, _active_unit_users
+    with _db_lock:
+        if _active_unit is None:
+            _active_unit = WorkerUnitOfWork(max_pending, max_delay)
+        _active_unit_users += 1
+        return _active_unit
+
+def leave_worker_unit_of_work(unit):
+    """Commits the pending writes; the unit is deactivated once everyone who entered it left."""
+    global _active_unit, _active_unit_users
+    try:
+        unit.commit()
+    finally:
+        with _db_lock:
+            _active_unit_users -= 1
+            last = _active_unit_users == 0
+            if last:
+                _active_unit = None
+        if last:
+            unit.commit()  # Changes put between the commit and the deactivation
+            unit.close()
+
+@contextmanager
+def worker_unit_of_work(max_pending=WORKER_COMMIT_MAX_PENDING, max_delay=WORKER_COMMIT_MAX_SECONDS):
+    """
+    Groups the worker writes of this process (all threads) until the block is left.
+    Blocks entered while one is active share it; leaving any of them commits.
+    """
+    unit = enter_worker_unit_of_work(max_pending, max_delay)
+    try:
+        yield unit
+    finally:
+        leave_worker_unit_of_work(unit)
+
+def after_worker_commit(callback):
+    """Runs callback after the pending worker writes are durable; right away outside a unit of work."""
+    unit = _active_unit
+    if unit is None:
+        callback()
+    else:
+        unit.after_commit(callback)
+
+# --- Processed Events Ledger Functions ---
+# The ledger remembers which (event, worker) pairs were already applied to HikCentral,
+# so an event that comes back because its acknowledgement was lost is only re-acknowledged.
+# It is an append-only journal: every change is one line merging into its event's entry
+# ({"event", "at", "workers": {key: fields}, "acked"}). Inside a worker unit of work the
+# lines are appended when the unit commits, otherwise right away. Each process keeps the
+# replayed entries in memory and reads only the lines appended since its last lookup.
+# compact_event_ledger() rewrites the journal with one line per live entry once entries
+# expire or the journal holds _LEDGER_COMPACT_FACTOR times more lines than entries.
+
+_LEDGER_COMPACT_FACTOR = 4
+_LEGACY_LEDGER_DB = os.path.join(os.path.dirname(PROCESSED_EVENTS_DB), "processed_events.json")
+
+_ledger_lookups = {"hits": 0, "misses": 0}
+
+class _Ledger:
+    def __init__(self):
+        self.events = {}  # Event ID -> {"acked", "workers", "updated_at"}
+        self.lines = 0
+        self.offset = 0
+        self.inode = None
+
+    def _apply(self, line):
+        entry = self.events.setdefault(line["event"], {"acked": False, "workers": {}})
+        for key, fields in (line.get("workers") or {}).items():
+            entry["workers"].setdefault(key, {}).update(fields)
+        if line.get("acked"):
+            entry["acked"] = True
+        entry["updated_at"] = line["at"]
+
+    def refresh(self):
+        """Replays the lines appended to the journal since the last call (all of it after a compaction)."""
+        if not os.path.exists(PROCESSED_EVENTS_DB):
+            _migrate_legacy_ledger()
+        try:
+            stat = os.stat(PROCESSED_EVENTS_DB)
+        except FileNotFoundError:
+            self.events, self.lines, self.offset, self.inode = {}, 0, 0, None
+            return
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.events, self.lines, self.offset, self.inode = {}, 0, 0, stat.st_ino
+        if stat.st_size == self.offset:
+            return
+        with open(PROCESSED_EVENTS_DB, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        complete = data.rfind(b"\n") + 1
+        self.offset += complete
+        for raw in data[:complete].splitlines():
+            try:
+                line = json.loads(raw)
+            except ValueError:
+                logger.error(f"Skipping a corrupt line of {PROCESSED_EVENTS_DB}.")
+                continue
+            self._apply(line)
+            self.lines += 1
+
+    def append(self, lines):
+        """Applies lines and appends them to the journal. Returns False if the write failed."""
+        try:
+            size = os.path.getsize(PROCESSED_EVENTS_DB) if os.path.exists(PROCESSED_EVENTS_DB) else 0
+            with open(PROCESSED_EVENTS_DB, 'a', encoding='utf-8') as f:
+                f.write("".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines))
+                f.flush()
+                stat = os.fstat(f.fileno())
+        except Exception as e:
+            logger.error(f"Error appending to {PROCESSED_EVENTS_DB}: {e}")
+            return False
+        for line in lines:
+            self._apply(line)
+        self.lines += len(lines)
+        if size == self.offset and stat.st_ino == self.inode:
+            self.offset = stat.st_size  # Nothing else was appended in between: our lines are read already
+        return True
+
+    def rewrite(self):
+        """Writes one line per entry, replacing the journal."""
+        tmp_path = f"{PROCESSED_EVENTS_DB}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for event_id, entry in self.events.items():
+                    line = {"event": event_id, "at": entry.get("updated_at", 0), "workers": entry["workers"], "acked": entry["acked"]}
+                    f.write(json.dumps(line, ensure_ascii=False) + "\n")
+                stat = os.fstat(f.fileno())
+            os.replace(tmp_path, PROCESSED_EVENTS_DB)
+        except Exception as e:
+            logger.error(f"Error rewriting {PROCESSED_EVENTS_DB}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self.lines, self.offset, self.inode = len(self.events), stat.st_size, stat.st_ino
+        return True
+
+_ledger = _Ledger()
+
+def _migrate_legacy_ledger():
+    # Ledgers written before the journal were a single JSON document
+    if not os.path.exists(_LEGACY_LEDGER_DB):
+        return
+    legacy = _load_data(_LEGACY_LEDGER_DB, {"events": {}})
+    lines = [{"event": event_id, "at": entry.get("updated_at", 0), "workers": entry.get("workers") or {}, "acked": entry.get("acked", False)}
+             for event_id, entry in legacy.get("events", {}).items()]
+    if _ledger.append(lines):
+        os.remove(_LEGACY_LEDGER_DB)
+        logger.info(f"Moved {len(lines)} ledger entries from {_LEGACY_LEDGER_DB} to {PROCESSED_EVENTS_DB}.")
+
+def _update_ledger_stats():
+    """Folds the lookup counters gathered since the last call into the dashboard stats."""
+    lookups = dict(_ledger_lookups)
+    for key in lookups:
+        _ledger_lookups[key] = 0
+    entries = len(_ledger.events)
+
+    def fold(stats):
+        summary = stats["event_ledger"]
+        hits = summary.get("hits", 0) + lookups["hits"]
+        misses = summary.get("misses", 0) + lookups["misses"]
+        stats["event_ledger"] = {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
+    return _update_stats(fold)
+
+def _write_ledger_lines(lines):
+    """Appends journal lines now and updates the ledger summary of the dashboard stats."""
+    with _db_lock:
+        if not _ledger.append(lines):
+            return False
+        _update_ledger_stats()
+        return True
+
+def _record_ledger_line(line):
+    line = copy.deepcopy(line)  # Callers keep changing the lists they pass (steps)
+    with _db_lock:
+        _ledger.refresh()
+        unit = _active_unit
+        if unit is not None:
+            _ledger._apply(line)  # Visible to lookups in this process now, written when the unit commits
+            unit.put_ledger_line(line)
+            return True
+        return _write_ledger_lines([line])
+
+def load_event_ledger():
+    """Returns the processed events ledger as {"events": {event ID: entry}}."""
+    with _db_lock:
+        _ledger.refresh()
+        return {"events": copy.deepcopy(_ledger.events)}
+
+def get_processed_worker(event_id, worker_key):
+    """
+    Returns the ledger record of a worker within an event, or None.
+    Only completed records count as a hit; partial records are returned so finished steps can be skipped.
+    """
+    with _db_lock:
+        _ledger.refresh()
+        entry = _ledger.events.get(str(event_id))
+        record = (entry or {}).get("workers", {}).get(str(worker_key))
+        if record and record.get("status") == "complete":
+            _ledger_lookups["hits"] += 1
+            EVENT_LEDGER_LOOKUPS.labels("hit").inc()
+        else:
+            _ledger_lookups["misses"] += 1
+            EVENT_LEDGER_LOOKUPS.labels("miss").inc()
+        return copy.deepcopy(record)
+
+def record_processed_worker(event_id, worker_key, **result):
+    """Merges a worker sub-result (status, hikcentral_person_id, steps, ...) into the ledger."""
+    return _record_ledger_line({"event": str(event_id), "at": time.time(), "workers": {str(worker_key): result}})
+
+def mark_event_acked(event_id):
+    """Records that the completion of an event was acknowledged by Supabase."""
+    with _db_lock:
+        _ledger.refresh()
+        if str(event_id) not in _ledger.events:
+            return False
+        return _record_ledger_line({"event": str(event_id), "at": time.time(), "acked": True})
+
+def compact_event_ledger(ttl_seconds=EVENT_LEDGER_TTL_SECONDS):
+    """Drops ledger entries not touched within the TTL. Returns the number of entries removed."""
+    with _db_lock:
+        _ledger.refresh()
+        cutoff = time.time() - ttl_seconds
+        expired = [eid for eid, entry in _ledger.events.items() if entry.get("updated_at", 0) < cutoff]
+        for eid in expired:
+            del _ledger.events[eid]
+        if expired or _ledger.lines > _LEDGER_COMPACT_FACTOR * max(len(_ledger.events), 1):
+            _ledger.rewrite()
+        if expired or any(_ledger_lookups.values()):
+            _update_ledger_stats()
+        if expired:
+            logger.info(f"Compacted event ledger: removed {len(expired)} expired entries.")
+        return len(expired)
+
+def get_event_ledger_stats():
+    """Returns the ledger size and hit rate of lookups, as of the last ledger write or compaction."""
+    return load_stats()["event_ledger"]
+
+# --- Pipeline Stats Functions ---
+
+def save_pipeline_stats(stats):
+    """Saves the per-stage stats of the onboarding pipelines (counted since they were started)."""
+    pipeline = {"updated_at": datetime.now().isoformat(), "stages": stats}
+    return _update_stats(lambda s: s.__setitem__("pipeline", pipeline))
+
+def load_pipeline_stats():
+    """Loads the per-stage stats of the onboarding pipelines."""
+    return load_stats()["pipeline"]
+
+# --- Dashboard Stats Functions ---
+# Counters are adjusted on every write to the workers store (the log counters are
+# recounted in batches, see add_request_log), so the dashboard reads one small file
+# instead of parsing workers.json and the request logs on each refresh.
+
+RECENT_LOGS_IN_STATS = 5
+
+def _empty_stats():
+    return {
+        "version": 0,
+        "updated_at": None,
+        "total_workers": 0,
+        "workers_by_status": {},
+        "total_logs": 0,
+        "logs_by_api": {},
+        "last_log_timestamp": None,
+        "recent_logs": [],
+        "last_event_time": None,
+        "event_ledger": {"entries": 0, "hits": 0, "misses": 0, "hit_rate": 0.0},
+        "pipeline": {"updated_at": None, "stages": {}},
+    }
+
+def _adjust(counter, key, delta):
+    counter[key] = counter.get(key, 0) + delta
+    if counter[key] <= 0:
+        del counter[key]
+
+def _count_worker(stats, worker, delta):
+    stats["total_workers"] += delta
+    _adjust(stats["workers_by_status"], str(worker.get("status") or "unknown"), delta)
+
+def _recount_workers(stats, workers):
+    stats["total_workers"] = 0
+    stats["workers_by_status"] = {}
+    for worker in workers.values():
+        _count_worker(stats, worker, 1)
+
+def _count_log(stats, log_entry, delta):
+    stats["total_logs"] += delta
+    by_outcome = stats["logs_by_api"].setdefault(str(log_entry.get("api_type")), {})
+    _adjust(by_outcome, "success" if log_entry.get("success") else "failure", delta)
+
+def _set_log_stats(stats, logs):
+    """Recounts the log counters from the live entries (newest first)."""
+    stats["total_logs"] = 0
+    stats["logs_by_api"] = {}
+    for entry in logs:
+        _count_log(stats, entry, 1)
+    stats["recent_logs"] = [_log_summary(entry) for entry in logs[:RECENT_LOGS_IN_STATS]]
+    stats["last_log_timestamp"] = logs[0].get("timestamp") if logs else None
+
+def rebuild_stats():
+    """Recomputes the stats from the full stores. Used when the stats file is missing or unreadable."""
+    global _log_stats_dirty
+    with _db_lock:
+        stats = _empty_stats()
+        _recount_workers(stats, load_workers())
+        _log_stats_dirty = False
+        _set_log_stats(stats, load_request_logs())
+        stats["updated_at"] = datetime.now().isoformat()
+        _save_data(STATS_FILE, stats)
+        return stats
+
+def load_stats():
+    """Loads the dashboard stats."""
+    stats = _load_data(STATS_FILE, None) if os.path.exists(STATS_FILE) else None
+    if stats is None:
+        return rebuild_stats()
+    return stats
+
+def _ensure_stats():
+    # Called before a store is written, so a first-time rebuild does not count that write twice
+    if not os.path.exists(STATS_FILE):
+        rebuild_stats()
+
+def stats_etag():
+    """Returns a validator that changes whenever the stats file is rewritten, without reading it."""
+    try:
+        st = os.stat(STATS_FILE)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+def _update_stats(mutate):
+    global _log_stats_dirty, _log_stats_folded_at
+    with _db_lock:
+        stats = load_stats()
+        if _log_stats_dirty:
+            # Request logs added since the last stats write (see add_request_log)
+            _log_stats_dirty = False
+            _log_stats_folded_at = time.monotonic()
+            _set_log_stats(stats, load_request_logs())
+        mutate(stats)
+        stats["version"] = stats.get("version", 0) + 1
+        stats["updated_at"] = datetime.now().isoformat()
+        return _save_data(STATS_FILE, stats)
+
+def record_event_time():
+    """Records when the poller last processed an event."""
+    now = datetime.now().isoformat()
+    return _update_stats(lambda stats: stats.__setitem__("last_event_time", now))
+
+# --- Reconciliation Checkpoint Functions ---
+
+def _reconcile_checkpoint_path(site):
+    # The default site keeps the checkpoint file of single-site installs
+    if site == DEFAULT_SITE:
+        return RECONCILE_CHECKPOINT_FILE
+    root, ext = os.path.splitext(RECONCILE_CHECKPOINT_FILE)
+    return f"{root}.{site}{ext}"
+
+def load_reconcile_checkpoint(site=DEFAULT_SITE):
+    """Loads the reconciliation checkpoint of a site, or None if no run was recorded."""
+    path = _reconcile_checkpoint_path(site)
+    if not os.path.exists(path):
+        return None
+    return _load_data(path, None)
+
+def save_reconcile_checkpoint(checkpoint, site=DEFAULT_SITE):
+    """Saves the reconciliation checkpoint of a site."""
+    return _save_data(_reconcile_checkpoint_path(site), checkpoint)
+
+# --- Bulk Import Checkpoint Functions ---
+
+def _bulk_import_checkpoint_path(import_id):
+    return os.path.join(BULK_IMPORT_DIR, f"{import_id}.json")
+
+def load_bulk_import_checkpoint(import_id):
+    """Loads the checkpoint of a bulk import, or None if it never ran."""
+    path = _bulk_import_checkpoint_path(import_id)
+    if not os.path.exists(path):
+        return None
+    return _load_data(path, None)
+
+def save_bulk_import_checkpoint(checkpoint):
+    """Saves the checkpoint of a bulk import."""
+    os.makedirs(BULK_IMPORT_DIR, exist_ok=True)
+    return _save_data(_bulk_import_checkpoint_path(checkpoint["import_id"]), checkpoint)
 
 # --- Request Logs Functions ---
+# The request logs are an append-only journal (REQUEST_LOGS_DB, one entry per line,
+# oldest first). add_request_log appends one line under its own lock instead of
+# rewriting the whole log and the stats under _db_lock, so the HikCentral calls of
+# concurrent pipeline stages do not queue behind each other's log writes. Each process
+# keeps the newest REQUEST_LOG_MAX_ENTRIES entries in memory and reads only the lines
+# appended since its last read; the journal is compacted to those entries once it holds
+# _REQUEST_LOG_COMPACT_FACTOR times as many lines. The log counters of the dashboard
+# stats are recounted from them with the next stats write, at the latest
+# _REQUEST_LOG_STATS_SECONDS after a log was added.
+# Lock order: _db_lock, then _request_log_lock.
+
+REQUEST_LOG_MAX_ENTRIES = 1000
+_REQUEST_LOG_COMPACT_FACTOR = 3
+_REQUEST_LOG_STATS_SECONDS = 1.0
+_LEGACY_REQUEST_LOGS_DB = os.path.join(os.path.dirname(REQUEST_LOGS_DB), "request_logs.json")
+
+# Serializes appends to the request log journal and its search index
+_request_log_lock = threading.RLock()
+_request_log_lines = None  # Lines in REQUEST_LOGS_DB, as counted by this process
+_log_stats_dirty = False
+_log_stats_folded_at = 0.0
+
+class _RequestLogReader:
+    """The newest REQUEST_LOG_MAX_ENTRIES entries of the journal, caught up with its new lines on every read."""
+
+    def __init__(self):
+        self.entries = collections.deque(maxlen=REQUEST_LOG_MAX_ENTRIES)  # Oldest first
+        self.offset = 0
+        self.inode = None
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        if not os.path.exists(REQUEST_LOGS_DB):
+            _migrate_legacy_request_logs()
+        with self.lock:
+            try:
+                stat = os.stat(REQUEST_LOGS_DB)
+            except FileNotFoundError:
+                self.entries.clear()
+                self.offset, self.inode = 0, None
+                return
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                # First read, or the journal was compacted: start over
+                self.entries.clear()
+                self.offset, self.inode = 0, stat.st_ino
+            if stat.st_size == self.offset:
+                return
+            with open(REQUEST_LOGS_DB, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+            complete = data.rfind(b"\n") + 1  # A line being appended right now is read next time
+            self.offset += complete
+            for line in data[:complete].splitlines():
+                try:
+                    self.entries.append(json.loads(line))
+                except ValueError:
+                    logger.error(f"Skipping a corrupt line of {REQUEST_LOGS_DB}.")
+
+    def newest_first(self):
+        self.refresh()
+        with self.lock:
+            return list(reversed(self.entries))
+
+_request_logs = _RequestLogReader()
+
+def _append_request_log_lines(entries):
+    """Appends entries (oldest first) to the journal. Returns False if the write failed."""
+    global _request_log_lines
+    data = "".join(json.dumps(entry, ensure_ascii=False, default=_to_json) + "\n" for entry in entries)
+    with _request_log_lock:
+        try:
+            with STORE_WRITE_SECONDS.labels(os.path.basename(REQUEST_LOGS_DB)).time(), open(REQUEST_LOGS_DB, 'a', encoding='utf-8') as f:
+                f.write(data)
+        except Exception as e:
+            logger.error(f"Error appending to {REQUEST_LOGS_DB}: {e}")
+            return False
+        if _request_log_lines is None:
+            with open(REQUEST_LOGS_DB, 'rb') as f:
+                _request_log_lines = sum(1 for _ in f)
+        else:
+            _request_log_lines += len(entries)
+        if _request_log_lines > _REQUEST_LOG_COMPACT_FACTOR * REQUEST_LOG_MAX_ENTRIES:
+            _compact_request_logs()
+        return True
+
+def _compact_request_logs():
+    """Rewrites the journal with only its newest REQUEST_LOG_MAX_ENTRIES entries."""
+    global _request_log_lines
+    entries = list(reversed(_request_logs.newest_first()))
+    tmp_path = f"{REQUEST_LOGS_DB}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, default=_to_json) + "\n")
+        os.replace(tmp_path, REQUEST_LOGS_DB)
+    except Exception as e:
+        logger.error(f"Error compacting {REQUEST_LOGS_DB}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    _request_log_lines = len(entries)
+
+def _migrate_legacy_request_logs():
+    # Request logs written before the journal were a single JSON list, newest first
+    with _request_log_lock:
+        if not os.path.exists(_LEGACY_REQUEST_LOGS_DB) or os.path.exists(REQUEST_LOGS_DB):
+            return
+        legacy = _load_data(_LEGACY_REQUEST_LOGS_DB, [])
+        if _append_request_log_lines(list(reversed(legacy[:REQUEST_LOG_MAX_ENTRIES]))):
+            os.remove(_LEGACY_REQUEST_LOGS_DB)
+            logger.info(f"Moved {len(legacy)} request log entries from {_LEGACY_REQUEST_LOGS_DB} to {REQUEST_LOGS_DB}.")
 
 def load_request_logs():
-    """Loads the request logs database."""
-    # The request logs database is a list of log entries
-    return _load_data(REQUEST_LOGS_DB, [])
+    """Loads the request logs (newest first)."""
+    return _request_logs.newest_first()
+
+def iter_request_logs():
+    """Streams the request log entries (newest first) one at a time."""
+    yield from load_request_logs()
 
 def add_request_log(log_entry):
     """Adds a new log entry to the request logs."""
-    logs = load_request_logs()
-    logs.insert(0, log_entry) # Insert at the beginning for easier viewing
-    # Keep the log file from growing indefinitely (e.g., max 1000 entries)
-    if len(logs) > 1000:
-        logs = logs[:1000]
-    return _save_data(REQUEST_LOGS_DB, logs)
+    global _log_stats_dirty
+    _ensure_log_index()
+    if not os.path.exists(REQUEST_LOGS_DB):
+        _migrate_legacy_request_logs()
+    with _request_log_lock:
+        saved = _append_request_log_lines([log_entry])
+        if saved:
+            _append_log_index(log_entry)
+    if saved:
+        _log_stats_dirty = True
+        if time.monotonic() - _log_stats_folded_at >= _REQUEST_LOG_STATS_SECONDS:
+            _update_stats(lambda stats: None)
+        publish_stream_event("log", _log_summary(log_entry))
+    return saved
+
+def flush_request_log_stats():
+    """Writes the log counters of request logs added since the last stats write, e.g. before exiting."""
+    if _log_stats_dirty:
+        _update_stats(lambda stats: None)
+
+def _log_id(log_entry):
+    # Entries written before log IDs existed are addressed by their timestamp
+    return log_entry.get("id") or log_entry.get("timestamp")
+
+def _log_summary(log_entry):
+    return {
+        "id": _log_id(log_entry),
+        "timestamp": log_entry.get("timestamp"),
+        "api_type": log_entry.get("api_type"),
+        "endpoint": log_entry.get("endpoint"),
+        "success": log_entry.get("success"),
+        "status_code": log_entry.get("status_code"),
+        "message": log_entry.get("message"),
+    }
+
+def _log_matches(entry, api_type, success, status_code, since, until):
+    if api_type and entry.get("api_type") != api_type:
+        return False
+    if success is not None and bool(entry.get("success")) != success:
+        return False
+    if status_code is not None and str(entry.get("status_code")) != str(status_code):
+        return False
+    timestamp = entry.get("timestamp") or ""
+    if since and timestamp < since:
+        return False
+    if until and timestamp >= until:
+        return False
+    return True
+
+def query_request_logs(api_type=None, success=None, status_code=None, since=None, until=None, search=None, offset=0, limit=50):
+    """
+    Returns one page of log entries (newest first) matching the filters as (items, total).
+    Items omit request_data/response_data; fetch those with get_request_log.
+    With search, candidates come from the log index instead of a scan of the log file.
+    """
+    if search and search.strip():
+        candidates = search_log_index(search)
+    else:
+        candidates = load_request_logs()
+    matched = [entry for entry in candidates if _log_matches(entry, api_type, success, status_code, since, until)]
+    items = [_log_summary(entry) for entry in matched[offset:offset + limit]]
+    return items, len(matched)
+
+def get_request_log(log_id):
+    """Returns a full log entry, including request and response payloads, or None."""
+    for entry in load_request_logs():
+        if _log_id(entry) == log_id:
+            return entry
+    return None
+
+# --- Request Log Search Index ---
+# Postings of the request logs, so searching by national ID, person ID, endpoint or
+# error text does not scan request_logs.json with its base64 payloads.
+# add_request_log appends one line per entry to LOG_INDEX_FILE (its summary and terms);
+# nothing is rewritten on the write path. Searching processes (the dashboard) keep the
+# inverted index in memory and only read the lines appended since their last search.
+# Entries beyond the log cap are evicted oldest first, as the log drops them, and the
+# file is compacted to the live entries once it holds _LOG_INDEX_COMPACT_FACTOR times that.
+# Terms are "<field>:<token>": api, status, endpoint (the URL path), path (its segments,
+# which include event IDs), id (ID fields found in the payloads) and word (tokens of the message).
+
+_LOG_INDEX_COMPACT_FACTOR = 3
+
+# Payload keys whose values identify a worker or a HikCentral person
+_LOG_ID_FIELDS = ("personId", "personIds", "personCode", "nationalIdNumber", "national_id", "worker_id", "workerId", "event_id", "eventId")
+_LOG_ID_MAX_DEPTH = 4
+_LOG_MESSAGE_MAX_TOKENS = 50
+_TOKEN_RE = re.compile(r"\w+")
+
+def _tokens(text):
+    return _TOKEN_RE.findall(str(text).lower())
+
+def _payload_ids(data, depth=0):
+    """Yields the values of the ID fields anywhere in a request/response payload."""
+    if depth > _LOG_ID_MAX_DEPTH:
+        return
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key in _LOG_ID_FIELDS and not isinstance(value, dict):
+                yield from (value if isinstance(value, list) else [value])
+            elif isinstance(value, (dict, list)):
+                yield from _payload_ids(value, depth + 1)
+    elif isinstance(data, list):
+        for item in data:
+            yield from _payload_ids(item, depth + 1)
+
+def _endpoint_path(endpoint):
+    """The path of an endpoint URL: the scheme, host and port would match every entry."""
+    endpoint = str(endpoint or "")
+    return urlsplit(endpoint).path if "://" in endpoint else endpoint
+
+def _log_terms(log_entry):
+    path = _endpoint_path(log_entry.get("endpoint"))
+    terms = {f"api:{token}" for token in _tokens(log_entry.get("api_type") or "")}
+    terms.add(f"status:{log_entry.get('status_code')}")
+    terms.add(f"endpoint:{path}")
+    terms.update(f"path:{token}" for token in _tokens(path))
+    for value in _payload_ids(log_entry.get("request_data")):
+        terms.update(f"id:{token}" for token in _tokens(value))
+    for value in _payload_ids(log_entry.get("response_data")):
+        terms.update(f"id:{token}" for token in _tokens(value))
+    terms.update(f"word:{token}" for token in _tokens(log_entry.get("message") or "")[:_LOG_MESSAGE_MAX_TOKENS])
+    return sorted(terms)
+
+def _index_record(log_entry):
+    return {"id": _log_id(log_entry), "summary": _log_summary(log_entry), "terms": _log_terms(log_entry)}
+
+_index_file_lines = None  # Lines in LOG_INDEX_FILE, as counted by this process
+
+def _write_log_index(records):
+    global _index_file_lines
+    tmp_path = f"{LOG_INDEX_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, LOG_INDEX_FILE)
+    _index_file_lines = len(records)
+
+def rebuild_log_index():
+    """Rewrites the index file from the request logs. Used when it is missing."""
+    with _request_log_lock:
+        _write_log_index([_index_record(entry) for entry in reversed(load_request_logs())])  # Oldest first, like appends
+
+def _ensure_log_index():
+    # Called before the log is written, so a first-time rebuild does not index that entry twice
+    if not os.path.exists(LOG_INDEX_FILE):
+        rebuild_log_index()
+
+def _compact_log_index():
+    """Rewrites the index file with only its newest REQUEST_LOG_MAX_ENTRIES entries."""
+    records = {}
+    with open(LOG_INDEX_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records.pop(record["id"], None)  # A re-added ID counts as its latest position
+            records[record["id"]] = record
+    _write_log_index(list(records.values())[-REQUEST_LOG_MAX_ENTRIES:])
+
+def _append_log_index(log_entry):
+    global _index_file_lines
+    with _request_log_lock:
+        try:
+            with open(LOG_INDEX_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(_index_record(log_entry), ensure_ascii=False) + "\n")
+            if _index_file_lines is None:
+                with open(LOG_INDEX_FILE, 'rb') as f:
+                    _index_file_lines = sum(1 for _ in f)
+            else:
+                _index_file_lines += 1
+            if _index_file_lines > _LOG_INDEX_COMPACT_FACTOR * REQUEST_LOG_MAX_ENTRIES:
+                _compact_log_index()
+        except Exception as e:
+            logger.error(f"Failed to update the request log index: {e}")
+
+class _LogIndexReader:
+    """In-memory inverted index over LOG_INDEX_FILE, caught up with the file's new lines on every search."""
+
+    def __init__(self):
+        self.docs = {}  # log ID -> (summary, terms), oldest first
+        self.terms = {}  # term -> set of log IDs
+        self.offset = 0
+        self.inode = None
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        if not os.path.exists(LOG_INDEX_FILE):
+            rebuild_log_index()
+        with self.lock:
+            stat = os.stat(LOG_INDEX_FILE)
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                # First read, or the file was compacted or rebuilt: start over
+                self.docs, self.terms, self.offset, self.inode = {}, {}, 0, stat.st_ino
+            if stat.st_size == self.offset:
+                return
+            with open(LOG_INDEX_FILE, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+            complete = data.rfind(b"\n") + 1  # A line being appended right now is read next time
+            self.offset += complete
+            for line in data[:complete].splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self._add(record)
+
+    def _add(self, record):
+        log_id = record["id"]
+        self._remove(log_id)
+        self.docs[log_id] = (record["summary"], record["terms"])
+        for term in record["terms"]:
+            self.terms.setdefault(term, set()).add(log_id)
+        while len(self.docs) > REQUEST_LOG_MAX_ENTRIES:
+            self._remove(next(iter(self.docs)))
+
+    def _remove(self, log_id):
+        doc = self.docs.pop(log_id, None)
+        for term in doc[1] if doc else ():
+            postings = self.terms.get(term)
+            if postings is not None:
+                postings.discard(log_id)
+                if not postings:
+                    del self.terms[term]
+
+_log_index = _LogIndexReader()
+
+def search_log_index(query):
+    """
+    Returns the summaries of the log entries (newest first) matching every token of query.
+    A token matches an ID, endpoint segment, API type, status code or message word;
+    "field:value" (e.g. status:500, endpoint:/artemis/api/resource/v2/person/single/add) matches that
+    term only; endpoint matches the whole URL path, as stored.
+    """
+    clauses = []
+    for part in query.split():
+        field, _, value = part.partition(":")
+        if value and field == "endpoint":
+            clauses.append([f"endpoint:{_endpoint_path(value)}"])
+        elif value and field in ("api", "status", "path", "id", "word"):
+            clauses.extend([f"{field}:{token}"] for token in _tokens(value))
+        else:
+            clauses.extend([f"{f}:{token}" for f in ("id", "path", "word", "api", "status")] for token in _tokens(part))
+    _log_index.refresh()
+    with _log_index.lock:
+        matched = None
+        for keys in clauses:
+            postings = set()
+            for key in keys:
+                postings.update(_log_index.terms.get(key, ()))
+            matched = postings if matched is None else matched & postings
+            if not matched:
+                return []
+        if matched is None:
+            return []
+        docs = [_log_index.docs[log_id][0] for log_id in matched if log_id in _log_index.docs]
+    docs.sort(key=lambda summary: summary.get("timestamp") or "", reverse=True)
+    return docs
 
 def create_log_entry(api_type, endpoint, success, status_code, request_data, response_data, message=""):
     """Creates a standardized log entry."""
     return {
+        "id": uuid.uuid4().hex,
         "timestamp": datetime.now().isoformat(),
         "api_type": api_type, # e.g., "Supabase", "HikCentral"
         "endpoint": endpoint,
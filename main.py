@@ -1,10 +1,14 @@
 import logging
 import os
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
-from config import POLLING_INTERVAL_SECONDS, LOG_FILE, DASHBOARD_HOST, DASHBOARD_PORT
+from config import POLLING_INTERVAL_SECONDS, RECONCILE_INTERVAL_SECONDS, EXPIRY_SWEEP_INTERVAL_SECONDS, METRICS_SNAPSHOT_INTERVAL_SECONDS, LOG_FILE, DASHBOARD_HOST, DASHBOARD_PORT
 from dashboard.app import app
-from processors.event_processor import poll_and_process_events
+from utils.leader_lease import start_leader_lease, stop_leader_lease, leader_only
+from utils.metrics import write_metrics_snapshot
+
+# gunicorn imports this module for main:app in every dashboard worker, so the
+# processing stack (numpy, the face stack, the API clients, APScheduler) is only
+# imported when the polling service is started. benchmarks/imports.py checks this.
 
 # Configure logging
 logging.basicConfig(
@@ -19,14 +23,50 @@ logger = logging.getLogger('HydeParkSync')
 
 def start_polling_service():
     """Initializes and starts the background polling service."""
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from processors.event_processor import poll_and_process_events
+    from processors.reconciler import run_reconciliation
+    from processors.expiry_sweeper import sweep_expired_workers
+
+    # Jobs only run while this process holds the leader lease (see utils/leader_lease.py)
+    start_leader_lease()
     scheduler = BackgroundScheduler()
     scheduler.add_job(
-        poll_and_process_events,
+        leader_only(poll_and_process_events),
         'interval',
         seconds=POLLING_INTERVAL_SECONDS,
         id='event_polling_job',
         name='Supabase Event Poller',
-        next_run_time=datetime.now() # Run immediately on start
+        next_run_time=datetime.now(), # Run immediately on start
+        max_instances=1, # A cycle running past the interval delays the next one instead of overlapping it
+        coalesce=True
+    )
+    scheduler.add_job(
+        leader_only(run_reconciliation),
+        'interval',
+        seconds=RECONCILE_INTERVAL_SECONDS,
+        id='reconciliation_job',
+        name='HikCentral Reconciliation',
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        leader_only(sweep_expired_workers),
+        'interval',
+        seconds=EXPIRY_SWEEP_INTERVAL_SECONDS,
+        id='expiry_sweep_job',
+        name='Worker Expiry Sweeper',
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        leader_only(write_metrics_snapshot),
+        'interval',
+        seconds=METRICS_SNAPSHOT_INTERVAL_SECONDS,
+        id='metrics_snapshot_job',
+        name='Metrics Snapshot Writer',
+        max_instances=1,
+        coalesce=True
     )
     scheduler.start()
     logger.info(f"Polling service started. Interval: {POLLING_INTERVAL_SECONDS} seconds.")
@@ -54,6 +94,9 @@ if __name__ == "__main__":
     except (KeyboardInterrupt, SystemExit):
         logger.info("System shutdown initiated.")
         scheduler.shutdown()
+        from processors.event_processor import close_poll_pipelines
+        close_poll_pipelines()  # Finishes the workers still being onboarded
+        stop_leader_lease()
         logger.info("Scheduler shut down.")
     except Exception as e:
         logger.critical(f"A critical error occurred in the main loop: {e}")
@@ -0,0 +1,234 @@
+import base64
+import sys
+from datetime import datetime
+
+# The worker record shared by the processor, the API clients and the store.
+#
+# A slotted object instead of a free-form dict: with 100k workers resident, dict
+# overhead and the 128 Python floats of each face encoding dominated memory. Status,
+# unit and site values are interned and the face encoding is a float32 array, stored in
+# workers.json as base64 (older stores with a list of floats are still read).
+#
+# Validity dates are kept exactly as received ("2025-01-01", "...Z"): that string is
+# what is stored, fingerprinted and sent to HikCentral. valid_from_time/valid_to_time
+# parse it for comparisons only.
+#
+# The store is read by the dashboard too, which never looks at encodings: a stored
+# encoding stays base64 until first accessed, and numpy and dateutil are imported on
+# first use, so importing this module (and database) stays cheap.
+#
+# Mapping access (w['status'], w.get('valid_to')) is kept for code written against the
+# dict records and returns the store form of a field; attributes hold the typed values.
+# Unknown keys (e.g. phone, gender) go to extra.
+
+ENCODING_DTYPE = "float32"
+
+FIELDS = ("id", "name", "national_id", "face_image_url", "valid_from", "valid_to", "status",
+          "unit_number", "site", "hikcentral_person_id", "face_encoding", "sync_fingerprint")
+
+def parse_validity(value):
+    """Parses a validity date into a datetime, for comparisons; None if missing or unparseable."""
+    if value is None or value == "" or isinstance(value, datetime):
+        return value or None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        from dateutil import parser as date_parser
+        try:
+            return date_parser.parse(str(value))
+        except (ValueError, OverflowError):
+            return None
+
+def format_validity(value):
+    """Returns the store form of a validity date: strings as given, datetimes in ISO 8601."""
+    if value is None or value == "":
+        return None
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+def encode_face_encoding(encoding):
+    import numpy as np
+    return base64.b64encode(np.ascontiguousarray(encoding, dtype=ENCODING_DTYPE).tobytes()).decode('ascii')
+
+def decode_face_encoding(value):
+    """Accepts a stored encoding (base64 string or list of floats) or an array; returns a float32 array or None."""
+    if value is None:
+        return None
+    import numpy as np
+    if isinstance(value, str):
+        return np.frombuffer(base64.b64decode(value), dtype=ENCODING_DTYPE)
+    return np.asarray(value, dtype=ENCODING_DTYPE)
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+class Worker:
+    __slots__ = ("id", "name", "national_id", "face_image_url", "_valid_from", "_valid_to", "_status",
+                 "_unit_number", "_site", "hikcentral_person_id", "_face_encoding", "sync_fingerprint", "extra")
+
+    def __init__(self, id=None, name=None, national_id=None, face_image_url=None, valid_from=None, valid_to=None,
+                 status=None, unit_number=None, site=None, hikcentral_person_id=None, face_encoding=None,
+                 sync_fingerprint=None, extra=None):
+        self.id = id
+        self.name = name
+        self.national_id = national_id
+        self.face_image_url = face_image_url
+        self.valid_from = valid_from
+        self.valid_to = valid_to
+        self.status = status
+        self.unit_number = unit_number
+        self.site = site
+        self.hikcentral_person_id = hikcentral_person_id
+        self.face_encoding = face_encoding
+        self.sync_fingerprint = sync_fingerprint
+        self.extra = extra or None
+
+    # --- Typed fields ---
+
+    @property
+    def valid_from(self):
+        return self._valid_from
+
+    @valid_from.setter
+    def valid_from(self, value):
+        self._valid_from = format_validity(value)
+
+    @property
+    def valid_to(self):
+        return self._valid_to
+
+    @valid_to.setter
+    def valid_to(self, value):
+        self._valid_to = format_validity(value)
+
+    @property
+    def valid_from_time(self):
+        return parse_validity(self._valid_from)
+
+    @property
+    def valid_to_time(self):
+        return parse_validity(self._valid_to)
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        self._status = _intern(value)
+
+    @property
+    def unit_number(self):
+        return self._unit_number
+
+    @unit_number.setter
+    def unit_number(self, value):
+        self._unit_number = _intern(value)
+
+    @property
+    def site(self):
+        return self._site
+
+    @site.setter
+    def site(self, value):
+        self._site = _intern(value)
+
+    @property
+    def face_encoding(self):
+        if isinstance(self._face_encoding, str):
+            self._face_encoding = decode_face_encoding(self._face_encoding)
+        return self._face_encoding
+
+    @face_encoding.setter
+    def face_encoding(self, value):
+        # Stored (base64) encodings are decoded on first access; lists and arrays right away
+        self._face_encoding = value if value is None or isinstance(value, str) else decode_face_encoding(value)
+
+    # --- Conversions ---
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a worker from its store form."""
+        known = {k: data[k] for k in FIELDS if k in data}
+        extra = {k: v for k, v in data.items() if k not in known} if len(known) < len(data) else None
+        return cls(extra=extra, **known)
+
+    @classmethod
+    def from_event(cls, worker):
+        """Builds a worker from a Supabase event's worker (fullName, nationalIdNumber, ...)."""
+        return cls(
+            id=worker.get('id') or worker.get('nationalIdNumber'),
+            name=worker.get('fullName'),
+            national_id=worker.get('nationalIdNumber'),
+            face_image_url=worker.get('facePhoto'),
+            valid_from=worker.get('validFrom'),
+            valid_to=worker.get('validTo'),
+            status=worker.get('status'),
+            unit_number=worker.get('unitNumber'),
+            site=worker.get('site'),
+        )
+
+    @classmethod
+    def coerce(cls, worker):
+        """Returns worker as a Worker, converting a dict record."""
+        return worker if isinstance(worker, cls) else cls.from_dict(worker)
+
+    def to_dict(self):
+        """Returns the store form: only set fields, the encoding as base64."""
+        data = {}
+        for key in FIELDS:
+            value = self._store_value(key)
+            if value is not None:
+                data[key] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def _store_value(self, key):
+        if key == "face_encoding":
+            value = self._face_encoding
+            return value if value is None or isinstance(value, str) else encode_face_encoding(value)
+        return getattr(self, key)
+
+    def copy(self):
+        worker = Worker.__new__(Worker)
+        for slot in Worker.__slots__:
+            setattr(worker, slot, getattr(self, slot))
+        worker.extra = dict(self.extra) if self.extra else None
+        return worker
+
+    def __repr__(self):
+        return f"Worker(id={self.id!r}, national_id={self.national_id!r}, status={self.status!r})"
+
+    # --- Mapping access (store form) ---
+
+    def get(self, key, default=None):
+        if key in FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return (self.extra or {}).get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        return [key for key in FIELDS if self._raw(key) is not None] + list(self.extra or ())
+
+    def _raw(self, key):
+        return self._face_encoding if key == "face_encoding" else getattr(self, key)
+
+    def items(self):
+        return [(key, self.get(key)) for key in self.keys()]
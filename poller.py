@@ -1,8 +1,12 @@
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
-from processors.event_processor import poll_and_process_events
-from config import LOG_FILE, POLLING_INTERVAL_SECONDS
+from processors.event_processor import poll_and_process_events, close_poll_pipelines
+from processors.reconciler import run_reconciliation
+from processors.expiry_sweeper import sweep_expired_workers
+from utils.metrics import write_metrics_snapshot
+from utils.leader_lease import start_leader_lease, stop_leader_lease, leader_only
+from config import LOG_FILE, POLLING_INTERVAL_SECONDS, RECONCILE_INTERVAL_SECONDS, EXPIRY_SWEEP_INTERVAL_SECONDS, METRICS_SNAPSHOT_INTERVAL_SECONDS
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,14 +19,44 @@ logging.basicConfig(
 logger = logging.getLogger('HydeParkSync.Poller')
 
 def main():
+    start_leader_lease()
     scheduler = BackgroundScheduler()
     scheduler.add_job(
-        poll_and_process_events,
+        leader_only(poll_and_process_events),
         'interval',
         seconds=POLLING_INTERVAL_SECONDS,
         id='event_polling_job',
         name='Supabase Event Poller',
-        next_run_time=datetime.now()
+        next_run_time=datetime.now(),
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        leader_only(run_reconciliation),
+        'interval',
+        seconds=RECONCILE_INTERVAL_SECONDS,
+        id='reconciliation_job',
+        name='HikCentral Reconciliation',
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        leader_only(sweep_expired_workers),
+        'interval',
+        seconds=EXPIRY_SWEEP_INTERVAL_SECONDS,
+        id='expiry_sweep_job',
+        name='Worker Expiry Sweeper',
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.add_job(
+        leader_only(write_metrics_snapshot),
+        'interval',
+        seconds=METRICS_SNAPSHOT_INTERVAL_SECONDS,
+        id='metrics_snapshot_job',
+        name='Metrics Snapshot Writer',
+        max_instances=1,
+        coalesce=True
     )
     scheduler.start()
     logger.info(f"Poller started. Interval: {POLLING_INTERVAL_SECONDS} seconds.")
@@ -32,6 +66,8 @@ def main():
             time.sleep(3600)
     except (KeyboardInterrupt, SystemExit):
         scheduler.shutdown()
+        close_poll_pipelines()  # Finishes the workers still being onboarded
+        stop_leader_lease()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,197 @@
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from config import BULK_IMPORT_BATCH_SIZE, LOG_FILE
+from database import load_bulk_import_checkpoint, save_bulk_import_checkpoint, worker_unit_of_work
+from processors.event_processor import build_import_pipeline, new_import_job
+from utils.leader_lease import exclusive_run, still_leader
+
+logger = logging.getLogger('HydeParkSync.BulkImport')
+
+# Bulk onboarding of workers from a CSV or NDJSON file plus a folder of photos, e.g.
+# for a new compound going live:
+#
+#   python -m processors.bulk_import workers.csv --photos photos/
+#
+# Rows go through the same onboarding pipeline as worker.created events (normalize,
+# dedupe, HikCentral person, face, privilege, save), concurrently and in batches.
+# After every batch the position in the file is checkpointed; rows of an interrupted
+# batch are protected by the processed-events ledger, so a resumed import neither
+# skips nor re-enrolls anyone.
+#
+# It holds the leader lease while it runs, so it never writes workers.json at the same
+# time as the sync jobs of a poller or dashboard: it refuses to start while another
+# process holds the lease, and stops after the current batch if it loses it.
+
+# Accepted column names -> event field names used by the onboarding pipeline
+_COLUMN_ALIASES = {
+    "id": "id",
+    "name": "fullName", "full_name": "fullName", "fullname": "fullName",
+    "national_id": "nationalIdNumber", "nationalid": "nationalIdNumber", "nationalidnumber": "nationalIdNumber",
+    "photo": "photo", "face_photo": "facePhoto", "facephoto": "facePhoto", "face_image_url": "facePhoto",
+    "valid_from": "validFrom", "validfrom": "validFrom",
+    "valid_to": "validTo", "validto": "validTo",
+    "unit_number": "unitNumber", "unitnumber": "unitNumber",
+    "status": "status",
+}
+_PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png")
+_MAX_RECORDED_FAILURES = 1000
+
+def _import_id(path):
+    """Derives a stable import ID from the input file, so re-running the same file resumes it."""
+    stat = os.stat(path)
+    digest = hashlib.sha1(f"{os.path.abspath(path)}:{stat.st_size}".encode('utf-8')).hexdigest()[:12]
+    return f"bulk-{digest}"
+
+def _read_rows(path):
+    """Yields input rows as dicts, streaming the file."""
+    if path.lower().endswith((".ndjson", ".jsonl")):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            yield from csv.DictReader(f)
+
+def _to_event_worker(row):
+    worker = {}
+    for key, value in row.items():
+        field = _COLUMN_ALIASES.get(str(key).strip().lower().replace(" ", "_"))
+        if field and value not in (None, ""):
+            worker[field] = str(value).strip() if not isinstance(value, (dict, list)) else value
+    return worker
+
+def _find_photo(worker, photos_dir):
+    """Returns the local photo of a row: its photo column, or <national id>.<ext> in the photos folder."""
+    if not photos_dir:
+        return None
+    name = worker.pop("photo", None)
+    candidates = [name] if name else [f"{worker.get('nationalIdNumber')}{ext}" for ext in _PHOTO_EXTENSIONS]
+    for candidate in candidates:
+        path = os.path.join(photos_dir, candidate)
+        if os.path.isfile(path):
+            return path
+    return None
+
+def _new_checkpoint(import_id, source):
+    return {
+        "import_id": import_id,
+        "source": os.path.abspath(source),
+        "started_at": datetime.now().isoformat(),
+        "finished_at": None,
+        "position": 0,
+        "stats": {"imported": 0, "failed": 0, "skipped": 0},
+        "failures": [],
+    }
+
+class _Progress:
+    """Collects job results from the pipeline threads and reports throughput."""
+
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.done = 0
+
+    def on_done(self, job):
+        with self.lock:
+            self.done += 1
+            stats = self.checkpoint["stats"]
+            if job['success']:
+                stats["imported"] += 1
+            else:
+                stats["failed"] += 1
+                if len(self.checkpoint["failures"]) < _MAX_RECORDED_FAILURES:
+                    self.checkpoint["failures"].append({"national_id": job.get('ledger_key'), "reason": job['reason']})
+
+    def report(self, total=None):
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        stats = self.checkpoint["stats"]
+        eta = ""
+        if total and rate:
+            eta = f", ETA {max(0, total - self.checkpoint['position']) / rate:.0f}s"
+        logger.info(f"Row {self.checkpoint['position']}{f'/{total}' if total else ''}: {stats['imported']} imported, "
+                    f"{stats['failed']} failed, {stats['skipped']} skipped ({rate:.1f} workers/s{eta})")
+
+def run_bulk_import(source, photos_dir=None, import_id=None, batch_size=BULK_IMPORT_BATCH_SIZE, restart=False):
+    """Imports the workers of source, resuming from its checkpoint. Returns the import stats."""
+    import_id = import_id or _import_id(source)
+    checkpoint = None if restart else load_bulk_import_checkpoint(import_id)
+    if checkpoint and checkpoint.get("finished_at"):
+        logger.info(f"Import {import_id} already finished at {checkpoint['finished_at']}: {checkpoint['stats']}")
+        return checkpoint["stats"]
+    if checkpoint:
+        logger.info(f"Resuming import {import_id} at row {checkpoint['position']}.")
+    else:
+        checkpoint = _new_checkpoint(import_id, source)
+        save_bulk_import_checkpoint(checkpoint)
+
+    total = sum(1 for _ in _read_rows(source))
+    progress = _Progress(checkpoint)
+    pipeline, known_faces = build_import_pipeline()
+    pipeline.start()
+    logger.info(f"--- Starting Bulk Import {import_id}: {total} rows from {source} ---")
+    with worker_unit_of_work() as unit:
+        try:
+            batch = 0
+            for index, row in enumerate(_read_rows(source)):
+                if index < checkpoint["position"]:
+                    continue
+                worker = _to_event_worker(row)
+                face_path = _find_photo(worker, photos_dir)
+                if not worker.get("nationalIdNumber") or not worker.get("fullName"):
+                    checkpoint["stats"]["skipped"] += 1
+                    logger.warning(f"Row {index + 1} skipped: name and national ID are required.")
+                else:
+                    pipeline.submit(new_import_job(import_id, worker, known_faces, face_path=face_path, on_done=progress.on_done))
+                    batch += 1
+                if batch >= batch_size:
+                    pipeline.join()
+                    unit.commit()  # The batch's workers are on disk before the checkpoint moves past them
+                    checkpoint["position"] = index + 1
+                    save_bulk_import_checkpoint(checkpoint)
+                    progress.report(total)
+                    batch = 0
+                    if not still_leader():
+                        logger.error(f"Lost the leader lease; import {import_id} stopped at row {checkpoint['position']} and resumes from there.")
+                        return checkpoint["stats"]
+            pipeline.join()
+            unit.commit()
+            checkpoint["position"] = total
+            checkpoint["finished_at"] = datetime.now().isoformat()
+            save_bulk_import_checkpoint(checkpoint)
+            progress.report(total)
+        finally:
+            pipeline.close()
+    logger.info(f"--- Bulk Import Finished: {checkpoint['stats']} ---")
+    return checkpoint["stats"]
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
+    parser = argparse.ArgumentParser(description="Bulk-import workers from a CSV or NDJSON file.")
+    parser.add_argument("source", help="CSV or NDJSON (.ndjson/.jsonl) file with one worker per row")
+    parser.add_argument("--photos", help="Folder with the face photos (photo column, or <national id>.jpg)")
+    parser.add_argument("--import-id", help="Checkpoint name (default: derived from the file path and size)")
+    parser.add_argument("--batch-size", type=int, default=BULK_IMPORT_BATCH_SIZE, help="Rows between checkpoints")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the first row")
+    args = parser.parse_args()
+    with exclusive_run("the bulk import") as acquired:
+        if not acquired:
+            sys.exit(1)
+        run_bulk_import(args.source, args.photos, args.import_id, args.batch_size, args.restart)
@@ -1,13 +1,27 @@
+import base64
+import hashlib
+import json
 import logging
+import os
+import threading
+import time
 from api.supabase_client import SupabaseClient
-from api.hikcentral_client import HikCentralClient
-from database import load_workers, save_workers, add_or_update_worker, delete_worker
-from utils.face_processor import process_face_image, delete_face_image, find_duplicate_by_face, get_image_base64
+from api.sites import get_client, client_for, resolve_site, site_of
+from config import DEFAULT_SITE, SITES, PIPELINE_QUEUE_SIZE, PIPELINE_STAGE_WORKERS
+from models import Worker
+from database import load_workers, add_or_update_worker, delete_worker, worker_unit_of_work, enter_worker_unit_of_work, leave_worker_unit_of_work, after_worker_commit, get_processed_worker, record_processed_worker, mark_event_acked, compact_event_ledger, save_pipeline_stats, record_event_time, flush_request_log_stats
+from processors.pipeline import Pipeline, PipelineGroup, Stage
+from processors.expiry_sweeper import expiry_sweeper, EXPIRED_STATUS
+from utils.leader_lease import still_leader, leader_term
+from utils.live_stream import publish_stream_event
+from utils.metrics import POLL_CYCLE_SECONDS, POLL_BACKLOG_EVENTS, POLL_BACKLOG_WORKERS, write_metrics_snapshot
+from utils.profiler import profile_cycle
+from utils.tracing import span, start_span, start_trace, use_span
+from utils.face_processor import download_image, copy_local_image, get_face_encoding, find_duplicate_encoding
 
 logger = logging.getLogger('HydeParkSync.EventProcessor')
 
 supabase_client = SupabaseClient()
-hikcentral_client = HikCentralClient()
 
 def handle_event(event):
     """
@@ -42,6 +56,7 @@ def handle_event(event):
         if action == "ADD" or action == "UPDATE":
             # 1. Check for local worker data to determine if it's a new add or an update
             person_id = local_worker.get('hikcentral_person_id') if local_worker else None
+            hikcentral_client = client_for(local_worker) if local_worker else get_client(resolve_site(worker_data.get('site'), worker_data.get('unit_number')))
             
             # 2. Process Face Image (Placeholder for Phase 6)
             # if not process_face_image(worker_data):
@@ -74,7 +89,7 @@ def handle_event(event):
             if local_worker and local_worker.get('hikcentral_person_id'):
                 person_id = local_worker['hikcentral_person_id']
                 # 1. Delete from HikCentral
-                if hikcentral_client.delete_worker(person_id):
+                if client_for(local_worker).delete_worker(person_id):
                     # 2. Delete from local database
                     delete_worker(worker_id)
                     success = True
@@ -102,18 +117,6 @@ def handle_event(event):
     else:
         supabase_client.fail_event(event_id, error_reason)
 
-def _normalize_worker_from_event(worker):
-    return {
-        "id": worker.get('id') or worker.get('nationalIdNumber'),
-        "name": worker.get('fullName'),
-        "national_id": worker.get('nationalIdNumber'),
-        "face_image_url": worker.get('facePhoto'),
-        "valid_from": worker.get('validFrom'),
-        "valid_to": worker.get('validTo'),
-        "status": worker.get('status'),
-        "unit_number": worker.get('unitNumber'),
-    }
-
 def _workers_dict():
     try:
         return load_workers()
@@ -124,110 +127,598 @@ def _find_local_by_national_id(workers, national_id):
     if not national_id:
         return None, None
     for wid, w in workers.items():
-        if str(w.get('national_id')) == str(national_id):
+        if str(w.national_id) == str(national_id):
             return wid, w
     return None, None
 
-def handle_worker_created(event_id, worker):
-    success = False
-    reason = ""
+# Fields of a normalized worker that are compared to detect changes; the face is tracked by content hash
+_FINGERPRINT_FIELDS = ("id", "name", "national_id", "valid_from", "valid_to", "status", "unit_number")
+
+def _fields_fingerprint(worker):
+    """Returns a stable hash of the person fields of a normalized worker."""
+    fields = {k: worker.get(k) for k in _FINGERPRINT_FIELDS}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _changed_fields(existing_w, new_w):
+    """Returns the fingerprinted fields whose values differ between the stored and the new worker."""
+    return {k for k in _FINGERPRINT_FIELDS if existing_w.get(k) != new_w.get(k)}
+
+def _known_face_hashes(workers):
+    """Maps ledger keys to the content hash of the face last uploaded for that worker."""
+    known = {}
+    for w in workers.values():
+        face_hash = (w.sync_fingerprint or {}).get('face')
+        if face_hash:
+            known[_ledger_worker_key(w)] = face_hash
+    return known
+
+def _ledger_worker_key(worker):
+    return str(worker.national_id or worker.id)
+
+def _ack_event(event_id):
+    """Acknowledges a completed event and records the acknowledgement in the ledger."""
+    if supabase_client.complete_event(event_id) is not None:
+        mark_event_acked(event_id)
+
+# --- Worker Onboarding Pipeline ---
+# Onboarding a worker is split into stages (face fetch, encode, dedupe, HikCentral person,
+# face upload, privilege, local save, ack). During a poll cycle the stages run concurrently
+# over bounded queues, so the download and encoding of the next worker overlap the
+# HikCentral calls of the current one. handle_worker_created runs the same stages inline.
+# Every site has its own pipeline (see _build_site_pipelines), fed independently.
+# The pipelines of the poll cycles ("poll lanes") persist across cycles, see _run_poll_cycle.
+
+# Jobs that passed the dedupe stage and are not acknowledged yet, by ledger key
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def _new_onboarding_job(event_id, worker, known_faces=None):
+    """known_faces (ledger key -> face hash) lets the encode stage skip faces that did not change."""
+    return {"event_id": event_id, "worker": worker, "known_faces": known_faces, "success": False, "reason": "", "done": False}
+
+def _finish_job(job, success, reason=""):
+    job['success'] = success
+    job['reason'] = reason
+    job['done'] = True
+
+def _remove_file(path):
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except Exception:
+        pass
+
+def _stage_fetch(job):
+    if _lane_leadership_lost(job):
+        _drop_lane_job(job)
+        return
+    new_w = Worker.from_event(job['worker'])
+    new_w.site = job.get('site') or resolve_site(new_w.site, new_w.unit_number)
+    job['new_w'] = new_w
+    job['ledger_key'] = _ledger_worker_key(new_w)
+
+    # An event we already applied comes back when its acknowledgement was lost: only re-send the ack
+    processed = get_processed_worker(job['event_id'], job['ledger_key']) or {}
+    job['processed'] = processed
+    job['steps'] = list(processed.get('steps') or [])
+    if processed.get('status') == 'complete':
+        logger.info(f"Event {job['event_id']} for worker {job['ledger_key']} already processed. Re-sending acknowledgement.")
+        job['replay'] = True
+        _finish_job(job, True)
+        return
+
+    job['fields_hash'] = _fields_fingerprint(new_w)
+    if job.get('face_path'):
+        job['image_path'] = copy_local_image(job['face_path'], new_w.id)
+    elif new_w.face_image_url:
+        job['image_path'] = download_image(new_w.face_image_url, new_w.id, unique=True)
+
+def _stage_encode(job):
+    image_path = job.get('image_path')
+    if not image_path:
+        return
+    with open(image_path, 'rb') as f:
+        content = f.read()
+    job['face_hash'] = hashlib.sha256(content).hexdigest()
+    job['face_b64'] = base64.b64encode(content).decode('utf-8')
+    known_faces = job.get('known_faces')
+    if known_faces is not None and known_faces.get(job['ledger_key']) == job['face_hash']:
+        # Same photo as last synced: the stored encoding is still valid. The file is kept
+        # until the ack stage in case dedupe finds the store changed in the meantime.
+        return
+    _encode_job_face(job)
+
+def _encode_job_face(job):
+    try:
+        job['face_encoding'] = get_face_encoding(job['image_path'])
+    finally:
+        _remove_file(job['image_path'])
+        job['image_path'] = None
+
+def _wait_for_inflight(job):
+    """Waits for earlier jobs of the same worker, or with a matching face, to finish before deciding."""
+    key = job['ledger_key']
+    while True:
+        with _inflight_lock:
+            blockers = []
+            other = _inflight.get(key)
+            if other is not None and other is not job:
+                blockers.append(other)
+            encoding = job.get('face_encoding')
+            if encoding is not None:
+                pending = {k: {'face_encoding': j.get('face_encoding')} for k, j in _inflight.items() if j is not job and k != key}
+                dup_key, _ = find_duplicate_encoding(encoding, pending)
+                if dup_key is not None:
+                    blockers.append(_inflight[dup_key])
+            if not blockers:
+                job['finished'] = threading.Event()
+                _inflight[key] = job
+                return
+        for other in blockers:
+            other['finished'].wait()
+
+def _release_inflight(job):
+    finished = job.get('finished')
+    if finished is None:
+        return
+    with _inflight_lock:
+        if _inflight.get(job['ledger_key']) is job:
+            del _inflight[job['ledger_key']]
+    finished.set()
+
+def _stored_face_hash(worker):
+    return (worker.sync_fingerprint or {}).get('face') if worker else None
+
+def _stage_dedupe(job):
+    _wait_for_inflight(job)
+    new_w = job['new_w']
     workers = _workers_dict()
-    new_w = _normalize_worker_from_event(worker)
-    nid = new_w.get('national_id')
-
-    existing_id, existing_w = _find_local_by_national_id(workers, nid)
-    if not existing_w and new_w.get('face_image_url'):
-        dup_id = find_duplicate_by_face(new_w['face_image_url'], new_w.get('id'))
-        if dup_id:
-            existing_id = dup_id
+
+    _, existing_w = _find_local_by_national_id(workers, new_w.national_id)
+    if job.get('face_hash') and job['face_hash'] != _stored_face_hash(existing_w) and job.get('image_path'):
+        # The encoding was skipped on a stale view of the store; the face did change
+        _encode_job_face(job)
+    encoding = job.get('face_encoding')
+    job['face_unique'] = True
+    if encoding is not None:
+        dup_id, _ = find_duplicate_encoding(encoding, workers, exclude_id=new_w.id)
+        job['face_unique'] = dup_id is None
+        if not existing_w and dup_id is not None and not job['processed'].get('hikcentral_person_id'):
+            logger.info(f"Duplicate face match: input {new_w.id} -> existing {dup_id}")
             existing_w = workers.get(str(dup_id))
+    if existing_w and existing_w.status == EXPIRED_STATUS and not existing_w.hikcentral_person_id:
+        # Expired with EXPIRY_ACTION "delete": the person is gone from HikCentral, enroll it again
+        existing_w = None
+    if existing_w and site_of(existing_w) != new_w.site:
+        # The person lives on the site it was enrolled on; moving a worker means deleting and re-creating it
+        logger.warning(f"Worker {job['ledger_key']} is enrolled on site {site_of(existing_w)}, not {new_w.site}; updating it there.")
+        new_w.site = site_of(existing_w)
+    job['existing_w'] = existing_w
+    job['face_changed'] = bool(job.get('face_hash')) and job['face_hash'] != _stored_face_hash(existing_w)
+
+def _stage_hikcentral(job):
+    if _lane_leadership_lost(job):
+        _drop_lane_job(job)
+        return
+    new_w = job['new_w']
+    existing_w = job['existing_w']
+    steps = job['steps']
+    encoding = job.get('face_encoding')
+    hikcentral_client = get_client(new_w.site)
+
+    if not existing_w:
+        # Reuse the person created by an earlier, interrupted attempt instead of adding a duplicate
+        person_id = job['processed'].get('hikcentral_person_id') or hikcentral_client.add_worker(new_w)
+        if not person_id:
+            _finish_job(job, False, "Failed to add worker to HikCentral")
+            return
+        new_w.hikcentral_person_id = person_id
+        if 'person' not in steps:
+            steps.append('person')
+            record_processed_worker(job['event_id'], job['ledger_key'], hikcentral_person_id=person_id, steps=steps)
+        if encoding is not None and job['face_unique']:
+            new_w.face_encoding = encoding
+        job['action'] = 'add'
+        job['save_record'] = new_w
+        return
+
+    nid = new_w.national_id
+    person_id = existing_w.hikcentral_person_id
+    if existing_w.status == 'blocked':
+        supabase_client.update_worker_status(nid, 'blocked', person_id, reason="Worker is blocked locally")
+        job['person_id'] = person_id
+        _finish_job(job, True)
+        return
+
+    # Only send the parts that changed since the last sync
+    fields_changed = (existing_w.sync_fingerprint or {}).get('fields') != job['fields_hash']
+    if not fields_changed and not job['face_changed']:
+        logger.info(f"Worker {job['ledger_key']} unchanged since last sync. Skipping HikCentral.")
+        job['person_id'] = person_id
+        _finish_job(job, True)
+        return
+
+    # Extending the validity only carries valid_to; any other change needs a full update
+    only_validity = _changed_fields(existing_w, new_w) == {'valid_to'}
+    valid_to = new_w.valid_to
+    if not fields_changed:
+        job['action'] = 'face'
+        job['save_record'] = existing_w
+    elif only_validity and valid_to and person_id:
+        if hikcentral_client.extend_worker_validity(person_id, valid_to):
+            existing_w.valid_to = valid_to
+            job['action'] = 'extend'
+            job['save_record'] = existing_w
+        else:
+            _finish_job(job, False, "Failed to extend validity in HikCentral")
+            return
+    elif person_id and hikcentral_client.update_worker(person_id, new_w):
+        new_w.hikcentral_person_id = person_id
+        new_w.face_encoding = existing_w.face_encoding
+        new_w.sync_fingerprint = existing_w.sync_fingerprint
+        job['action'] = 'update'
+        job['save_record'] = new_w
+    else:
+        _finish_job(job, False, "Failed to update worker in HikCentral")
+        return
+
+    if job['face_changed'] and encoding is not None and job['face_unique']:
+        job['save_record'].face_encoding = encoding
+    if existing_w.status == EXPIRED_STATUS and job['action'] != 'face':
+        # Renewed after the expiry sweeper revoked its privilege
+        job['save_record'].status = new_w.status
+        job['regrant'] = True
+
+def _stage_face(job):
+    if not job.get('save_record') or not job.get('face_b64') or 'face' in job['steps']:
+        return
+    if job['action'] != 'add' and not job['face_changed']:
+        return
+    person_id = job['save_record'].hikcentral_person_id
+    if client_for(job['save_record']).add_face_to_person(person_id, job['face_b64']):
+        job['face_synced'] = True
+        job['steps'].append('face')
+        record_processed_worker(job['event_id'], job['ledger_key'], steps=job['steps'])
+
+def _stage_privilege(job):
+    if (job.get('action') != 'add' and not job.get('regrant')) or 'privilege' in job['steps']:
+        return
+    record = job['save_record']
+    if client_for(record).add_to_privilege_group(record.hikcentral_person_id, valid_from=record.get('valid_from', ''), valid_to=record.get('valid_to', '')):
+        job['steps'].append('privilege')
+        record_processed_worker(job['event_id'], job['ledger_key'], steps=job['steps'])
+
+def _stage_save(job):
+    record = job.get('save_record')
+    if record is not None:
+        fingerprint = dict(record.sync_fingerprint or {})
+        # The fields as saved, so anything the HikCentral call did not apply is sent again next time
+        fingerprint['fields'] = _fields_fingerprint(record)
+        if job.get('face_synced') or ('face' in job['steps'] and job.get('face_hash')):
+            fingerprint['face'] = job['face_hash']
+        record.sync_fingerprint = fingerprint
+        add_or_update_worker(record)
+        expiry_sweeper.schedule(record)
+        job['person_id'] = record.hikcentral_person_id
+    job['success'] = True
 
+def _stage_ack(job):
     try:
-        if not existing_w:
-            person_id = hikcentral_client.add_worker(new_w)
-            if person_id:
-                new_w['hikcentral_person_id'] = person_id
-                process_face_image(new_w)
-                face_b64 = None
-                if new_w.get('face_image_url'):
-                    face_b64 = get_image_base64(new_w['face_image_url'], new_w.get('id'))
-                if face_b64:
-                    hikcentral_client.add_face_to_person(person_id, face_b64)
-                hikcentral_client.add_to_privilege_group(person_id, valid_from=new_w.get('valid_from', ''), valid_to=new_w.get('valid_to', ''))
-                add_or_update_worker(new_w)
-                success = True
-            else:
-                reason = "Failed to add worker to HikCentral"
+        _remove_file(job.get('image_path'))
+        event_id = job['event_id']
+        if job.get('dropped') or _lane_leadership_lost(job):
+            # Left pending for the process that leads now
+            logger.info(f"Not reporting event {event_id} for worker {job.get('ledger_key') or job.get('lane_key')}: this process is no longer the leader.")
+            return
+        if job['success']:
+            def complete():
+                if not job.get('replay'):
+                    record_processed_worker(event_id, job['ledger_key'], status='complete', hikcentral_person_id=job.get('person_id'))
+                _ack_event(event_id)
+            # Not before the worker record is on disk: a lost write must leave the event pending
+            after_worker_commit(complete)
         else:
-            status = existing_w.get('status')
-            if status == 'blocked':
-                supabase_client.update_worker_status(nid, 'blocked', existing_w.get('hikcentral_person_id'), reason="Worker is blocked locally")
-                success = True
-            else:
-                core_same = (
-                    existing_w.get('name') == new_w.get('name') and
-                    str(existing_w.get('national_id')) == str(new_w.get('national_id'))
-                )
-                valid_to = new_w.get('valid_to')
-                person_id = existing_w.get('hikcentral_person_id')
-                if core_same and valid_to and person_id:
-                    if hikcentral_client.extend_worker_validity(person_id, valid_to):
-                        existing_w['valid_to'] = valid_to
-                        add_or_update_worker(existing_w)
-                        success = True
-                    else:
-                        reason = "Failed to extend validity in HikCentral"
-                else:
-                    if person_id and hikcentral_client.update_worker(person_id, new_w):
-                        if new_w.get('face_image_url'):
-                            process_face_image(new_w)
-                        new_w['hikcentral_person_id'] = person_id
-                        add_or_update_worker(new_w)
-                        success = True
-                    else:
-                        reason = "Failed to update worker in HikCentral"
-    except Exception as e:
-        reason = str(e)
-        success = False
+            supabase_client.fail_event(event_id, job['reason'])
+        publish_stream_event("progress", {
+            "stage": "worker",
+            "event_id": event_id,
+            "worker": job.get('ledger_key'),
+            "action": 'replay' if job.get('replay') else job.get('action', 'none'),
+            "success": job['success'],
+            "reason": job['reason'],
+        })
+    finally:
+        _release_inflight(job)
+        _leave_lane(job)
 
-    if success:
-        supabase_client.complete_event(event_id)
+def _stage_import_ack(job):
+    """Last stage of bulk imports: records the result in the ledger instead of acknowledging a Supabase event."""
+    try:
+        _remove_file(job.get('image_path'))
+        if job['success'] and not job.get('replay'):
+            after_worker_commit(lambda: record_processed_worker(job['event_id'], job['ledger_key'], status='complete', hikcentral_person_id=job.get('person_id')))
+    finally:
+        _release_inflight(job)
+        if job.get('on_done'):
+            job['on_done'](job)
+
+def _build_onboarding_pipeline(ack=_stage_ack, name="onboarding"):
+    stage_funcs = [
+        ("fetch", _stage_fetch),
+        ("encode", _stage_encode),
+        ("dedupe", _stage_dedupe),
+        ("hikcentral", _stage_hikcentral),
+        ("face", _stage_face),
+        ("privilege", _stage_privilege),
+        ("save", _stage_save),
+        ("ack", ack),
+    ]
+    stages = []
+    for name, func in stage_funcs:
+        workers = 1 if name in ("dedupe", "save") else PIPELINE_STAGE_WORKERS.get(name, 1)
+        stages.append(Stage(name, func, workers))
+    return Pipeline(name, stages, queue_size=PIPELINE_QUEUE_SIZE)
+
+def _event_worker_key(w):
+    return str(w.get('nationalIdNumber') or w.get('id'))
+
+def _site_router(known_sites):
+    """Site of an event worker: the one it is enrolled on (known_sites: worker key -> site), else routed by its event."""
+    def site_for(w):
+        return known_sites.get(_event_worker_key(w)) or resolve_site(w.get('site'), w.get('unitNumber'))
+    return site_for
+
+def _build_site_pipelines(ack, name, site_for):
+    """
+    One onboarding pipeline per site, so a slow HikCentral server only delays the workers
+    of its own site. site_for(event worker) picks the site of a job (see _site_router).
+    """
+    def route(job):
+        if not job.get('site'):
+            job['site'] = site_for(job['worker'])
+        return job['site']
+
+    def build(site):
+        return _build_onboarding_pipeline(ack=ack, name=name if site == DEFAULT_SITE else f"{name}:{site}")
+    return PipelineGroup(build, route)
+
+def _site_pipeline_stats(pipelines):
+    """Per-stage stats of the site pipelines; stages are prefixed with their site once several sites are configured."""
+    by_site = pipelines.stats()
+    if len(SITES) == 1:
+        return by_site.get(DEFAULT_SITE, {})
+    return {f"{site}:{stage}": stats for site, stages in by_site.items() for stage, stats in stages.items()}
+
+def build_import_pipeline():
+    """Onboarding pipelines for bulk imports (see processors.bulk_import). Returns (pipelines, known face hashes)."""
+    workers = _workers_dict()
+    known_sites = {_ledger_worker_key(w): site_of(w) for w in workers.values()}
+    return _build_site_pipelines(_stage_import_ack, "import", _site_router(known_sites)), _known_face_hashes(workers)
+
+# --- Poll Lanes ---
+# The site pipelines of the poll cycles are built once per process and kept across
+# cycles. A cycle submits the workers of its worker.created events and returns without
+# waiting for them, so a slow site does not hold up the next poll of the others.
+# While the lanes have jobs they hold the worker unit of work open, so their writes are
+# still group-committed, and each acknowledgement still waits for its worker's commit.
+# An event whose workers are still in a lane is not submitted again when Supabase
+# returns it, and a worker.deleted event only waits for the lanes of its workers.
+# Jobs carry the leader term they were queued in: once this process loses the leader
+# lease (or loses and regains it), its queued jobs are dropped before they reach
+# HikCentral and their events are neither acknowledged nor failed, so the lanes drain
+# quickly and the current leader processes those events again.
+
+_poll_lanes = None
+_lane_lock = threading.Lock()
+_lane_events = {}  # Event ID -> its jobs still in a lane
+_lane_sites = {}  # Worker key -> [site, its jobs still in a lane]
+_lane_unit = None
+_stored_sites = {}  # Worker key -> site it is enrolled on, as of the start of the last cycle
+
+def _poll_lane_site(w):
+    key = _event_worker_key(w)
+    with _lane_lock:
+        lane = _lane_sites.get(key)
+    if lane is not None:
+        return lane[0]  # Follows its earlier job, which may not be saved yet
+    return _stored_sites.get(key) or resolve_site(w.get('site'), w.get('unitNumber'))
+
+def _poll_pipelines():
+    """Returns the poll lanes (built on first use) and the known face hashes, refreshed from the store."""
+    global _poll_lanes, _stored_sites
+    workers = _workers_dict()
+    _stored_sites = {_ledger_worker_key(w): site_of(w) for w in workers.values()}
+    with _lane_lock:
+        if _poll_lanes is None:
+            _poll_lanes = _build_site_pipelines(_stage_ack, "onboarding", _poll_lane_site).start()
+        lanes = _poll_lanes
+    return lanes, _known_face_hashes(workers)
+
+def _enter_lane(job):
+    """Registers a job about to be submitted to the poll lanes; the first one holds the unit of work."""
+    global _lane_unit
+    job['lane_key'] = _event_worker_key(job['worker'])
+    job['lane_term'] = leader_term()
+    job['site'] = _poll_lane_site(job['worker'])
+    with _lane_lock:
+        if _lane_unit is None:
+            _lane_unit = enter_worker_unit_of_work()
+        _lane_events[job['event_id']] = _lane_events.get(job['event_id'], 0) + 1
+        _lane_sites.setdefault(job['lane_key'], [job['site'], 0])[1] += 1
+
+def _leave_lane(job):
+    """Unregisters a job that left the poll lanes; the last one commits and releases the unit of work."""
+    global _lane_unit
+    if 'lane_key' not in job:
+        return
+    unit = None
+    with _lane_lock:
+        _lane_events[job['event_id']] -= 1
+        if not _lane_events[job['event_id']]:
+            del _lane_events[job['event_id']]
+        lane = _lane_sites[job['lane_key']]
+        lane[1] -= 1
+        if not lane[1]:
+            del _lane_sites[job['lane_key']]
+        if not _lane_events:
+            unit, _lane_unit = _lane_unit, None
+    if unit is not None:
+        leave_worker_unit_of_work(unit)
+
+def _lane_leadership_lost(job):
+    """True for a poll-lane job queued in an earlier leader term, or while this process is no longer the leader."""
+    return 'lane_term' in job and (not still_leader() or leader_term() != job['lane_term'])
+
+def _drop_lane_job(job):
+    logger.warning(f"Dropping worker {_event_worker_key(job['worker'])} of event {job['event_id']}: this process is no longer the leader.")
+    job['dropped'] = True
+    _finish_job(job, False, "Leader lease lost")
+
+def _event_in_lanes(event_id):
+    with _lane_lock:
+        return event_id in _lane_events
+
+def drain_poll_pipelines():
+    """Waits until the poll lanes have finished every submitted worker, then saves their stats."""
+    with _lane_lock:
+        lanes = _poll_lanes
+    if lanes is not None:
+        lanes.join()
+        save_pipeline_stats(_site_pipeline_stats(lanes))
+
+def close_poll_pipelines():
+    """Drains the poll lanes and stops their threads, e.g. at shutdown, and writes the pending log counters."""
+    global _poll_lanes
+    with _lane_lock:
+        lanes, _poll_lanes = _poll_lanes, None
+    if lanes is not None:
+        lanes.close()
+    flush_request_log_stats()
+
+def new_import_job(import_id, worker, known_faces, face_path=None, on_done=None):
+    """
+    Job for one imported worker. worker uses the event field names (fullName, nationalIdNumber, ...).
+    The import ID takes the place of the event ID in the ledger, so a resumed import skips finished rows
+    and reuses HikCentral persons created before an interruption.
+    """
+    job = _new_onboarding_job(import_id, worker, known_faces)
+    job['face_path'] = face_path
+    job['on_done'] = on_done
+    return job
+
+def handle_worker_created(event_id, worker):
+    """Onboards a single worker from a worker.created event, running every stage on the calling thread."""
+    return _build_onboarding_pipeline().run_inline(_new_onboarding_job(event_id, worker))
+
+def handle_worker_deleted(event_id, worker):
+    ledger_key = str(worker.get('nationalIdNumber'))
+    processed = get_processed_worker(event_id, ledger_key) or {}
+    if processed.get('status') == 'complete':
+        logger.info(f"Delete event {event_id} for worker {ledger_key} already processed. Re-sending acknowledgement.")
+        _ack_event(event_id)
+        return
+
+    wid, existing_w = _find_local_by_national_id(_workers_dict(), worker.get('nationalIdNumber'))
+    if existing_w and existing_w.hikcentral_person_id:
+        if client_for(existing_w).delete_worker(existing_w.hikcentral_person_id):
+            delete_worker(existing_w.id or wid)
+            expiry_sweeper.unschedule(existing_w.id or wid)
+
+            def complete():
+                record_processed_worker(event_id, ledger_key, status='complete', hikcentral_person_id=existing_w.hikcentral_person_id)
+                _ack_event(event_id)
+            after_worker_commit(complete)
+        else:
+            supabase_client.fail_event(event_id, "Failed to delete worker in HikCentral")
     else:
-        supabase_client.fail_event(event_id, reason)
+        _ack_event(event_id)
 
 def poll_and_process_events():
     """
     The main polling function to be run by APScheduler.
-    Fetches events and processes them sequentially.
+    Fetches events and processes them in order; workers of worker.created events are
+    onboarded concurrently through the poll lane of their site, which may still be
+    working on them when the cycle returns.
+    Every cycle is traced; it is also profiled when profiling was requested from the dashboard.
+    Worker writes of the cycle are group-committed (see database.worker_unit_of_work).
+    """
+    with profile_cycle("poll") as profiling:
+        cycle_span = start_trace("poll_cycle")
+        if cycle_span is not None:
+            # The events submitted to the lanes hold the trace open too; it is written when the last one ends
+            cycle_span.hold()
+        try:
+            with use_span(cycle_span), worker_unit_of_work():
+                _run_poll_cycle(cycle_span)
+            if profiling:
+                drain_poll_pipelines()  # A profiled cycle covers the stage work of its jobs
+        finally:
+            if cycle_span is not None:
+                cycle_span.release()
+
+def _submit_created_event(pipeline, event, known_faces):
+    """
+    Queues the workers of a worker.created event. Its trace span stays open until the last
+    worker is done, and keeps the cycle's trace open meanwhile.
     """
+    workers = event.get('workers') or []
+    event_span = start_span("event", hold_parent=True, event_id=event.get('id'), type=event.get('type'), workers=len(workers))
+    if event_span is not None:
+        event_span.hold()
+    for w in workers:
+        job = _new_onboarding_job(event.get('id'), w, known_faces)
+        job['trace_span'] = start_span("worker", parent=event_span, hold_parent=True, event_id=event.get('id'), national_id=w.get('nationalIdNumber'))
+        _enter_lane(job)
+        pipeline.submit(job)
+    if event_span is not None:
+        event_span.release()
+
+def _run_poll_cycle(cycle_span):
     logger.info("--- Starting Polling Cycle ---")
+    started = time.perf_counter()
     
     events_response = supabase_client.get_pending_events()
     if isinstance(events_response, dict) and 'events' in events_response:
         events = events_response.get('events') or []
         logger.info(f"Received {len(events)} pending events.")
-        for event in events:
-            etype = event.get('type')
-            if etype == 'worker.created':
-                for w in event.get('workers') or []:
-                    handle_worker_created(event.get('id'), w)
-            elif etype == 'worker.deleted':
-                for w in event.get('workers') or []:
-                    wid, existing_w = _find_local_by_national_id(_workers_dict(), w.get('nationalIdNumber'))
-                    if existing_w and existing_w.get('hikcentral_person_id'):
-                        if hikcentral_client.delete_worker(existing_w['hikcentral_person_id']):
-                            delete_worker(existing_w.get('id') or wid)
-                            supabase_client.complete_event(event.get('id'))
-                        else:
-                            supabase_client.fail_event(event.get('id'), "Failed to delete worker in HikCentral")
+        if cycle_span is not None:
+            cycle_span.set(events=len(events))
+        POLL_BACKLOG_EVENTS.set(len(events))
+        POLL_BACKLOG_WORKERS.set(sum(len(event.get('workers') or []) for event in events))
+        if events:
+            publish_stream_event("progress", {"stage": "cycle_started", "events": len(events)})
+        pipeline, known_faces = _poll_pipelines() if events else (None, None)
+        try:
+            for event in events:
+                etype = event.get('type')
+                if etype == 'worker.created':
+                    if _event_in_lanes(event.get('id')):
+                        logger.info(f"Event {event.get('id')} is still being processed; not submitting it again.")
+                        continue
+                    _submit_created_event(pipeline, event, known_faces)
+                    continue
+                with span("event", event_id=event.get('id'), type=etype):
+                    if etype == 'worker.deleted':
+                        workers = event.get('workers') or []
+                        # Must observe the onboarding of its workers queued before it, in their lanes only
+                        pipeline.join({_poll_lane_site(w) for w in workers})
+                        for w in workers:
+                            with span("worker", event_id=event.get('id'), national_id=w.get('nationalIdNumber')):
+                                handle_worker_deleted(event.get('id'), w)
                     else:
+                        logger.warning(f"Unhandled event type: {etype}")
                         supabase_client.complete_event(event.get('id'))
-            else:
-                logger.warning(f"Unhandled event type: {etype}")
-                supabase_client.complete_event(event.get('id'))
+        finally:
+            if pipeline is not None:
+                save_pipeline_stats(_site_pipeline_stats(pipeline))
+                record_event_time()
+                publish_stream_event("progress", {"stage": "cycle_finished", "events": len(events)})
     elif events_response is not None:
         logger.error(f"Failed to fetch events from Supabase. Response: {events_response}")
-        
+
+    compact_event_ledger()
+    POLL_CYCLE_SECONDS.observe(time.perf_counter() - started)
+    write_metrics_snapshot()
     logger.info("--- Polling Cycle Finished ---")
 
 # Example worker data structure (for reference)
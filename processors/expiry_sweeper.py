@@ -0,0 +1,178 @@
+import heapq
+import logging
+import threading
+import time
+from api.sites import get_client, site_of
+from config import EXPIRY_ACTION, EXPIRY_BATCH_SIZE, SITES
+from database import load_workers, add_or_update_worker, worker_unit_of_work, workers_file_state
+from utils.leader_lease import leader_term
+from utils.metrics import WORKERS_EXPIRED
+
+logger = logging.getLogger('HydeParkSync.ExpirySweeper')
+
+EXPIRED_STATUS = "expired"
+
+class ExpirySweeper:
+    """
+    Min-heap of (valid_to, worker_id) so each sweep only touches workers that expired.
+
+    Entries are invalidated lazily: a popped entry is acted on only if it still matches
+    the latest deadline scheduled for that worker.
+
+    Saves in this process move deadlines through schedule(). The heap is rebuilt from the
+    store when this process becomes leader and when another process rewrote workers.json
+    (bulk import, reconciliation run from the command line).
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}
+        self._lock = threading.Lock()
+        self._built = False
+        self._built_term = None
+        self._built_mtime = None
+
+    def _stale(self):
+        if not self._built or self._built_term != leader_term():
+            return True
+        mtime, written_here = workers_file_state()
+        if mtime == self._built_mtime:
+            return False
+        if written_here:
+            self._built_mtime = mtime  # Saved by this process, which scheduled its changes
+            return False
+        return True
+
+    def rebuild(self, workers=None):
+        """Rebuilds the heap from the store."""
+        term = leader_term()
+        mtime, _ = workers_file_state()  # Taken before reading, so a write during the load triggers another rebuild
+        workers = load_workers() if workers is None else workers
+        heap = []
+        deadlines = {}
+        for worker_id, worker in workers.items():
+            deadline = self._deadline(worker)
+            if deadline is not None:
+                heap.append((deadline, str(worker_id)))
+                deadlines[str(worker_id)] = deadline
+        heapq.heapify(heap)
+        with self._lock:
+            self._heap = heap
+            self._deadlines = deadlines
+            self._built = True
+            self._built_term = term
+            self._built_mtime = mtime
+        logger.info(f"Expiry schedule rebuilt with {len(heap)} workers.")
+
+    def schedule(self, worker):
+        """Registers (or moves) the expiry of a worker after it was saved."""
+        worker_id = str(worker.id)
+        deadline = self._deadline(worker)
+        with self._lock:
+            if deadline is None:
+                self._deadlines.pop(worker_id, None)
+                return
+            if self._deadlines.get(worker_id) == deadline:
+                return
+            self._deadlines[worker_id] = deadline
+            heapq.heappush(self._heap, (deadline, worker_id))
+            if len(self._heap) > 2 * len(self._deadlines) + 1024:
+                # Too many superseded entries: rebuild from the live deadlines
+                self._heap = [(d, wid) for wid, d in self._deadlines.items()]
+                heapq.heapify(self._heap)
+
+    def unschedule(self, worker_id):
+        """Forgets a worker, e.g. after it was deleted."""
+        with self._lock:
+            self._deadlines.pop(str(worker_id), None)
+
+    def next_deadline(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def pending(self):
+        with self._lock:
+            return len(self._deadlines)
+
+    def _deadline(self, worker):
+        if worker.status == EXPIRED_STATUS or not worker.hikcentral_person_id:
+            return None
+        valid_to = worker.valid_to_time  # models.parse_validity of the stored string
+        if valid_to is None:
+            if worker.valid_to:
+                logger.warning(f"Ignoring unparseable validity date: {worker.valid_to}")
+            return None
+        return valid_to.timestamp()
+
+    def _pop_due(self, now):
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, worker_id = heapq.heappop(self._heap)
+                if self._deadlines.get(worker_id) == deadline:
+                    del self._deadlines[worker_id]
+                    due.append(worker_id)
+        return due
+
+    def sweep(self, now=None):
+        """Revokes or deletes workers whose validity ended. Returns the number of workers expired."""
+        if self._stale():
+            self.rebuild()
+        now = time.time() if now is None else now
+        due = self._pop_due(now)
+        if not due:
+            return 0
+
+        with worker_unit_of_work():  # One workers.json write for the whole sweep
+            workers = load_workers()
+            by_site = {}
+            for worker_id in due:
+                worker = workers.get(worker_id)
+                # The store is authoritative: skip workers removed since they were scheduled,
+                # and move those renewed meanwhile to their stored deadline
+                deadline = self._deadline(worker) if worker else None
+                if deadline is None:
+                    continue
+                if deadline <= now:
+                    by_site.setdefault(site_of(worker), []).append(worker)
+                else:
+                    self.schedule(worker)
+            expired = 0
+            for site, site_workers in by_site.items():
+                if site not in SITES:
+                    logger.error(f"Cannot expire {len(site_workers)} workers of unknown site {site}.")
+                    continue
+                expired += self._expire_site(get_client(site), site_workers)
+        if expired:
+            logger.info(f"Expired {expired} workers ({EXPIRY_ACTION}).")
+        return expired
+
+    def _expire_site(self, client, workers):
+        """Revokes or deletes due workers of one site in batches. Returns the number expired."""
+        expired = 0
+        for start in range(0, len(workers), EXPIRY_BATCH_SIZE):
+            batch = workers[start:start + EXPIRY_BATCH_SIZE]
+            person_ids = [w.hikcentral_person_id for w in batch]
+            if EXPIRY_ACTION == "delete":
+                ok = client.delete_workers(person_ids)
+            else:
+                ok = client.remove_from_privilege_group(person_ids)
+            if not ok:
+                # Retry the batch on the next sweep
+                for worker in batch:
+                    self.schedule(worker)
+                continue
+            for worker in batch:
+                worker.status = EXPIRED_STATUS
+                if EXPIRY_ACTION == "delete":
+                    worker.hikcentral_person_id = None
+                add_or_update_worker(worker)
+            expired += len(batch)
+            WORKERS_EXPIRED.inc(len(batch))
+        return expired
+
+expiry_sweeper = ExpirySweeper()
+
+def sweep_expired_workers():
+    """Scheduler entry point for the expiry sweep."""
+    return expiry_sweeper.sweep()
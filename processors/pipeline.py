@@ -0,0 +1,226 @@
+import logging
+import queue
+import threading
+import time
+from utils.metrics import STAGE_SECONDS, STAGE_QUEUE_DEPTH
+from utils.profiler import profile_thread
+from utils.tracing import span, use_span
+
+logger = logging.getLogger('HydeParkSync.Pipeline')
+
+_STOP = object()
+
+class Stage:
+    """A pipeline stage: a function applied to each job by a fixed number of worker threads."""
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.pipeline_name = ""
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.max_seconds = 0.0
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed, failed=False):
+        STAGE_SECONDS.labels(self.pipeline_name, self.name).observe(elapsed)
+        with self._lock:
+            self.processed += 1
+            self.failed += 1 if failed else 0
+            self.busy_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+class Pipeline:
+    """
+    Runs jobs (dicts) through a sequence of stages connected by bounded queues,
+    so different jobs can be in different stages at the same time.
+
+    A stage that raises marks the job as failed. A job with a truthy 'done' key
+    skips the remaining stages except the last one, which always sees every job.
+    If the job carries a 'trace_span', each stage is traced as a child of it and
+    the span is ended after the last stage.
+    """
+
+    def __init__(self, name, stages, queue_size=16):
+        self.name = name
+        self.stages = stages
+        for stage in stages:
+            stage.pipeline_name = name
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.threads = []
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._started = False
+
+    def start(self):
+        if self._started:
+            return self
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                t = threading.Thread(target=self._worker, args=(index,), name=f"{self.name}-{stage.name}-{n}", daemon=True)
+                t.start()
+                self.threads.append(t)
+        self._started = True
+        return self
+
+    def submit(self, job):
+        """Queues a job for the first stage, blocking while that stage's queue is full."""
+        with self._pending_cond:
+            self._pending += 1
+        self._put(0, job)
+
+    def join(self):
+        """Waits until every submitted job has left the last stage."""
+        with self._pending_cond:
+            while self._pending:
+                self._pending_cond.wait()
+
+    def close(self):
+        """Drains outstanding jobs and stops the worker threads."""
+        if not self._started:
+            return
+        self.join()
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                self.queues[index].put(_STOP)
+        for t in self.threads:
+            t.join()
+        self.threads = []
+        for stage in self.stages:
+            STAGE_QUEUE_DEPTH.labels(self.name, stage.name).set(0)
+        self._started = False
+
+    def run_inline(self, job):
+        """Runs a single job through all stages on the calling thread."""
+        for index in range(len(self.stages)):
+            self._apply(index, job)
+        return job
+
+    def stats(self):
+        """Returns per-stage queue depth and service time."""
+        result = {}
+        for index, stage in enumerate(self.stages):
+            processed = stage.processed
+            result[stage.name] = {
+                "workers": stage.workers,
+                "queue_depth": self.queues[index].qsize(),
+                "max_queue_depth": stage.max_queue_depth,
+                "processed": processed,
+                "failed": stage.failed,
+                "avg_service_seconds": round(stage.busy_seconds / processed, 4) if processed else 0.0,
+                "max_service_seconds": round(stage.max_seconds, 4),
+            }
+        return result
+
+    def _put(self, index, job):
+        q = self.queues[index]
+        q.put(job)
+        stage = self.stages[index]
+        depth = q.qsize()
+        STAGE_QUEUE_DEPTH.labels(self.name, stage.name).set(depth)
+        if depth > stage.max_queue_depth:
+            stage.max_queue_depth = depth
+
+    def _apply(self, index, job):
+        stage = self.stages[index]
+        if job.get('done') and index < len(self.stages) - 1:
+            return
+        started = time.perf_counter()
+        failed = False
+        try:
+            with profile_thread(), use_span(job.get('trace_span')), span(f"stage.{stage.name}"):
+                stage.func(job)
+        except Exception as e:
+            logger.error(f"Pipeline {self.name} stage {stage.name} failed: {e}")
+            job['success'] = False
+            job['reason'] = job.get('reason') or str(e)
+            job['done'] = True
+            failed = True
+        stage.record(time.perf_counter() - started, failed)
+        if index == len(self.stages) - 1 and job.get('trace_span') is not None:
+            job['trace_span'].set(success=job.get('success'), reason=job.get('reason'))
+            job['trace_span'].end()
+
+    def _worker(self, index):
+        q = self.queues[index]
+        last = index == len(self.stages) - 1
+        while True:
+            job = q.get()
+            if job is _STOP:
+                break
+            self._apply(index, job)
+            if last:
+                with self._pending_cond:
+                    self._pending -= 1
+                    self._pending_cond.notify_all()
+            else:
+                self._put(index + 1, job)
+
+class PipelineGroup:
+    """
+    Independent pipelines for jobs routed by a key (one per site), created on first use.
+
+    Each pipeline is fed from an unbounded inbox by its own thread, so submit() never
+    blocks on a pipeline whose first queue is full: a slow pipeline only holds up
+    its own jobs. join() waits for the given pipelines (all by default); close() stops
+    every pipeline.
+    """
+
+    def __init__(self, build, key):
+        self.build = build  # key -> Pipeline
+        self.key = key  # job -> key
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        return self
+
+    def submit(self, job):
+        self._lane(self.key(job))[1].put(job)
+
+    def _lane(self, key):
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                pipeline = self.build(key).start()
+                inbox = queue.Queue()
+                feeder = threading.Thread(target=self._feed, args=(pipeline, inbox), name=f"{pipeline.name}-feeder", daemon=True)
+                feeder.start()
+                lane = self._lanes[key] = (pipeline, inbox, feeder)
+            return lane
+
+    def _feed(self, pipeline, inbox):
+        while True:
+            job = inbox.get()
+            try:
+                if job is _STOP:
+                    break
+                pipeline.submit(job)
+            finally:
+                inbox.task_done()
+
+    def join(self, keys=None):
+        """Waits until the jobs submitted to the pipelines of keys (every pipeline if None) have left them."""
+        with self._lock:
+            lanes = [lane for key, lane in self._lanes.items() if keys is None or key in keys]
+        for pipeline, inbox, _ in lanes:
+            inbox.join()
+            pipeline.join()
+
+    def close(self):
+        """Drains outstanding jobs and stops every pipeline; their stats stay available."""
+        with self._lock:
+            lanes = list(self._lanes.values())
+        for pipeline, inbox, feeder in lanes:
+            inbox.put(_STOP)
+            feeder.join()
+            pipeline.close()
+
+    def stats(self):
+        """Returns the stats of each pipeline, by key."""
+        with self._lock:
+            lanes = dict(self._lanes)
+        return {key: lane[0].stats() for key, lane in lanes.items()}
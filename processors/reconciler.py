@@ -0,0 +1,218 @@
+import base64
+import hashlib
+import logging
+import sys
+from datetime import datetime
+from api.sites import get_client, site_names, site_of
+from config import RECONCILE_PAGE_SIZE, RECONCILE_REPAIR_BATCH_SIZE, RECONCILE_DELETE_ORPHANS, LOG_FILE
+from database import load_workers, add_or_update_worker, worker_unit_of_work, load_reconcile_checkpoint, save_reconcile_checkpoint
+from processors.expiry_sweeper import EXPIRED_STATUS
+from utils.face_processor import get_image_base64
+from utils.leader_lease import exclusive_run, still_leader
+
+logger = logging.getLogger('HydeParkSync.Reconciler')
+
+# Every site is reconciled against its own HikCentral server, one after the other.
+# A run of a site goes through these phases. Its checkpoint records the phase and
+# position inside it, so an interrupted run resumes where it stopped.
+PHASE_SCAN = "scan"
+PHASE_REPAIR = "repair"
+PHASE_DONE = "done"
+
+def _new_checkpoint():
+    return {
+        "started_at": datetime.now().isoformat(),
+        "finished_at": None,
+        "phase": PHASE_SCAN,
+        "next_page": 1,
+        "seen_person_ids": [],
+        "orphan_person_ids": [],
+        "missing_person_ids": [],
+        "repair_position": 0,
+        "stats": {"scanned": 0, "orphans_found": 0, "orphans_deleted": 0, "missing_found": 0, "reenrolled": 0, "repair_failures": 0},
+    }
+
+def _local_person_index(workers, site):
+    """Maps the HikCentral person IDs of a site to local worker IDs."""
+    return {str(w.hikcentral_person_id): wid for wid, w in workers.items() if w.hikcentral_person_id and site_of(w) == site}
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _delete_orphans(client, orphans, checkpoint):
+    """Deletes device-side persons with no local worker, in batches."""
+    checkpoint["stats"]["orphans_found"] += len(orphans)
+    if not orphans:
+        return
+    if not RECONCILE_DELETE_ORPHANS:
+        logger.warning(f"Found {len(orphans)} HikCentral persons without a local worker (not deleted): {orphans[:20]}")
+        return
+    for batch in _batches(orphans, RECONCILE_REPAIR_BATCH_SIZE):
+        # Re-check against the store: a poll cycle may have enrolled one of them since the page was read
+        local_ids = _local_person_index(load_workers(), client.site)
+        batch = [pid for pid in batch if pid not in local_ids]
+        if batch and client.delete_workers(batch):
+            checkpoint["stats"]["orphans_deleted"] += len(batch)
+        elif batch:
+            checkpoint["stats"]["repair_failures"] += len(batch)
+
+def _scan(client, checkpoint, page_size):
+    """
+    Pages through the HikCentral person list, recording which local persons exist there.
+    Orphans are deleted once every page was read: deleting them while paging would shift
+    the persons after them to earlier pages, and the scan would skip them.
+    """
+    local_ids = _local_person_index(load_workers(), client.site)
+    seen = set(checkpoint["seen_person_ids"])
+    orphans = set(checkpoint.get("orphan_person_ids") or [])
+    while True:
+        page_no = checkpoint["next_page"]
+        if not still_leader():
+            logger.warning(f"Lost the leader lease; reconciliation of site {client.site} stopped at page {page_no} and resumes from there.")
+            return False
+        page = client.list_persons(page_no, page_size)
+        if page is None:
+            logger.error(f"Reconciliation of site {client.site} stopped at page {page_no}; it will resume from there.")
+            return False
+        persons = page["list"]
+        for person in persons:
+            pid = str(person.get('personId') or '')
+            if not pid:
+                continue
+            if pid in local_ids:
+                seen.add(pid)
+            elif str(person.get('orgIndexCode')) == str(client.org_index_code):
+                orphans.add(pid)
+
+        checkpoint["stats"]["scanned"] += len(persons)
+        checkpoint["seen_person_ids"] = sorted(seen)
+        checkpoint["orphan_person_ids"] = sorted(orphans)
+        checkpoint["next_page"] = page_no + 1
+        save_reconcile_checkpoint(checkpoint, client.site)
+        if not persons or page_no * page_size >= page["total"]:
+            break
+
+    _delete_orphans(client, sorted(orphans), checkpoint)
+    missing = sorted(set(local_ids) - seen)
+    checkpoint["missing_person_ids"] = missing
+    checkpoint["stats"]["missing_found"] = len(missing)
+    checkpoint["seen_person_ids"] = []
+    checkpoint["orphan_person_ids"] = []
+    checkpoint["phase"] = PHASE_REPAIR
+    save_reconcile_checkpoint(checkpoint, client.site)
+    return True
+
+def _reenroll(client, worker):
+    """
+    Re-creates a worker whose HikCentral person was deleted on the device side.
+    Returns (new person ID, content hash of the face uploaded or None), or (None, None).
+    """
+    person_id = client.add_worker(worker)
+    if not person_id:
+        return None, None
+    face_hash = None
+    if worker.face_image_url:
+        face_b64 = get_image_base64(worker.face_image_url, worker.id)
+        if face_b64 and client.add_face_to_person(person_id, face_b64):
+            face_hash = hashlib.sha256(base64.b64decode(face_b64)).hexdigest()
+    client.add_to_privilege_group(person_id, valid_from=worker.get('valid_from', ''), valid_to=worker.get('valid_to', ''))
+    return person_id, face_hash
+
+def _repair_missing(client, checkpoint):
+    """Re-enrolls local workers whose person no longer exists in HikCentral, in checkpointed batches. Returns False if interrupted."""
+    missing = checkpoint["missing_person_ids"]
+    while checkpoint["repair_position"] < len(missing):
+        start = checkpoint["repair_position"]
+        if not still_leader():
+            logger.warning(f"Lost the leader lease; repairs of site {client.site} stopped at {start}/{len(missing)} and resume from there.")
+            return False
+        batch = missing[start:start + RECONCILE_REPAIR_BATCH_SIZE]
+        # Committed when the block is left, before the checkpoint moves past the batch
+        with worker_unit_of_work():
+            workers = load_workers()
+            local_ids = _local_person_index(workers, client.site)
+            for person_id in batch:
+                worker_id = local_ids.get(person_id)
+                if worker_id is None:
+                    continue  # Deleted or re-enrolled locally since the scan
+                # Confirm before repairing, the person may have been added after its page was scanned
+                exists = client.person_exists(person_id)
+                if exists is not False:
+                    continue
+                worker = workers[worker_id]
+                if worker.status in ('blocked', EXPIRED_STATUS):
+                    continue  # Removed from HikCentral on purpose
+                new_person_id, face_hash = _reenroll(client, worker)
+                if new_person_id:
+                    logger.info(f"Re-enrolled worker {worker_id}: PersonID {person_id} -> {new_person_id}")
+                    worker.hikcentral_person_id = new_person_id
+                    # The stored fields were just sent again; the face fingerprint is the face the
+                    # new person got (none if the upload failed, so the next event uploads it again)
+                    fingerprint = dict(worker.sync_fingerprint or {})
+                    if face_hash:
+                        fingerprint['face'] = face_hash
+                    else:
+                        fingerprint.pop('face', None)
+                    worker.sync_fingerprint = fingerprint
+                    add_or_update_worker(worker)
+                    checkpoint["stats"]["reenrolled"] += 1
+                else:
+                    checkpoint["stats"]["repair_failures"] += 1
+        checkpoint["repair_position"] = start + len(batch)
+        save_reconcile_checkpoint(checkpoint, client.site)
+    return True
+
+def reconcile_site(site, page_size=RECONCILE_PAGE_SIZE):
+    """
+    Finds drift between the workers of a site and its HikCentral server and repairs it.
+    Resumes an interrupted run from its checkpoint. Returns the run stats.
+    """
+    client = get_client(site)
+    checkpoint = load_reconcile_checkpoint(site)
+    if not checkpoint or checkpoint.get("phase") == PHASE_DONE:
+        checkpoint = _new_checkpoint()
+        save_reconcile_checkpoint(checkpoint, site)
+    else:
+        logger.info(f"Resuming reconciliation of site {site} started at {checkpoint['started_at']} (phase: {checkpoint['phase']}).")
+
+    logger.info(f"--- Starting Reconciliation of site {site} ---")
+    if checkpoint["phase"] == PHASE_SCAN and not _scan(client, checkpoint, page_size):
+        return checkpoint["stats"]
+    if checkpoint["phase"] == PHASE_REPAIR and not _repair_missing(client, checkpoint):
+        return checkpoint["stats"]
+
+    checkpoint["phase"] = PHASE_DONE
+    checkpoint["finished_at"] = datetime.now().isoformat()
+    checkpoint["missing_person_ids"] = []
+    save_reconcile_checkpoint(checkpoint, site)
+    logger.info(f"--- Reconciliation of site {site} Finished: {checkpoint['stats']} ---")
+    return checkpoint["stats"]
+
+def run_reconciliation(page_size=RECONCILE_PAGE_SIZE):
+    """Reconciles every configured site. Returns the run stats by site."""
+    results = {}
+    for site in site_names():
+        if not still_leader():
+            break
+        try:
+            results[site] = reconcile_site(site, page_size)
+        except Exception as e:
+            # An unreachable or misconfigured site must not keep the others from being reconciled
+            logger.error(f"Reconciliation of site {site} failed: {e}")
+    return results
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
+    # Holds the leader lease, so a running poller does not reconcile or poll meanwhile
+    with exclusive_run("the reconciliation") as acquired:
+        if not acquired:
+            sys.exit(1)
+        run_reconciliation()
@@ -0,0 +1,132 @@
+import argparse
+import csv
+import io
+import json
+import logging
+import sys
+import zlib
+from database import iter_workers, iter_request_logs
+
+logger = logging.getLogger('HydeParkSync.Export')
+
+# Streaming exports of the workers and the request logs for audits, as NDJSON or CSV,
+# optionally gzipped. Records are read from the store one at a time (database.iter_*)
+# and encoded into chunks as the consumer pulls them, so memory stays flat however
+# large the files are. Used by the dashboard's /export endpoints and from the shell:
+#
+#   python -m utils.export workers --format csv -o workers.csv
+#   python -m utils.export logs --gzip -o logs.ndjson.gz
+
+FORMATS = ("ndjson", "csv")
+DATASETS = ("workers", "logs")
+
+# CSV needs its columns up front; NDJSON exports every field
+WORKER_COLUMNS = ("id", "name", "national_id", "unit_number", "site", "status", "valid_from", "valid_to",
+                  "hikcentral_person_id", "face_image_url")
+LOG_COLUMNS = ("id", "timestamp", "api_type", "endpoint", "success", "status_code", "message",
+               "request_data", "response_data")
+
+_CHUNK_SIZE = 64 * 1024
+
+def iter_records(dataset, **filters):
+    """Streams the records of a dataset matching the filters (workers: status, unit_number; logs: api_type, since, until)."""
+    filters = {k: v for k, v in filters.items() if v}
+    if dataset == "workers":
+        for worker in iter_workers():
+            if filters.get("status") and str(worker.get("status")) != filters["status"]:
+                continue
+            if filters.get("unit_number") and str(worker.get("unit_number")) != filters["unit_number"]:
+                continue
+            yield worker
+    elif dataset == "logs":
+        for entry in iter_request_logs():
+            timestamp = entry.get("timestamp") or ""
+            if filters.get("api_type") and entry.get("api_type") != filters["api_type"]:
+                continue
+            if filters.get("since") and timestamp < filters["since"]:
+                continue
+            if filters.get("until") and timestamp >= filters["until"]:
+                continue
+            yield entry
+    else:
+        raise ValueError(f"Unknown dataset: {dataset}")
+
+def _ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+def _csv_lines(records, columns):
+    buffer = io.StringIO()
+    buffer.write("\ufeff")  # BOM, so spreadsheet apps read the Arabic names as UTF-8
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    for record in records:
+        writer.writerow({k: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+                         for k, v in record.items() if k in columns})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def _chunked(lines):
+    """Joins small lines into chunks of about _CHUNK_SIZE bytes, encoded as UTF-8."""
+    parts = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        parts.append(data)
+        size += len(data)
+        if size >= _CHUNK_SIZE:
+            yield b"".join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield b"".join(parts)
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_stream(dataset, fmt="ndjson", gzip=False, **filters):
+    """Returns a generator of byte chunks with the dataset encoded as fmt."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    records = iter_records(dataset, **filters)
+    if fmt == "csv":
+        lines = _csv_lines(records, WORKER_COLUMNS if dataset == "workers" else LOG_COLUMNS)
+    else:
+        lines = _ndjson_lines(records)
+    chunks = _chunked(lines)
+    return _gzipped(chunks) if gzip else chunks
+
+def export_filename(dataset, fmt, gzip=False, stamp=None):
+    name = f"{dataset}-{stamp}" if stamp else dataset
+    return f"{name}.{fmt}{'.gz' if gzip else ''}"
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Export the workers or the request logs as NDJSON or CSV.")
+    parser.add_argument("dataset", choices=DATASETS)
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    parser.add_argument("--status", help="workers: only this status")
+    parser.add_argument("--unit-number", help="workers: only this unit")
+    parser.add_argument("--api-type", help="logs: only Supabase or HikCentral")
+    parser.add_argument("--since", help="logs: ISO timestamp, inclusive")
+    parser.add_argument("--until", help="logs: ISO timestamp, exclusive")
+    args = parser.parse_args()
+
+    filters = {"status": args.status, "unit_number": args.unit_number} if args.dataset == "workers" else \
+              {"api_type": args.api_type, "since": args.since, "until": args.until}
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in export_stream(args.dataset, args.format, args.gzip, **filters):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+            logger.info(f"Exported {args.dataset} to {args.output}")
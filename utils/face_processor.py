@@ -1,9 +1,14 @@
+import base64
 import logging
 import os
+import shutil
+import uuid
 import requests
 import numpy as np
 from config import FACE_IMAGES_DIR, FACE_RECOGNITION_THRESHOLD
 from database import load_workers
+from models import ENCODING_DTYPE
+from utils.tracing import span
 
 logger = logging.getLogger('HydeParkSync.FaceProcessor')
 
@@ -27,21 +32,26 @@ def _mock_face_exists(image_path):
     # In a real scenario, this would use face_recognition.face_locations(image)
     return True
 
-def download_image(url, worker_id):
-    """Downloads the face image from the given URL."""
+def download_image(url, worker_id, unique=False):
+    """
+    Downloads the face image from the given URL.
+    With unique=True the file name gets a random suffix, so concurrent downloads for the same worker don't collide.
+    """
     if not url:
         logger.error(f"Worker {worker_id} has no face image URL.")
         return None
         
-    image_path = os.path.join(FACE_IMAGES_DIR, f"{worker_id}.jpg")
+    file_name = f"{worker_id}.{uuid.uuid4().hex[:8]}.jpg" if unique else f"{worker_id}.jpg"
+    image_path = os.path.join(FACE_IMAGES_DIR, file_name)
     
     try:
-        response = requests.get(url, stream=True, timeout=10)
-        response.raise_for_status()
-        
-        with open(image_path, 'wb') as f:
-            for chunk in response.iter_content(1024):
-                f.write(chunk)
+        with span("image.download", worker_id=worker_id):
+            response = requests.get(url, stream=True, timeout=10)
+            response.raise_for_status()
+            
+            with open(image_path, 'wb') as f:
+                for chunk in response.iter_content(1024):
+                    f.write(chunk)
         
         logger.info(f"Successfully downloaded image for worker {worker_id} to {image_path}")
         return image_path
@@ -50,6 +60,57 @@ def download_image(url, worker_id):
         logger.error(f"Failed to download image from {url}: {e}")
         return None
 
+def copy_local_image(source_path, worker_id):
+    """Copies a local face photo into the face images directory under a unique name, like download_image(unique=True)."""
+    image_path = os.path.join(FACE_IMAGES_DIR, f"{worker_id}.{uuid.uuid4().hex[:8]}.jpg")
+    try:
+        shutil.copyfile(source_path, image_path)
+        return image_path
+    except OSError as e:
+        logger.error(f"Failed to copy face photo {source_path} for worker {worker_id}: {e}")
+        return None
+
+def get_face_encoding(image_path):
+    """Returns the face encoding of an image, or None if no face is detected."""
+    if not _mock_face_exists(image_path):
+        return None
+    return _mock_get_face_encoding(image_path)
+
+# Stored encodings are compared in blocks: one vectorized distance computation per block,
+# with an early exit at the first match and bounded temporary memory
+_DUPLICATE_SCAN_BLOCK = 4096
+
+def find_duplicate_encoding(encoding, workers, exclude_id=None):
+    """Returns (worker_id, distance) of the first stored encoding within the threshold, or (None, None)."""
+    encoding = np.asarray(encoding, dtype=ENCODING_DTYPE)
+    ids = []
+    vectors = []
+
+    def scan():
+        distances = np.linalg.norm(np.stack(vectors) - encoding, axis=1)
+        hits = np.flatnonzero(distances < FACE_RECOGNITION_THRESHOLD)
+        return (ids[hits[0]], float(distances[hits[0]])) if hits.size else (None, None)
+
+    for existing_worker_id, existing_worker in workers.items():
+        if exclude_id is not None and str(existing_worker_id) == str(exclude_id):
+            continue
+        existing_encoding = existing_worker.get('face_encoding')
+        if existing_encoding is None:
+            continue
+        existing_vec = np.asarray(existing_encoding, dtype=ENCODING_DTYPE)
+        if existing_vec.shape != encoding.shape:
+            logger.warning(f"Failed face duplicate comparison against worker {existing_worker_id}: encoding shape {existing_vec.shape}")
+            continue
+        ids.append(existing_worker_id)
+        vectors.append(existing_vec)
+        if len(vectors) >= _DUPLICATE_SCAN_BLOCK:
+            found = scan()
+            if found[0] is not None:
+                return found
+            ids.clear()
+            vectors.clear()
+    return scan() if vectors else (None, None)
+
 def process_face_image(worker_data):
     """
     Handles face image processing: download, detection, and duplicate check.
@@ -66,30 +127,20 @@ def process_face_image(worker_data):
     if not image_path:
         return False
 
-    if not _mock_face_exists(image_path):
+    new_encoding = get_face_encoding(image_path)
+    if new_encoding is None:
         logger.error(f"No face detected in the image for worker {worker_id}.")
         os.remove(image_path)
         return False
 
-    new_encoding = _mock_get_face_encoding(image_path)
-
     # Duplicate check using simple Euclidean distance on stored encodings
-    workers = load_workers()
-    for existing_worker_id, existing_worker in workers.items():
-        existing_encoding = existing_worker.get('face_encoding')
-        if existing_encoding is not None:
-            try:
-                existing_vec = np.array(existing_encoding)
-                dist = float(np.linalg.norm(existing_vec - new_encoding))
-                if dist < FACE_RECOGNITION_THRESHOLD:
-                    logger.error(f"Duplicate face detected for worker {worker_id} (matches {existing_worker_id}). Distance={dist:.4f}")
-                    os.remove(image_path)
-                    return False
-            except Exception as e:
-                logger.warning(f"Failed face duplicate comparison for worker {worker_id}: {e}")
-
-    # Save the new encoding (MOCK: saving as list)
-    worker_data['face_encoding'] = new_encoding.tolist()
+    dup_id, dist = find_duplicate_encoding(new_encoding, load_workers(), exclude_id=worker_id)
+    if dup_id is not None:
+        logger.error(f"Duplicate face detected for worker {worker_id} (matches {dup_id}). Distance={dist:.4f}")
+        os.remove(image_path)
+        return False
+
+    worker_data['face_encoding'] = new_encoding
     return True
 
 def delete_face_image(worker_id):
@@ -108,19 +159,10 @@ def find_duplicate_by_face(image_url, worker_id):
         return None
     try:
         new_encoding = _mock_get_face_encoding(image_path)
-        workers = load_workers()
-        for existing_worker_id, existing_worker in workers.items():
-            existing_encoding = existing_worker.get('face_encoding')
-            if existing_encoding is not None:
-                try:
-                    existing_vec = np.array(existing_encoding)
-                    dist = float(np.linalg.norm(existing_vec - new_encoding))
-                    if dist < FACE_RECOGNITION_THRESHOLD:
-                        logger.info(f"Duplicate face match: input {worker_id} -> existing {existing_worker_id}")
-                        return existing_worker_id
-                except Exception:
-                    continue
-        return None
+        dup_id, _ = find_duplicate_encoding(new_encoding, load_workers())
+        if dup_id is not None:
+            logger.info(f"Duplicate face match: input {worker_id} -> existing {dup_id}")
+        return dup_id
     finally:
         try:
             if os.path.exists(image_path):
@@ -128,14 +170,17 @@ def find_duplicate_by_face(image_url, worker_id):
         except Exception:
             pass
 
+def read_image_base64(image_path):
+    """Returns the base64 encoding of a local image file."""
+    with open(image_path, 'rb') as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
 def get_image_base64(image_url, worker_id):
     image_path = download_image(image_url, worker_id)
     if not image_path:
         return None
     try:
-        with open(image_path, 'rb') as f:
-            import base64
-            return base64.b64encode(f.read()).decode('utf-8')
+        return read_image_base64(image_path)
     finally:
         try:
             if os.path.exists(image_path):
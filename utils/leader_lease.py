@@ -0,0 +1,197 @@
+import fcntl
+import functools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from config import LEADER_LEASE_FILE, LEADER_LEASE_TTL_SECONDS, LEADER_LEASE_RENEW_SECONDS
+
+logger = logging.getLogger('HydeParkSync.Lease')
+
+# Single-flight scheduling across processes. Every process that starts the scheduler
+# (main.py, poller.py) competes for a lease stored in LEADER_LEASE_FILE; reads and
+# writes of the lease happen under an exclusive flock on a side file, so taking over an
+# expired lease is atomic. The holder renews it from a heartbeat thread every
+# LEADER_LEASE_RENEW_SECONDS; if it stops renewing (crash, hang, host suspended), another
+# process takes over once LEADER_LEASE_TTL_SECONDS have passed.
+#
+# One-off commands that write the same stores (bulk import, reconciliation run from the
+# command line) hold the lease for their whole run through exclusive_run(), so the sync
+# jobs of a running poller or dashboard stand by meanwhile, and they refuse to start
+# while another process holds it.
+#
+# A process only considers itself leader until one renewal interval before its lease
+# could expire, measured on its own monotonic clock, so a holder that missed a heartbeat
+# stops starting jobs before anyone else may start them.
+
+_LOCK_FILE = f"{LEADER_LEASE_FILE}.lock"
+
+class LeaderLease:
+    def __init__(self, ttl=LEADER_LEASE_TTL_SECONDS, renew_interval=LEADER_LEASE_RENEW_SECONDS):
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._valid_until = 0.0
+        self.term = 0  # Incremented every time this process becomes leader
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_leader(self):
+        return time.monotonic() < self._valid_until
+
+    def _read(self):
+        try:
+            with open(LEADER_LEASE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, lease):
+        tmp_path = f"{LEADER_LEASE_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(lease, f)
+        os.replace(tmp_path, LEADER_LEASE_FILE)
+
+    def try_acquire(self):
+        """Takes the lease if it is free, expired or already ours, and renews it. Returns True if held."""
+        started = time.monotonic()
+        was_leader = self.is_leader()
+        with open(_LOCK_FILE, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                lease = self._read()
+                now = time.time()
+                if lease and lease.get("holder") != self.holder and lease.get("expires_at", 0) > now:
+                    self._valid_until = 0.0
+                    return False
+                ours = lease if lease and lease.get("holder") == self.holder else None
+                self._write({
+                    "holder": self.holder,
+                    "hostname": socket.gethostname(),
+                    "pid": os.getpid(),
+                    "acquired_at": ours["acquired_at"] if ours else datetime.now().isoformat(),
+                    "renewed_at": datetime.now().isoformat(),
+                    "expires_at": now + self.ttl,
+                    "ttl": self.ttl,
+                })
+                self._valid_until = started + self.ttl - self.renew_interval
+                if not was_leader:
+                    self.term += 1
+                return True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def release(self):
+        """Gives up the lease if we hold it, so another process can take over without waiting for the TTL."""
+        self._valid_until = 0.0
+        with open(_LOCK_FILE, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                lease = self._read()
+                if lease and lease.get("holder") == self.holder:
+                    os.remove(LEADER_LEASE_FILE)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.renew_interval):
+            self._renew()
+
+    def _renew(self):
+        was_leader = self.is_leader()
+        try:
+            leader = self.try_acquire()
+        except Exception as e:
+            logger.error(f"Leader lease renewal failed: {e}")
+            self._valid_until = 0.0
+            leader = False
+        if leader and not was_leader:
+            logger.info(f"Acquired the leader lease ({self.holder}); this process now runs the sync jobs.")
+        elif was_leader and not leader:
+            logger.warning(f"Lost the leader lease ({self.holder}); sync jobs are skipped in this process.")
+
+    def start(self):
+        self._renew()
+        if not self.is_leader():
+            lease = self._read() or {}
+            logger.info(f"Leader lease held by {lease.get('holder')}; this process stands by.")
+        self._thread = threading.Thread(target=self._heartbeat, name="leader-lease", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        try:
+            self.release()
+        except Exception as e:
+            logger.error(f"Could not release the leader lease: {e}")
+
+_lease = None
+
+def start_leader_lease():
+    """Starts competing for the lease in this process. Call before starting the scheduler."""
+    global _lease
+    if _lease is None:
+        _lease = LeaderLease().start()
+    return _lease
+
+def stop_leader_lease():
+    global _lease
+    if _lease is not None:
+        _lease.stop()
+        _lease = None
+
+def still_leader():
+    """True unless this process competes for the lease and does not hold it; long jobs check it between batches."""
+    return _lease is None or _lease.is_leader()
+
+@contextmanager
+def exclusive_run(name):
+    """
+    Holds the lease while a one-off command runs. Yields True if it was acquired, or
+    False, after logging who holds it, if another process holds a live lease.
+    """
+    global _lease
+    lease = LeaderLease()
+    if not lease.try_acquire():
+        holder = (lease._read() or {}).get("holder")
+        logger.error(f"Not running {name}: the leader lease is held by {holder}. Stop that process, or wait until its lease expires.")
+        yield False
+        return
+    _lease = lease.start()  # Renews it from the heartbeat for as long as the command runs
+    try:
+        yield True
+    finally:
+        stop_leader_lease()
+
+def leader_term():
+    """Changes whenever this process becomes leader, so state built while another process led can be refreshed."""
+    return _lease.term if _lease is not None else 0
+
+def leader_only(func):
+    """Wraps a scheduled job so it only runs in the lease holder (always, if no lease was started)."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _lease is not None and not _lease.is_leader():
+            logger.debug(f"Skipping {func.__name__}: not the leader.")
+            return None
+        return func(*args, **kwargs)
+    return wrapper
+
+def get_lease_status():
+    """Returns the current lease as stored, with seconds_left and expired, or None if there is none."""
+    try:
+        with open(LEADER_LEASE_FILE, 'r', encoding='utf-8') as f:
+            lease = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    lease["seconds_left"] = round(lease.get("expires_at", 0) - time.time(), 1)
+    lease["expired"] = lease["seconds_left"] <= 0
+    return lease
@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from config import STREAM_JOURNAL_FILE, STREAM_JOURNAL_MAX_BYTES
+
+logger = logging.getLogger('HydeParkSync.LiveStream')
+
+# Live events (new request logs, processing progress) are appended by the writers to a
+# small NDJSON journal. The poller and the dashboard usually run in different processes,
+# so the dashboard follows the journal with one tailer thread and fans each event out
+# to its connected clients through an in-process broadcaster.
+
+_journal_lock = threading.Lock()
+
+def publish_stream_event(kind, data):
+    """Appends a live event to the journal. Never raises: live updates must not break the writer."""
+    event = {"id": uuid.uuid4().hex, "kind": kind, "time": datetime.now().isoformat(), "data": data}
+    line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+    try:
+        with _journal_lock:
+            if os.path.exists(STREAM_JOURNAL_FILE) and os.path.getsize(STREAM_JOURNAL_FILE) > STREAM_JOURNAL_MAX_BYTES:
+                os.replace(STREAM_JOURNAL_FILE, STREAM_JOURNAL_FILE + ".1")
+            with open(STREAM_JOURNAL_FILE, 'a', encoding='utf-8') as f:
+                f.write(line)
+    except Exception as e:
+        logger.warning(f"Failed to publish live event: {e}")
+
+class Broadcaster:
+    """Fans events out to subscriber queues. Slow subscribers drop events instead of blocking others."""
+
+    def __init__(self, max_queue=1000):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._max_queue = max_queue
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self._max_queue)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                pass
+
+class JournalTailer(threading.Thread):
+    """Follows the journal from its current end and publishes each new event."""
+
+    def __init__(self, broadcaster, path=STREAM_JOURNAL_FILE, interval=0.5):
+        super().__init__(name="live-stream-tailer", daemon=True)
+        self.broadcaster = broadcaster
+        self.path = path
+        self.interval = interval
+
+    def _open(self, at_end):
+        try:
+            f = open(self.path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return None, None
+        if at_end:
+            f.seek(0, os.SEEK_END)
+        return f, os.fstat(f.fileno()).st_ino
+
+    def _drain(self, f, buffer):
+        buffer += f.read()
+        *lines, rest = buffer.split("\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                self.broadcaster.publish(json.loads(line))
+            except ValueError:
+                logger.warning("Skipping malformed live event line.")
+        return rest
+
+    def run(self):
+        f, inode = self._open(at_end=True)
+        buffer = ""
+        while True:
+            try:
+                if f is None:
+                    time.sleep(self.interval)
+                    f, inode = self._open(at_end=False)
+                    continue
+                buffer = self._drain(f, buffer)
+                time.sleep(self.interval)
+                try:
+                    rotated = os.stat(self.path).st_ino != inode
+                except FileNotFoundError:
+                    rotated = True
+                if rotated:
+                    # The old file is still readable through the open handle: finish it first
+                    buffer = self._drain(f, buffer)
+                    f.close()
+                    f, inode = self._open(at_end=False)
+                    buffer = ""
+            except Exception as e:
+                logger.error(f"Live stream tailer error: {e}")
+                time.sleep(self.interval)
+
+broadcaster = Broadcaster()
+_tailer = None
+_tailer_lock = threading.Lock()
+
+def ensure_tailer():
+    """Starts the journal tailer of this process on first use."""
+    global _tailer
+    with _tailer_lock:
+        if _tailer is None:
+            _tailer = JournalTailer(broadcaster)
+            _tailer.start()
+    return broadcaster
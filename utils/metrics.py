@@ -0,0 +1,258 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from config import METRICS_SNAPSHOT_FILE
+
+logger = logging.getLogger('HydeParkSync.Metrics')
+
+# A minimal in-process metrics registry rendered in the Prometheus text format.
+# Recording is a dict lookup plus a locked add, so it is safe on the hot path.
+# The poller writes a snapshot file that the dashboard serves at /metrics.
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = float(value)
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value):
+        self._default.set(value)
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def snapshot(self):
+        """Returns {label values: {"buckets", "counts" (per bucket, not cumulative), "sum", "count"}}."""
+        result = {}
+        for key, child in list(self._children.items()):
+            with child.lock:
+                result[key] = {"buckets": self.buckets, "counts": list(child.counts), "sum": child.sum, "count": child.count}
+        return result
+
+    def _render_child(self, key, child):
+        with child.lock:
+            counts = list(child.counts)
+            total, count = child.sum, child.count
+        lines = []
+        cumulative = 0
+        labels = _format_labels(self.labelnames, key)
+        inf_le = 'le="+Inf"'
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            le = 'le="%s"' % _format_value(float(bound))
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, inf_le)} {count}")
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Atomically writes the current values to a file in the Prometheus text format."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+                f.write(f"# snapshot written at {time.time():.3f}\n")
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to write metrics snapshot to {path}: {e}")
+            return False
+
+REGISTRY = Registry()
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+def write_metrics_snapshot():
+    """Writes this process's metrics to the snapshot file served by the dashboard at /metrics."""
+    return REGISTRY.write_textfile(METRICS_SNAPSHOT_FILE)
+
+# --- Metrics shared across modules ---
+
+INTEGRATION_REQUEST_SECONDS = histogram(
+    "hydepark_integration_request_duration_seconds",
+    "Latency of HikCentral and Supabase API calls.",
+    ("api", "endpoint"))
+INTEGRATION_REQUESTS = counter(
+    "hydepark_integration_requests_total",
+    "HikCentral and Supabase API calls by HTTP status and API result code.",
+    ("api", "endpoint", "status", "code"))
+STAGE_SECONDS = histogram(
+    "hydepark_stage_duration_seconds",
+    "Service time of processing stages (download, encode, dedupe, HikCentral calls, DB save, ...).",
+    ("pipeline", "stage"))
+STAGE_QUEUE_DEPTH = gauge(
+    "hydepark_stage_queue_depth",
+    "Jobs waiting in front of a pipeline stage.",
+    ("pipeline", "stage"))
+STORE_WRITE_SECONDS = histogram(
+    "hydepark_store_write_duration_seconds",
+    "Time spent rewriting a local JSON store file.",
+    ("store",))
+POLL_CYCLE_SECONDS = histogram(
+    "hydepark_poll_cycle_duration_seconds",
+    "Duration of poll_and_process_events cycles.",
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+POLL_BACKLOG_EVENTS = gauge(
+    "hydepark_poll_backlog_events",
+    "Pending events returned by the last poll.")
+POLL_BACKLOG_WORKERS = gauge(
+    "hydepark_poll_backlog_workers",
+    "Workers contained in the pending events of the last poll.")
+EVENT_LEDGER_LOOKUPS = counter(
+    "hydepark_event_ledger_lookups_total",
+    "Processed-event ledger lookups by result (hit = event already applied).",
+    ("result",))
+WORKERS_EXPIRED = counter(
+    "hydepark_workers_expired_total",
+    "Workers expired by the expiry sweeper.")
@@ -0,0 +1,232 @@
+import cProfile
+import json
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from config import PROFILE_REQUEST_FILE, PROFILES_DIR, PROFILE_SAMPLE_INTERVAL_SECONDS, PROFILE_KEEP_FILES
+
+logger = logging.getLogger('HydeParkSync.Profiler')
+
+# On-demand profiling of poll cycles. The dashboard writes a request ("profile the next N
+# cycles with mode M") to a small JSON file; the poller claims one cycle from it at the
+# start of each cycle and writes the result to PROFILES_DIR, where the dashboard lists it.
+#
+# Modes:
+#   cprofile - deterministic profile (pstats file) of the cycle thread and of the jobs the
+#              pipeline threads run meanwhile. Adds noticeable overhead.
+#   sampling - samples the stacks of all threads every few milliseconds and writes them in
+#              the collapsed-stack format used by flamegraph.pl and speedscope. Low overhead.
+
+MODES = ("cprofile", "sampling")
+
+_request_lock = threading.Lock()
+_active = None  # The running cProfile session, so pipeline threads can join it
+_active_lock = threading.Lock()
+
+# --- Requests (written by the dashboard, claimed by the poller) ---
+
+def _write_request(request):
+    tmp_path = f"{PROFILE_REQUEST_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(request, f)
+    os.replace(tmp_path, PROFILE_REQUEST_FILE)
+
+def request_profile(mode, cycles):
+    """Asks the poller to profile the next cycles with mode. Returns the stored request."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode: {mode}")
+    request = {"mode": mode, "cycles": max(1, int(cycles)), "requested_at": datetime.now().isoformat()}
+    with _request_lock:
+        _write_request(request)
+    return request
+
+def cancel_profile():
+    with _request_lock:
+        if os.path.exists(PROFILE_REQUEST_FILE):
+            os.remove(PROFILE_REQUEST_FILE)
+
+def get_profile_request():
+    """Returns the pending request, or None."""
+    try:
+        with open(PROFILE_REQUEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _claim_cycle():
+    """Takes one cycle from the pending request and returns its mode, or None if nothing is requested."""
+    if not os.path.exists(PROFILE_REQUEST_FILE):
+        return None
+    with _request_lock:
+        request = get_profile_request()
+        if not request or request.get("mode") not in MODES:
+            return None
+        remaining = int(request.get("cycles", 0)) - 1
+        if remaining > 0:
+            request["cycles"] = remaining
+            _write_request(request)
+        elif os.path.exists(PROFILE_REQUEST_FILE):
+            os.remove(PROFILE_REQUEST_FILE)
+        return request["mode"]
+
+# --- Profilers ---
+
+class _CProfileSession:
+    def __init__(self):
+        self.profiles = []
+        self._by_thread = {}  # Thread ident -> its profile, reused for every job the thread runs
+        self.running = set()  # Idents of the threads whose profile is enabled right now
+        self._lock = threading.Lock()
+
+    def thread_profile(self):
+        ident = threading.get_ident()
+        with self._lock:
+            profile = self._by_thread.get(ident)
+            if profile is None:
+                profile = self._by_thread[ident] = cProfile.Profile()
+                self.profiles.append(profile)
+            return profile
+
+    def write(self, path):
+        stats = pstats.Stats(*self.profiles)
+        stats.dump_stats(path)
+
+class SamplingProfiler(threading.Thread):
+    """Samples the stacks of all other threads at a fixed interval."""
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL_SECONDS):
+        super().__init__(name="sampling-profiler", daemon=True)
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                # Pipeline threads are named <pipeline>-<stage>-<n>; fold the workers of a stage together
+                thread_name = re.sub(r'-\d+$', '', names.get(thread_id, str(thread_id)))
+                stack.append(thread_name)
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+def _prune_profiles():
+    files = list_profiles()
+    for entry in files[PROFILE_KEEP_FILES:]:
+        try:
+            os.remove(os.path.join(PROFILES_DIR, entry["name"]))
+        except OSError:
+            pass
+
+@contextmanager
+def profile_cycle(label="cycle"):
+    """Runs the block under a profiler if a profiling request is pending; otherwise does nothing."""
+    global _active
+    try:
+        mode = _claim_cycle()
+    except Exception as e:
+        logger.error(f"Could not read the profiling request: {e}")
+        mode = None
+    if mode is None:
+        yield None
+        return
+
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    started = time.perf_counter()
+    if mode == "cprofile":
+        session = _CProfileSession()
+        profile = session.thread_profile()
+        session.running.add(threading.get_ident())
+        with _active_lock:
+            _active = session
+        profile.enable()
+        try:
+            yield mode
+        finally:
+            profile.disable()
+            with _active_lock:
+                _active = None
+            path = os.path.join(PROFILES_DIR, f"{label}-{stamp}.prof")
+            session.write(path)
+    else:
+        sampler = SamplingProfiler()
+        sampler.start()
+        try:
+            yield mode
+        finally:
+            sampler.stop()
+            path = os.path.join(PROFILES_DIR, f"{label}-{stamp}.collapsed.txt")
+            sampler.write(path)
+    logger.info(f"Profiled {label} ({mode}, {time.perf_counter() - started:.2f}s) -> {path}")
+    _prune_profiles()
+
+@contextmanager
+def profile_thread():
+    """
+    Profiles the block in the running cProfile session, if any. Pipeline threads outlive
+    cycles, so they call it around every job rather than once when they start.
+    """
+    with _active_lock:
+        session = _active
+    ident = threading.get_ident()
+    if session is None or ident in session.running:
+        yield
+        return
+    profile = session.thread_profile()
+    try:
+        profile.enable()
+    except ValueError as e:
+        # Python 3.12+ allows only one active cProfile at a time; this thread is left out
+        logger.debug(f"Thread not profiled: {e}")
+        yield
+        return
+    session.running.add(ident)
+    try:
+        yield
+    finally:
+        profile.disable()
+        session.running.discard(ident)
+
+def list_profiles():
+    """Returns the stored profile files, newest first."""
+    try:
+        names = os.listdir(PROFILES_DIR)
+    except FileNotFoundError:
+        return []
+    entries = []
+    for name in names:
+        if not (name.endswith(".prof") or name.endswith(".collapsed.txt")):
+            continue
+        stat = os.stat(os.path.join(PROFILES_DIR, name))
+        entries.append({
+            "name": name,
+            "mode": "cprofile" if name.endswith(".prof") else "sampling",
+            "size": stat.st_size,
+            "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds'),
+        })
+    entries.sort(key=lambda e: (e["created_at"], e["name"]), reverse=True)
+    return entries
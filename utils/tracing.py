@@ -0,0 +1,215 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from config import TRACING_ENABLED, TRACE_FILE, TRACE_MAX_BYTES, TRACE_MAX_SPANS
+
+logger = logging.getLogger('HydeParkSync.Tracing')
+
+# Lightweight span tracing of poll cycles. A trace is started per cycle; events, workers,
+# pipeline stages and I/O calls (store reads/writes, downloads, API requests) add nested
+# spans to it. The spans of a trace are appended to a JSONL file when its root span ends,
+# and can be converted to the Chrome trace format (chrome://tracing, Perfetto) for download.
+#
+# span() is a no-op outside a trace, so instrumented code costs nothing when nothing is traced.
+# The current span is kept in a context variable; threads that work on behalf of a span
+# (e.g. pipeline stages) attach to it explicitly with use_span().
+
+_current_span = contextvars.ContextVar('hydepark_current_span', default=None)
+_file_lock = threading.Lock()
+
+# Top-level name of I/O spans -> category summarized on the root span
+IO_CATEGORIES = ("store", "image", "hikcentral", "supabase")
+
+class Span:
+    def __init__(self, trace, name, parent_id=None, attrs=None):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.thread = threading.current_thread().name
+        self.start = time.time()
+        self.duration = None
+        self._started = time.perf_counter()
+        self._holds = 0
+        self._held_parent = None
+        self._lock = threading.Lock()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def hold(self, count=1):
+        """Keeps the span open until release() was called count more times (work finishing on other threads)."""
+        with self._lock:
+            self._holds += count
+
+    def release(self):
+        with self._lock:
+            self._holds -= 1
+            last = self._holds <= 0
+        if last:
+            self.end()
+
+    def end(self):
+        with self._lock:
+            if self.duration is not None:
+                return
+            self.duration = time.perf_counter() - self._started
+        self.trace.finish(self)
+        if self._held_parent is not None:
+            self._held_parent.release()
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration": round(self.duration or 0.0, 6),
+            "thread": self.thread,
+            "attrs": self.attrs,
+        }
+
+class Trace:
+    """Collects the spans of one root operation and writes them out when the root span ends."""
+
+    def __init__(self, name, attrs=None):
+        self.trace_id = uuid.uuid4().hex
+        self.spans = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self.root = Span(self, name, attrs=attrs)
+
+    def finish(self, span):
+        with self._lock:
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+        if span is self.root:
+            self._summarize()
+            _write_spans(self.spans + ([] if span in self.spans else [span]))
+
+    def _summarize(self):
+        """Adds the time spent per I/O category to the root span (summed over threads)."""
+        io_seconds = dict.fromkeys(IO_CATEGORIES, 0.0)
+        for span in self.spans:
+            category = span.name.split('.', 1)[0]
+            if category in io_seconds and span is not self.root:
+                io_seconds[category] += span.duration or 0.0
+        self.root.set(io_seconds={k: round(v, 6) for k, v in io_seconds.items()}, spans=len(self.spans), dropped_spans=self.dropped)
+
+def _write_spans(spans):
+    lines = "".join(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n" for s in spans)
+    try:
+        with _file_lock:
+            if os.path.exists(TRACE_FILE) and os.path.getsize(TRACE_FILE) > TRACE_MAX_BYTES:
+                os.replace(TRACE_FILE, TRACE_FILE + ".1")
+            with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write(lines)
+    except Exception as e:
+        logger.warning(f"Failed to write trace: {e}")
+
+def start_trace(name, **attrs):
+    """Starts a new trace and returns its root span (None when tracing is disabled). Call end() on it."""
+    if not TRACING_ENABLED:
+        return None
+    return Trace(name, attrs).root
+
+def start_span(name, parent=None, hold_parent=False, **attrs):
+    """
+    Starts a span under parent (default: the current span). Returns None outside a trace.
+    With hold_parent=True the parent is held open until this span ends.
+    """
+    parent = parent or _current_span.get()
+    if parent is None:
+        return None
+    child = Span(parent.trace, name, parent.span_id, attrs)
+    if hold_parent:
+        parent.hold()
+        child._held_parent = parent
+    return child
+
+@contextmanager
+def use_span(span):
+    """Makes span the current span of this thread for the duration of the block."""
+    if span is None:
+        yield None
+        return
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+@contextmanager
+def span(name, **attrs):
+    """Times the block as a child of the current span."""
+    child = start_span(name, **attrs)
+    if child is None:
+        yield None
+        return
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.set(error=str(e))
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+# --- Reading traces ---
+
+def iter_spans():
+    """Yields the stored spans, oldest first."""
+    for path in (TRACE_FILE + ".1", TRACE_FILE):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue
+
+def recent_traces(limit=20):
+    """Returns the root spans of the most recent traces, newest first."""
+    roots = [s for s in iter_spans() if s.get("parent_id") is None]
+    roots.sort(key=lambda s: s.get("start", 0), reverse=True)
+    return roots[:limit]
+
+def chrome_trace(spans):
+    """Converts spans to the Chrome trace event format: one process per trace, one row per thread."""
+    events = []
+    pids = {}
+    tids = {}
+    for s in spans:
+        pid = pids.get(s["trace_id"])
+        if pid is None:
+            pid = pids[s["trace_id"]] = len(pids) + 1
+            events.append({"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": f"trace {s['trace_id'][:8]}"}})
+        tid = tids.get((pid, s["thread"]))
+        if tid is None:
+            tid = tids[(pid, s["thread"])] = len(tids) + 1
+            events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": s["thread"]}})
+        args = dict(s.get("attrs") or {})
+        args.update(span_id=s["span_id"], parent_id=s["parent_id"])
+        events.append({
+            "name": s["name"],
+            "cat": s["name"].split('.', 1)[0],
+            "ph": "X",
+            "ts": int(s["start"] * 1_000_000),
+            "dur": int(s["duration"] * 1_000_000),
+            "pid": pid,
+            "tid": tid,
+            "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}